@@ -14,6 +14,9 @@ from app.db.database import Base  # Импорт Base
 from app.models.user import User
 from app.models.room import Room
 from app.models.booking import Booking
+from app.models.refresh_token import RefreshToken
+from app.models.data_version import DataVersion
+from app.models.background_task import BackgroundTask
 
 # Настраиваем конфигурацию
 config = context.config
@@ -0,0 +1,169 @@
+"""Partition bookings by month
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+import sqlalchemy as sa
+from alembic import op
+from app.config import settings
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+# Партиции по месяцам: bookings_yYYYYmMM, строки вне созданных партиций
+# попадают в bookings_default и переносятся при создании нужной партиции
+CREATE_PARTITION_FUNCTION = """
+CREATE OR REPLACE FUNCTION create_booking_partition(month date) RETURNS text AS $$
+DECLARE
+    lower_bound timestamp := date_trunc('month', month);
+    upper_bound timestamp := date_trunc('month', month) + interval '1 month';
+    partition_name text := format('bookings_y%sm%s', to_char(lower_bound, 'YYYY'), to_char(lower_bound, 'MM'));
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN NULL;
+    END IF;
+    -- Строки месяца могли уже попасть в партицию по умолчанию: переносим их,
+    -- иначе ATTACH PARTITION завершится ошибкой
+    EXECUTE format('CREATE TABLE %I (LIKE bookings INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', partition_name);
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM bookings_default WHERE start_time >= %L AND start_time < %L RETURNING *) '
+        'INSERT INTO %I SELECT * FROM moved',
+        lower_bound, upper_bound, partition_name
+    );
+    EXECUTE format(
+        'ALTER TABLE bookings ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        partition_name, lower_bound, upper_bound
+    );
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+ENSURE_PARTITIONS_FUNCTION = """
+CREATE OR REPLACE FUNCTION ensure_booking_partitions(months_ahead integer) RETURNS SETOF text AS $$
+DECLARE
+    month date;
+    created text;
+BEGIN
+    FOR month IN
+        SELECT generate_series(
+            date_trunc('month', now()),
+            date_trunc('month', now()) + make_interval(months => months_ahead),
+            interval '1 month'
+        )::date
+    LOOP
+        created := create_booking_partition(month);
+        IF created IS NOT NULL THEN
+            RETURN NEXT created;
+        END IF;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Поиск пересечений (app/db/statements.py) не просматривает бронирования, начавшиеся раньше
+# чем за BOOKING_MAX_DURATION_HOURS до периода, - иначе он читал бы все партиции. API более
+# длинных бронирований не создает, но созданные до ограничения остались бы невидимы для проверки
+LONG_ACTIVE_BOOKINGS = sa.text("""
+    SELECT id FROM bookings
+    WHERE status IN ('PENDING', 'CONFIRMED') AND end_time - start_time > make_interval(hours => :hours)
+    ORDER BY id
+""")
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        # Декларативное секционирование есть только в PostgreSQL
+        return
+
+    long_bookings = bind.execute(LONG_ACTIVE_BOOKINGS, {"hours": settings.BOOKING_MAX_DURATION_HOURS}).scalars().all()
+    if long_bookings:
+        raise RuntimeError(
+            f"active bookings longer than {settings.BOOKING_MAX_DURATION_HOURS} hours would be missed "
+            f"by overlap checks, shorten or cancel them first: {long_bookings}"
+        )
+
+    # Старая таблица остается источником данных до конца переноса
+    op.execute("ALTER TABLE bookings RENAME TO bookings_unpartitioned")
+    op.execute("ALTER TABLE bookings_unpartitioned RENAME CONSTRAINT bookings_pkey TO bookings_unpartitioned_pkey")
+    op.execute("ALTER INDEX ix_bookings_id RENAME TO ix_bookings_unpartitioned_id")
+    op.execute("ALTER SEQUENCE bookings_id_seq OWNED BY NONE")
+
+    # Первичный ключ секционированной таблицы обязан включать ключ секционирования
+    op.execute("""
+        CREATE TABLE bookings (
+            id integer NOT NULL DEFAULT nextval('bookings_id_seq'),
+            user_id integer NOT NULL REFERENCES users (id),
+            room_id integer NOT NULL REFERENCES rooms (id),
+            start_time timestamp without time zone NOT NULL,
+            end_time timestamp without time zone NOT NULL,
+            created_at timestamp without time zone NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            status bookingstatus NOT NULL DEFAULT 'PENDING',
+            total_price double precision NOT NULL,
+            notes varchar,
+            CONSTRAINT bookings_pkey PRIMARY KEY (id, start_time)
+        ) PARTITION BY RANGE (start_time)
+    """)
+    op.execute("ALTER SEQUENCE bookings_id_seq OWNED BY bookings.id")
+    op.execute("CREATE TABLE bookings_default PARTITION OF bookings DEFAULT")
+
+    # Индексы создаются на каждой партиции автоматически
+    op.create_index('ix_bookings_id', 'bookings', ['id'], unique=False)
+    op.create_index('ix_bookings_room_id_start_time', 'bookings', ['room_id', 'start_time'], unique=False)
+    op.create_index('ix_bookings_user_id_start_time', 'bookings', ['user_id', 'start_time'], unique=False)
+
+    op.execute(CREATE_PARTITION_FUNCTION)
+    op.execute(ENSURE_PARTITIONS_FUNCTION)
+
+    # Партиции под существующие данные и на три месяца вперед
+    op.execute("""
+        SELECT create_booking_partition(month::date)
+        FROM (SELECT DISTINCT date_trunc('month', start_time) AS month FROM bookings_unpartitioned) months
+    """)
+    op.execute("SELECT ensure_booking_partitions(3)")
+
+    op.execute("INSERT INTO bookings SELECT id, user_id, room_id, start_time, end_time, created_at, "
+               "status, total_price, notes FROM bookings_unpartitioned")
+    op.drop_table('bookings_unpartitioned')
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+    quote = bind.dialect.identifier_preparer.quote_identifier
+
+    op.execute("ALTER TABLE bookings RENAME TO bookings_partitioned")
+    op.execute("ALTER TABLE bookings_partitioned RENAME CONSTRAINT bookings_pkey TO bookings_partitioned_pkey")
+    for index in ('ix_bookings_id', 'ix_bookings_room_id_start_time', 'ix_bookings_user_id_start_time'):
+        op.execute(f"ALTER INDEX {quote(index)} RENAME TO {quote(index.replace('bookings', 'bookings_partitioned', 1))}")
+    op.execute("ALTER SEQUENCE bookings_id_seq OWNED BY NONE")
+
+    op.execute("""
+        CREATE TABLE bookings (
+            id integer NOT NULL DEFAULT nextval('bookings_id_seq'),
+            user_id integer NOT NULL REFERENCES users (id),
+            room_id integer NOT NULL REFERENCES rooms (id),
+            start_time timestamp without time zone NOT NULL,
+            end_time timestamp without time zone NOT NULL,
+            created_at timestamp without time zone NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            status bookingstatus NOT NULL DEFAULT 'PENDING',
+            total_price double precision NOT NULL,
+            notes varchar,
+            CONSTRAINT bookings_pkey PRIMARY KEY (id)
+        )
+    """)
+    op.execute("ALTER SEQUENCE bookings_id_seq OWNED BY bookings.id")
+    op.create_index('ix_bookings_id', 'bookings', ['id'], unique=False)
+
+    # Архивные (отсоединенные) партиции в обратный перенос не попадают
+    op.execute("INSERT INTO bookings SELECT id, user_id, room_id, start_time, end_time, created_at, "
+               "status, total_price, notes FROM bookings_partitioned")
+    op.drop_table('bookings_partitioned')
+    op.execute("DROP FUNCTION IF EXISTS ensure_booking_partitions(integer)")
+    op.execute("DROP FUNCTION IF EXISTS create_booking_partition(date)")
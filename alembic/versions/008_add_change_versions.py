@@ -0,0 +1,43 @@
+"""Add change versions to bookings and rooms
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # В PostgreSQL bookings секционирована: колонки и индексы добавляются во все партиции
+    for table in ('bookings', 'rooms'):
+        op.add_column(table, sa.Column('change_version', sa.BigInteger(), nullable=False, server_default='0'))
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    # Существующие строки - первая версия ленты изменений: с since=0 клиент получит их все
+    op.execute("UPDATE bookings SET change_version = 1, updated_at = created_at")
+    op.execute("UPDATE rooms SET change_version = 1, updated_at = CURRENT_TIMESTAMP")
+    op.execute(
+        "INSERT INTO data_versions (scope, version, updated_at) VALUES ('changes', 1, CURRENT_TIMESTAMP)"
+    )
+
+    op.create_index('ix_bookings_change_version', 'bookings', ['change_version'], unique=False)
+    op.create_index('ix_bookings_user_id_change_version', 'bookings', ['user_id', 'change_version'], unique=False)
+    op.create_index('ix_rooms_change_version', 'rooms', ['change_version'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_rooms_change_version', table_name='rooms')
+    op.drop_index('ix_bookings_user_id_change_version', table_name='bookings')
+    op.drop_index('ix_bookings_change_version', table_name='bookings')
+    op.execute("DELETE FROM data_versions WHERE scope = 'changes'")
+    for table in ('rooms', 'bookings'):
+        op.drop_column(table, 'updated_at')
+        op.drop_column(table, 'change_version')
@@ -1,23 +1,38 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
-from app.db.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.user import User
 from app.models.room import Room
 from app.models.booking import Booking, BookingStatus
-from app.utils.dependencies import get_current_admin
+from app.schemas.report import ReportCreate, ReportJob, ReportStatus
+from app.schemas.token import TokenData
+from app.utils.dependencies import get_current_admin, get_read_db
+from app.utils.fields import FieldSelection, format_rows, project
+from app.utils.reports import submit_report, read_report_job, report_file_path
 from datetime import datetime, timedelta
 
 router = APIRouter()
 
+# Поля ответов аналитики
+REVENUE_FIELDS = FieldSelection("date", "revenue")
+ROOM_USAGE_FIELDS = FieldSelection(
+    "room_id", "room_name", "booking_count", "total_revenue", "total_hours", "occupancy_rate"
+)
+USER_ACTIVITY_FIELDS = FieldSelection("user_id", "username", "email", "booking_count", "total_spent")
+
+def _number_or_zero(value):
+    return float(value) if value else 0
+
 @router.get("/revenue", response_model=List[dict])
 async def get_revenue_stats(
     start_date: datetime = Query(...),
     end_date: datetime = Query(...),
     group_by: str = Query("day", regex="^(day|week|month)$"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin)
+    fields: List[str] = Depends(REVENUE_FIELDS),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: TokenData = Depends(get_current_admin)
 ):
     """Получение статистики по доходам (только для администраторов)"""
     # Определение группировки в зависимости от параметра group_by
@@ -31,98 +46,139 @@ async def get_revenue_stats(
         date_trunc = func.date_trunc('month', Booking.start_time)
         date_format = "%Y-%m"
     
-    # Запрос для получения статистики по доходам
-    revenue_stats = db.query(
-        date_trunc.label('date'),
-        func.sum(Booking.total_price).label('revenue')
-    ).filter(
+    # Запрос для получения статистики по доходам (только запрошенные поля)
+    columns = {"date": date_trunc, "revenue": func.sum(Booking.total_price)}
+    result = await db.execute(select(*project(columns, fields)).where(
         Booking.status == BookingStatus.COMPLETED,
         Booking.start_time >= start_date,
         Booking.start_time <= end_date
-    ).group_by('date').order_by('date').all()
+    ).group_by(date_trunc).order_by(date_trunc))
     
     # Форматирование результатов
-    result = []
-    for stat in revenue_stats:
-        result.append({
-            "date": stat.date.strftime(date_format),
-            "revenue": float(stat.revenue)
-        })
-    
-    return result
+    return format_rows(result, {
+        "date": lambda value: value.strftime(date_format),
+        "revenue": float,
+    })
 
 @router.get("/room-usage", response_model=List[dict])
 async def get_room_usage_stats(
     start_date: datetime = Query(...),
     end_date: datetime = Query(...),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin)
+    fields: List[str] = Depends(ROOM_USAGE_FIELDS),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: TokenData = Depends(get_current_admin)
 ):
     """Получение статистики по использованию комнат (только для администраторов)"""
-    # Запрос для получения статистики по использованию комнат
-    room_stats = db.query(
-        Room.id,
-        Room.name,
-        func.count(Booking.id).label('booking_count'),
-        func.sum(Booking.total_price).label('total_revenue'),
-        func.sum(func.extract('epoch', Booking.end_time - Booking.start_time) / 3600).label('total_hours')
-    ).join(Booking, Room.id == Booking.room_id).filter(
+    # Коэффициент занятости считается из суммы часов, поэтому использует то же выражение
+    booked_hours = func.sum(func.extract('epoch', Booking.end_time - Booking.start_time) / 3600)
+    columns = {
+        "room_id": Room.id,
+        "room_name": Room.name,
+        "booking_count": func.count(Booking.id),
+        "total_revenue": func.sum(Booking.total_price),
+        "total_hours": booked_hours,
+        "occupancy_rate": booked_hours,
+    }
+    
+    # Запрос для получения статистики по использованию комнат (только запрошенные поля)
+    result = await db.execute(select(*project(columns, fields)).select_from(Room).join(
+        Booking, Room.id == Booking.room_id
+    ).where(
         Booking.status.in_([BookingStatus.COMPLETED, BookingStatus.CONFIRMED]),
         Booking.start_time >= start_date,
         Booking.start_time <= end_date
-    ).group_by(Room.id).order_by(func.count(Booking.id).desc()).all()
+    ).group_by(Room.id).order_by(func.count(Booking.id).desc()))
     
     # Расчет общего количества часов в периоде
     total_hours = (end_date - start_date).total_seconds() / 3600
     
-    # Форматирование результатов
-    result = []
-    for stat in room_stats:
-        # Расчет коэффициента занятости (в процентах)
-        occupancy_rate = (stat.total_hours / total_hours) * 100 if total_hours > 0 else 0
-        
-        result.append({
-            "room_id": stat.id,
-            "room_name": stat.name,
-            "booking_count": stat.booking_count,
-            "total_revenue": float(stat.total_revenue) if stat.total_revenue else 0,
-            "total_hours": float(stat.total_hours) if stat.total_hours else 0,
-            "occupancy_rate": round(occupancy_rate, 2)
-        })
-    
-    return result
+    # Форматирование результатов; коэффициент занятости - в процентах
+    return format_rows(result, {
+        "total_revenue": _number_or_zero,
+        "total_hours": _number_or_zero,
+        "occupancy_rate": lambda value: round((_number_or_zero(value) / total_hours) * 100, 2) if total_hours > 0 else 0,
+    })
 
 @router.get("/user-activity", response_model=List[dict])
 async def get_user_activity_stats(
     start_date: datetime = Query(...),
     end_date: datetime = Query(...),
     limit: int = Query(10, ge=1, le=100),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin)
+    fields: List[str] = Depends(USER_ACTIVITY_FIELDS),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: TokenData = Depends(get_current_admin)
 ):
     """Получение статистики по активности пользователей (только для администраторов)"""
-    # Запрос для получения статистики по активности пользователей
-    user_stats = db.query(
-        User.id,
-        User.username,
-        User.email,
-        func.count(Booking.id).label('booking_count'),
-        func.sum(Booking.total_price).label('total_spent')
-    ).join(Booking, User.id == Booking.user_id).filter(
+    columns = {
+        "user_id": User.id,
+        "username": User.username,
+        "email": User.email,
+        "booking_count": func.count(Booking.id),
+        "total_spent": func.sum(Booking.total_price),
+    }
+    
+    # Запрос для получения статистики по активности пользователей (только запрошенные поля)
+    result = await db.execute(select(*project(columns, fields)).select_from(User).join(
+        Booking, User.id == Booking.user_id
+    ).where(
         Booking.status.in_([BookingStatus.COMPLETED, BookingStatus.CONFIRMED]),
         Booking.start_time >= start_date,
         Booking.start_time <= end_date
-    ).group_by(User.id).order_by(func.count(Booking.id).desc()).limit(limit).all()
+    ).group_by(User.id).order_by(func.count(Booking.id).desc()).limit(limit))
     
     # Форматирование результатов
-    result = []
-    for stat in user_stats:
-        result.append({
-            "user_id": stat.id,
-            "username": stat.username,
-            "email": stat.email,
-            "booking_count": stat.booking_count,
-            "total_spent": float(stat.total_spent) if stat.total_spent else 0
-        })
-    
-    return result
\ No newline at end of file
+    return format_rows(result, {"total_spent": _number_or_zero})
+
+def _report_job_response(job: dict) -> dict:
+    """Добавление ссылки на скачивание готового отчета"""
+    job = dict(job)
+    job.pop("owner_id", None)
+    if job["status"] == ReportStatus.COMPLETED:
+        job["download_url"] = f"/analytics/reports/{job['id']}/download"
+    return job
+
+@router.post("/reports", response_model=ReportJob, status_code=status.HTTP_202_ACCEPTED)
+async def create_report(
+    report: ReportCreate,
+    current_user: TokenData = Depends(get_current_admin)
+):
+    """Постановка отчета в очередь на формирование (только для администраторов)"""
+    job = submit_report(
+        report.report_type,
+        report.format,
+        report.start_date,
+        report.end_date,
+        owner_id=current_user.id
+    )
+    return _report_job_response(job)
+
+@router.get("/reports/{job_id}", response_model=ReportJob)
+async def read_report(
+    job_id: str,
+    current_user: TokenData = Depends(get_current_admin)
+):
+    """Получение статуса задачи формирования отчета (только для администраторов)"""
+    job = read_report_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return _report_job_response(job)
+
+@router.get("/reports/{job_id}/download")
+async def download_report(
+    job_id: str,
+    current_user: TokenData = Depends(get_current_admin)
+):
+    """Скачивание готового отчета (только для администраторов)"""
+    job = read_report_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+
+    if job["status"] != ReportStatus.COMPLETED:
+        raise HTTPException(status_code=409, detail="Report is not ready")
+
+    media_type = "text/csv" if job["format"] == "csv" else "application/json"
+    return FileResponse(
+        report_file_path(job_id, job["format"]),
+        media_type=media_type,
+        filename=f"{job['report_type']}_{job_id}.{job['format']}"
+    )
@@ -1,17 +1,28 @@
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.database import get_db
+from app.db.sqlite import sqlite_write, sqlite_writer
+from app.db.statements import USER_BY_USERNAME
 from app.models.user import User, UserRole
 from app.schemas.user import UserCreate, User as UserSchema
-from app.schemas.token import Token
+from app.schemas.token import Token, RefreshTokenRequest
 from app.utils.security import (
-    verify_password, 
-    get_password_hash, 
-    create_access_token, 
+    verify_and_update_password_async, 
+    get_password_hash_async, 
+    create_user_access_token, 
     get_current_active_user
 )
+from app.utils.refresh_tokens import (
+    issue_refresh_token,
+    rotate_refresh_token,
+    revoke_refresh_token,
+    revoke_refresh_token_family
+)
+from app.utils.audit import audit
 from app.config import settings
 
 router = APIRouter()
@@ -19,14 +30,25 @@ router = APIRouter()
 @router.post("/token", response_model=Token)
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Получение токена доступа"""
     # Поиск пользователя в базе данных
-    user = db.query(User).filter(User.username == form_data.username).first()
+    result = await db.execute(USER_BY_USERNAME, {"username": form_data.username})
+    user = result.scalars().first()
+    
+    # Завершаем транзакцию, чтобы не держать соединение из пула во время хеширования
+    await db.commit()
     
     # Проверка пароля
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if user:
+        password_valid, new_hash = await verify_and_update_password_async(form_data.password, user.hashed_password)
+    else:
+        password_valid, new_hash = False, None
+    
+    if not password_valid:
+        # Транзакция уже зафиксирована - запись ставится в очередь сразу
+        audit(None, "user.login_failed", user.id if user else None, username=form_data.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -43,17 +65,66 @@ async def login_for_access_token(
     
     # Создание токена доступа
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
+    access_token = create_user_access_token(user, expires_delta=access_token_expires)
+    
+    # Запись - в очереди писателей, проверка пароля выше выполняется вне ее
+    async with sqlite_write():
+        # Хеш с устаревшими параметрами заменяем без принудительной смены пароля
+        if new_hash:
+            user.hashed_password = new_hash
+        
+        # Создание refresh-токена, чтобы клиент не вводил пароль повторно
+        refresh_token = await issue_refresh_token(db, user.id)
+        audit(db, "user.login", user.id)
+        await db.commit()
     
-    return {"access_token": access_token, "token_type": "bearer"}
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+@router.post("/token/refresh", response_model=Token, dependencies=[Depends(sqlite_writer)])
+async def refresh_access_token(
+    token_request: RefreshTokenRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Обмен refresh-токена на новую пару токенов"""
+    db_token = await rotate_refresh_token(db, token_request.refresh_token)
+    
+    # Проверка, что пользователь все еще существует и активен
+    user = await db.get(User, db_token.user_id)
+    if user is None or not user.is_active:
+        await revoke_refresh_token_family(db, db_token.family_id)
+        await db.commit()
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Inactive user",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    # Ротация: новый токен в той же цепочке
+    refresh_token = await issue_refresh_token(db, user.id, family_id=db_token.family_id)
+    await db.commit()
+    
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_user_access_token(user, expires_delta=access_token_expires)
+    
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+@router.post("/token/revoke", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(sqlite_writer)])
+async def revoke_token(
+    token_request: RefreshTokenRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Отзыв refresh-токена (выход из системы)"""
+    await revoke_refresh_token(db, token_request.refresh_token)
+    await db.commit()
+    
+    return None
 
 @router.post("/register", response_model=UserSchema)
-async def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     """Регистрация нового пользователя"""
     # Проверка, что пользователь с таким email не существует
-    db_user = db.query(User).filter(User.email == user.email).first()
+    result = await db.execute(select(User).where(User.email == user.email))
+    db_user = result.scalars().first()
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -61,15 +132,19 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Проверка, что пользователь с таким username не существует
-    db_user = db.query(User).filter(User.username == user.username).first()
+    result = await db.execute(select(User).where(User.username == user.username))
+    db_user = result.scalars().first()
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already taken"
         )
     
+    # Завершаем транзакцию чтения: хеширование не держит ни соединение, ни очередь писателей
+    await db.commit()
+    hashed_password = await get_password_hash_async(user.password)
+    
     # Создание нового пользователя
-    hashed_password = get_password_hash(user.password)
     db_user = User(
         email=user.email,
         username=user.username,
@@ -79,9 +154,20 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
         role=UserRole.USER
     )
     
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    async with sqlite_write():
+        db.add(db_user)
+        try:
+            await db.flush()
+        except IntegrityError:
+            # Тот же email или username успели зарегистрировать во время хеширования
+            await db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email or username already registered"
+            )
+        audit(db, "user.registered", db_user.id, username=db_user.username)
+        await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
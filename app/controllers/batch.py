@@ -0,0 +1,120 @@
+import asyncio
+import logging
+from typing import List, Tuple
+from urllib.parse import urlencode
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Request
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from app.config import settings
+from app.schemas.batch import BatchItem, BatchRequest, BatchResponse
+from app.schemas.token import TokenData
+from app.utils.responses import ORJSONResponse
+from app.utils.security import get_token_data
+
+logger = logging.getLogger("app.batch")
+
+router = APIRouter()
+
+# Заголовки пакета, которые не передаются подзапросам: тело и условия кэширования у каждого свои
+_DROPPED_HEADERS = {b"content-length", b"content-type", b"accept-encoding", b"if-none-match", b"if-modified-since"}
+
+# Заголовки, которые можно задать для отдельного подзапроса
+_ITEM_HEADERS = {"if-none-match", "if-modified-since"}
+
+def _is_batch_path(path: str) -> bool:
+    return path.partition("?")[0].rstrip("/") == "/batch"
+
+def _sub_scope(request: Request, item: BatchItem, token_data: TokenData) -> dict:
+    """ASGI scope подзапроса на основе scope пакета"""
+    path, _, query = item.path.partition("?")
+    query_string = "&".join(part for part in (query, urlencode(item.params, doseq=True)) if part)
+
+    headers = [(name, value) for name, value in request.scope["headers"] if name not in _DROPPED_HEADERS]
+    headers += [
+        (name.lower().encode("latin-1"), value.encode("latin-1"))
+        for name, value in item.headers.items() if name.lower() in _ITEM_HEADERS
+    ]
+
+    # Данные сопоставления маршрута пакета подзапросу не нужны
+    scope = {key: value for key, value in request.scope.items() if key not in ("route", "endpoint", "path_params")}
+    scope.update(
+        method=item.method,
+        path=path,
+        raw_path=path.encode(),
+        query_string=query_string.encode(),
+        headers=headers,
+        state={**request.scope.get("state", {}), "batch_token_data": token_data},
+    )
+    return scope
+
+def _decode_body(headers: dict, body: bytes):
+    if not body:
+        return None
+    if headers.get("content-type", "").startswith("application/json"):
+        return orjson.loads(body)
+    return body.decode("utf-8", errors="replace")
+
+async def _dispatch(request: Request, item: BatchItem, token_data: TokenData, semaphore: asyncio.Semaphore) -> dict:
+    """Выполнение подзапроса маршрутами приложения в том же процессе"""
+    status_code = 500
+    headers: List[Tuple[bytes, bytes]] = []
+    body = []
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if request_sent:
+            return {"type": "http.disconnect"}
+        request_sent = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status_code, headers
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+            headers = message.get("headers", [])
+        elif message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    # Маршрутизатор, а не все приложение: middleware (сжатие, CORS, лимиты,
+    # статистика запросов) уже применены к самому пакету
+    async with semaphore:
+        try:
+            await request.app.router(_sub_scope(request, item, token_data), receive, send)
+        except StarletteHTTPException as exc:
+            # Например, 404 маршрутизатора: обработчики ошибок FastAPI стоят выше по стеку
+            return {"id": item.id, "status": exc.status_code, "headers": dict(exc.headers or {}),
+                    "body": {"detail": exc.detail}}
+        except Exception:
+            logger.exception("batch sub-request failed", extra={"path": item.path})
+            return {"id": item.id, "status": 500, "headers": {}, "body": {"detail": "Internal Server Error"}}
+
+    response_headers = {name.decode("latin-1"): value.decode("latin-1") for name, value in headers}
+    response_headers.pop("content-length", None)
+    return {
+        "id": item.id,
+        "status": status_code,
+        "headers": response_headers,
+        "body": _decode_body(response_headers, b"".join(body)),
+    }
+
+@router.post("/batch", response_model=BatchResponse, response_class=ORJSONResponse)
+async def run_batch(
+    batch: BatchRequest,
+    request: Request,
+    current_user: TokenData = Depends(get_token_data)
+):
+    """Выполнение нескольких GET-запросов за один вызов с однократной проверкой токена"""
+    if getattr(request.state, "batch_token_data", None) is not None or any(
+        _is_batch_path(item.path) for item in batch.requests
+    ):
+        raise HTTPException(status_code=400, detail="Nested batch requests are not allowed")
+
+    if len(batch.requests) > settings.BATCH_MAX_REQUESTS:
+        raise HTTPException(status_code=400, detail="Too many requests in batch")
+
+    # У каждого подзапроса своя сессия базы данных: ограничиваем число одновременных,
+    # чтобы один пакет не занимал весь пул соединений
+    semaphore = asyncio.Semaphore(settings.BATCH_CONCURRENCY)
+    results = await asyncio.gather(*(_dispatch(request, item, current_user, semaphore) for item in batch.requests))
+    return ORJSONResponse({"responses": results})
@@ -1,80 +1,110 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy import case, null, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
 from app.db.database import get_db
+from app.db.sqlite import sqlite_writer
+from app.db.statements import ACTIVE_ROOM_BY_ID, OVERLAPPING_BOOKING, OVERLAPPING_BOOKING_EXCLUDING, period_params
+from app.db.versions import BOOKINGS, ROOMS, user_bookings_scope
 from app.models.user import User, UserRole
 from app.models.room import Room
 from app.models.booking import Booking, BookingStatus
 from app.schemas.booking import Booking as BookingSchema, BookingCreate, BookingUpdate
-from app.utils.security import get_current_active_user
+from app.schemas.token import TokenData
+from app.utils.audit import audit
+from app.utils.conditional import conditional_get
+from app.utils.security import get_token_data
+from app.utils.dependencies import get_read_db
+from app.utils.fields import FieldSelection, project
+from app.utils.responses import ORJSONResponse, rows_response
+from app.utils.tracing import span
 from datetime import datetime, timedelta
 
 router = APIRouter()
 
-@router.get("/", response_model=List[BookingSchema])
+# Колонки списка бронирований в порядке полей BookingSchema
+BOOKING_LIST_COLUMNS = {
+    "room_id": Booking.room_id, "start_time": Booking.start_time, "end_time": Booking.end_time,
+    "notes": Booking.notes, "id": Booking.id, "user_id": Booking.user_id,
+    "created_at": Booking.created_at, "status": Booking.status, "total_price": Booking.total_price,
+}
+
+# Поля списка: колонки бронирования и имена комнаты и пользователя из связанных таблиц
+BOOKING_LIST_FIELDS = FieldSelection(*BOOKING_LIST_COLUMNS, "room_name", "user_name")
+
+@router.get("/", response_model=List[BookingSchema], response_class=ORJSONResponse)
 async def read_bookings(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
     room_id: Optional[int] = None,
-    status: Optional[str] = None,
+    status: Optional[BookingStatus] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    fields: List[str] = Depends(BOOKING_LIST_FIELDS),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: TokenData = Depends(get_token_data)
 ):
     """Получение списка бронирований текущего пользователя с возможностью фильтрации"""
-    # Базовый запрос
-    query = db.query(Booking)
+    # Список зависит от бронирований (всех или только своих) и названий комнат
+    bookings_scope = BOOKINGS if current_user.role == UserRole.ADMIN else user_bookings_scope(current_user.id)
+    validators = await conditional_get(
+        request, db, [bookings_scope, ROOMS], "private, no-cache",
+        variant=f"{current_user.id}:{current_user.role}"
+    )
+    if validators.matches(request):
+        return validators.not_modified()
+    
+    # Имя пользователя показываем только администраторам и только для чужих бронирований
+    if current_user.role == UserRole.ADMIN:
+        user_name = case((Booking.user_id != current_user.id, User.username), else_=null())
+    else:
+        user_name = null()
+    
+    # Базовый запрос только с запрошенными полями: имена комнаты и пользователя
+    # получаем тем же запросом, а таблицы присоединяем, только если они нужны
+    columns = {**BOOKING_LIST_COLUMNS, "room_name": Room.name, "user_name": user_name}
+    query = select(*project(columns, fields)).select_from(Booking)
+    if "room_name" in fields:
+        query = query.outerjoin(Room, Room.id == Booking.room_id)
     
     # Если пользователь не администратор, показываем только его бронирования
-    if current_user.role != UserRole.ADMIN:
-        query = query.filter(Booking.user_id == current_user.id)
+    if current_user.role == UserRole.ADMIN:
+        if "user_name" in fields:
+            query = query.outerjoin(User, User.id == Booking.user_id)
+    else:
+        query = query.where(Booking.user_id == current_user.id)
     
     # Применение фильтров
     if room_id:
-        query = query.filter(Booking.room_id == room_id)
+        query = query.where(Booking.room_id == room_id)
     
     if status:
-        query = query.filter(Booking.status == status)
+        query = query.where(Booking.status == status)
     
     if start_date:
-        query = query.filter(Booking.start_time >= start_date)
+        query = query.where(Booking.start_time >= start_date)
     
     if end_date:
-        query = query.filter(Booking.end_time <= end_date)
+        # Условие на start_time избыточно, но позволяет отсечь партиции будущих месяцев
+        query = query.where(Booking.end_time <= end_date, Booking.start_time < end_date)
     
     # Сортировка и пагинация
-    bookings = query.order_by(Booking.start_time.desc()).offset(skip).limit(limit).all()
-    
-    # Добавление информации о комнате и пользователе
-    result = []
-    for booking in bookings:
-        booking_dict = BookingSchema.from_orm(booking).dict()
-        
-        # Добавление имени комнаты
-        room = db.query(Room).filter(Room.id == booking.room_id).first()
-        if room:
-            booking_dict["room_name"] = room.name
-        
-        # Добавление имени пользователя (только для администраторов)
-        if current_user.role == UserRole.ADMIN and booking.user_id != current_user.id:
-            user = db.query(User).filter(User.id == booking.user_id).first()
-            if user:
-                booking_dict["user_name"] = user.username
-        
-        result.append(booking_dict)
+    rows = await db.execute(query.order_by(Booking.start_time.desc()).offset(skip).limit(limit))
     
-    return result
+    # Строки уже имеют форму BookingSchema (или ее проекции) - сериализуем их напрямую
+    return validators.apply(rows_response(rows))
 
 @router.get("/{booking_id}", response_model=BookingSchema)
 async def read_booking(
     booking_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: TokenData = Depends(get_token_data)
 ):
     """Получение информации о конкретном бронировании"""
     # Получение бронирования
-    booking = db.query(Booking).filter(Booking.id == booking_id).first()
+    booking = await db.get(Booking, booking_id)
     
     if booking is None:
         raise HTTPException(status_code=404, detail="Booking not found")
@@ -87,27 +117,28 @@ async def read_booking(
     booking_dict = BookingSchema.from_orm(booking).dict()
     
     # Добавление имени комнаты
-    room = db.query(Room).filter(Room.id == booking.room_id).first()
+    room = await db.get(Room, booking.room_id)
     if room:
         booking_dict["room_name"] = room.name
     
     # Добавление имени пользователя (только для администраторов)
     if current_user.role == UserRole.ADMIN and booking.user_id != current_user.id:
-        user = db.query(User).filter(User.id == booking.user_id).first()
+        user = await db.get(User, booking.user_id)
         if user:
             booking_dict["user_name"] = user.username
     
     return booking_dict
 
-@router.post("/", response_model=BookingSchema)
+@router.post("/", response_model=BookingSchema, dependencies=[Depends(sqlite_writer)])
 async def create_booking(
     booking: BookingCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: TokenData = Depends(get_token_data)
 ):
     """Создание нового бронирования"""
     # Проверка существования комнаты
-    room = db.query(Room).filter(Room.id == booking.room_id, Room.is_active == True).first()
+    result = await db.execute(ACTIVE_ROOM_BY_ID, {"room_id": booking.room_id})
+    room = result.scalars().first()
     
     if room is None:
         raise HTTPException(status_code=404, detail="Room not found")
@@ -116,17 +147,17 @@ async def create_booking(
     if booking.start_time >= booking.end_time:
         raise HTTPException(status_code=400, detail="End time must be after start time")
     
+    if booking.end_time - booking.start_time > timedelta(hours=settings.BOOKING_MAX_DURATION_HOURS):
+        raise HTTPException(status_code=400, detail="Booking is too long")
+    
     # Проверка, что время бронирования не в прошлом
     if booking.start_time < datetime.utcnow():
         raise HTTPException(status_code=400, detail="Cannot book in the past")
     
     # Проверка доступности комнаты в указанный период
-    overlapping_bookings = db.query(Booking).filter(
-        Booking.room_id == booking.room_id,
-        Booking.status.in_(["pending", "confirmed"]),
-        Booking.start_time < booking.end_time,
-        Booking.end_time > booking.start_time
-    ).all()
+    with span("booking.check_overlap", room_id=booking.room_id):
+        result = await db.execute(OVERLAPPING_BOOKING, period_params(booking.room_id, booking.start_time, booking.end_time))
+        overlapping_bookings = result.first()
     
     if overlapping_bookings:
         raise HTTPException(status_code=400, detail="Room is already booked for this time")
@@ -147,8 +178,11 @@ async def create_booking(
     )
     
     db.add(db_booking)
-    db.commit()
-    db.refresh(db_booking)
+    await db.flush()
+    audit(db, "booking.created", current_user.id, booking_id=db_booking.id, room_id=db_booking.room_id,
+          start_time=db_booking.start_time, end_time=db_booking.end_time, total_price=total_price)
+    await db.commit()
+    await db.refresh(db_booking)
     
     # Добавление информации о комнате
     booking_dict = BookingSchema.from_orm(db_booking).dict()
@@ -156,16 +190,16 @@ async def create_booking(
     
     return booking_dict
 
-@router.put("/{booking_id}", response_model=BookingSchema)
+@router.put("/{booking_id}", response_model=BookingSchema, dependencies=[Depends(sqlite_writer)])
 async def update_booking(
     booking_id: int,
     booking_update: BookingUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: TokenData = Depends(get_token_data)
 ):
     """Обновление информации о бронировании"""
     # Получение бронирования
-    db_booking = db.query(Booking).filter(Booking.id == booking_id).first()
+    db_booking = await db.get(Booking, booking_id)
     
     if db_booking is None:
         raise HTTPException(status_code=404, detail="Booking not found")
@@ -180,6 +214,8 @@ async def update_booking(
     
     # Обновление полей бронирования
     update_data = booking_update.dict(exclude_unset=True)
+    if update_data.get("status") is not None:
+        update_data["status"] = BookingStatus(update_data["status"])
     
     # Если обновляется время, проверяем доступность комнаты
     if "start_time" in update_data or "end_time" in update_data:
@@ -190,25 +226,26 @@ async def update_booking(
         if start_time >= end_time:
             raise HTTPException(status_code=400, detail="End time must be after start time")
         
+        if end_time - start_time > timedelta(hours=settings.BOOKING_MAX_DURATION_HOURS):
+            raise HTTPException(status_code=400, detail="Booking is too long")
+        
         # Проверка, что время бронирования не в прошлом
         if start_time < datetime.utcnow():
             raise HTTPException(status_code=400, detail="Cannot book in the past")
         
         # Проверка доступности комнаты в указанный период
-        overlapping_bookings = db.query(Booking).filter(
-            Booking.room_id == db_booking.room_id,
-            Booking.id != booking_id,
-            Booking.status.in_(["pending", "confirmed"]),
-            Booking.start_time < end_time,
-            Booking.end_time > start_time
-        ).all()
+        with span("booking.check_overlap", room_id=db_booking.room_id):
+            result = await db.execute(OVERLAPPING_BOOKING_EXCLUDING, period_params(
+                db_booking.room_id, start_time, end_time, exclude_id=booking_id
+            ))
+            overlapping_bookings = result.first()
         
         if overlapping_bookings:
             raise HTTPException(status_code=400, detail="Room is already booked for this time")
         
         # Если время изменилось, пересчитываем стоимость
         if start_time != db_booking.start_time or end_time != db_booking.end_time:
-            room = db.query(Room).filter(Room.id == db_booking.room_id).first()
+            room = await db.get(Room, db_booking.room_id)
             duration_hours = (end_time - start_time).total_seconds() / 3600
             update_data["total_price"] = room.price_per_hour * duration_hours
     
@@ -216,25 +253,26 @@ async def update_booking(
     for key, value in update_data.items():
         setattr(db_booking, key, value)
     
-    db.commit()
-    db.refresh(db_booking)
+    audit(db, "booking.updated", current_user.id, booking_id=booking_id, changes=update_data)
+    await db.commit()
+    await db.refresh(db_booking)
     
     # Добавление информации о комнате
-    room = db.query(Room).filter(Room.id == db_booking.room_id).first()
+    room = await db.get(Room, db_booking.room_id)
     booking_dict = BookingSchema.from_orm(db_booking).dict()
     booking_dict["room_name"] = room.name
     
     return booking_dict
 
-@router.delete("/{booking_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete("/{booking_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(sqlite_writer)])
 async def cancel_booking(
     booking_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: TokenData = Depends(get_token_data)
 ):
     """Отмена бронирования"""
     # Получение бронирования
-    db_booking = db.query(Booking).filter(Booking.id == booking_id).first()
+    db_booking = await db.get(Booking, booking_id)
     
     if db_booking is None:
         raise HTTPException(status_code=404, detail="Booking not found")
@@ -250,6 +288,7 @@ async def cancel_booking(
     # Отмена бронирования
     db_booking.status = BookingStatus.CANCELLED
     
-    db.commit()
+    audit(db, "booking.cancelled", current_user.id, booking_id=booking_id)
+    await db.commit()
     
     return None
\ No newline at end of file
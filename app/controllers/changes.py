@@ -0,0 +1,100 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+from app.config import settings
+from app.controllers.booking import BOOKING_LIST_COLUMNS
+from app.controllers.room import ROOM_LIST_COLUMNS
+from app.db.versions import CHANGES, read_versions
+from app.models.booking import Booking, BookingStatus
+from app.models.room import Room
+from app.models.user import UserRole
+from app.schemas.changes import ChangeFeed
+from app.schemas.token import TokenData
+from app.utils.dependencies import get_read_db
+from app.utils.fields import project
+from app.utils.responses import ORJSONResponse
+from app.utils.security import get_token_data
+
+router = APIRouter()
+
+# Бронирования в ленте - поля списка с названием комнаты
+FEED_BOOKING_COLUMNS = {**BOOKING_LIST_COLUMNS, "room_name": Room.name}
+
+async def _page_bound(
+    db: AsyncSession,
+    version_column: ColumnElement,
+    conditions: List[ColumnElement],
+    since: int
+) -> Optional[int]:
+    """Версия последней строки страницы таблицы; None - изменений не больше страницы"""
+    result = await db.execute(
+        select(version_column).where(version_column > since, *conditions)
+        .order_by(version_column).offset(settings.CHANGES_PAGE_SIZE - 1).limit(1)
+    )
+    return result.scalar()
+
+@router.get("/changes", response_model=ChangeFeed, response_class=ORJSONResponse)
+async def read_changes(
+    since: int = Query(0, ge=0, description="Версия из предыдущего ответа; 0 - полная выгрузка"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: TokenData = Depends(get_token_data)
+):
+    """Бронирования и комнаты, измененные после версии since; отмены и удаления - только id"""
+    # Версия читается до строк: строки с версией не больше нее уже зафиксированы
+    versions = await read_versions(db, [CHANGES])
+    current_version = versions.get(CHANGES, (0,))[0]
+    if since > current_version:
+        # Клиент синхронизировался с другой базой (восстановление из копии, пересоздание)
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Unknown change version, full resync required")
+
+    booking_conditions = [] if current_user.role == UserRole.ADMIN else [Booking.user_id == current_user.id]
+
+    # Страница заканчивается на целой версии: строки одного flush не делятся между ответами
+    bounds = [
+        bound for bound in (
+            await _page_bound(db, Booking.change_version, booking_conditions, since),
+            await _page_bound(db, Room.change_version, [], since),
+        ) if bound is not None
+    ]
+    version = min(bounds + [current_version])
+
+    booking_rows = await db.execute(
+        select(*project(FEED_BOOKING_COLUMNS, list(FEED_BOOKING_COLUMNS))).select_from(Booking)
+        .outerjoin(Room, Room.id == Booking.room_id)
+        .where(Booking.change_version > since, Booking.change_version <= version, *booking_conditions)
+        .order_by(Booking.change_version)
+    )
+    room_rows = await db.execute(
+        select(*project(ROOM_LIST_COLUMNS, list(ROOM_LIST_COLUMNS))).select_from(Room)
+        .where(Room.change_version > since, Room.change_version <= version)
+        .order_by(Room.change_version)
+    )
+
+    bookings, cancelled_bookings = [], []
+    for row in booking_rows:
+        if row.status == BookingStatus.CANCELLED:
+            cancelled_bookings.append(row.id)
+        else:
+            bookings.append(row._asdict())
+
+    rooms, deleted_rooms = [], []
+    for row in room_rows:
+        if row.is_active:
+            rooms.append(row._asdict())
+        else:
+            deleted_rooms.append(row.id)
+
+    # При полной выгрузке удалять на клиенте нечего
+    if since == 0:
+        cancelled_bookings, deleted_rooms = [], []
+
+    return ORJSONResponse({
+        "version": version,
+        "has_more": version < current_version,
+        "bookings": bookings,
+        "rooms": rooms,
+        "cancelled_bookings": cancelled_bookings,
+        "deleted_rooms": deleted_rooms,
+    })
@@ -0,0 +1,66 @@
+import asyncio
+from typing import Optional
+import orjson
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.db.database import get_db
+from app.models.user import UserRole
+from app.schemas.token import TokenData
+from app.utils.events import Subscription, broker
+from app.utils.security import get_token_data
+
+router = APIRouter()
+
+def _format_event(event: dict) -> bytes:
+    """Событие в формате text/event-stream"""
+    # Без id клиент сохраняет прежний Last-Event-ID
+    event_id = f"id: {event['id']}\n" if event["id"] else ""
+    return f"{event_id}event: {event['type']}\ndata: ".encode() + orjson.dumps(event["data"]) + b"\n\n"
+
+@router.get("/events")
+async def stream_events(
+    rooms: Optional[str] = Query(None, description="id комнат через запятую: занятость только этих комнат"),
+    last_event_id: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: TokenData = Depends(get_token_data)
+):
+    """Поток изменений бронирований и комнат (Server-Sent Events)"""
+    room_ids = None
+    if rooms:
+        try:
+            room_ids = {int(room_id) for room_id in rooms.split(",") if room_id.strip()}
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid rooms filter")
+
+    # Соединение с базой потоку не нужно - не держим его до отключения клиента
+    await db.close()
+
+    subscription = Subscription(current_user.id, current_user.role == UserRole.ADMIN, room_ids)
+
+    async def events():
+        # Подписка регистрируется при начале передачи: ее снимает finally этого генератора
+        broker.subscribe(subscription, last_event_id)
+        try:
+            # Клиенту - пауза перед переподключением после обрыва
+            yield b"retry: 5000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), settings.EVENTS_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Комментарий держит соединение открытым через прокси
+                    yield b": keep-alive\n\n"
+                    continue
+                if event is None:
+                    # Сервер останавливается - завершаем ответ, не задерживая остановку
+                    return
+                yield _format_event(event)
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
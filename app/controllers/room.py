@@ -1,19 +1,42 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
 from app.db.database import get_db
-from app.models.user import User
+from app.db.sqlite import sqlite_writer
+from app.db.statements import ACTIVE_ROOM_BY_ID, ROOM_BOOKINGS_IN_PERIOD, period_params
+from app.db.versions import ROOMS, room_bookings_scope, room_scope
 from app.models.room import Room
-from app.models.booking import Booking
 from app.schemas.room import Room as RoomSchema, RoomCreate, RoomUpdate
-from app.utils.security import get_current_active_user
-from app.utils.dependencies import get_current_admin
+from app.schemas.token import TokenData
+from app.utils.security import get_token_data
+from app.utils.conditional import conditional_get
+from app.utils.dependencies import get_current_admin, get_read_db
+from app.utils.fields import FieldSelection, project
+from app.utils.responses import ORJSONResponse, rows_response
 from datetime import datetime, timedelta
 
 router = APIRouter()
 
-@router.get("/", response_model=List[RoomSchema])
+# Колонки списка комнат в порядке полей RoomSchema
+ROOM_LIST_COLUMNS = {
+    "name": Room.name, "description": Room.description, "capacity": Room.capacity,
+    "price_per_hour": Room.price_per_hour, "has_projector": Room.has_projector,
+    "has_whiteboard": Room.has_whiteboard, "has_video_conf": Room.has_video_conf,
+    "image_url": Room.image_url, "id": Room.id, "is_active": Room.is_active,
+}
+
+ROOM_LIST_FIELDS = FieldSelection(*ROOM_LIST_COLUMNS)
+
+# Каталог комнат меняется редко, но отдается только с токеном - общие кэши (прокси, CDN)
+# его не хранят; доступность меняется с каждым бронированием - только с перепроверкой
+CATALOGUE_CACHE_CONTROL = f"private, max-age={settings.ROOMS_CACHE_MAX_AGE}"
+AVAILABILITY_CACHE_CONTROL = "private, no-cache"
+
+@router.get("/", response_model=List[RoomSchema], response_class=ORJSONResponse)
 async def read_rooms(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
     name: Optional[str] = None,
@@ -22,74 +45,88 @@ async def read_rooms(
     has_projector: Optional[bool] = None,
     has_whiteboard: Optional[bool] = None,
     has_video_conf: Optional[bool] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    fields: List[str] = Depends(ROOM_LIST_FIELDS),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: TokenData = Depends(get_token_data)
 ):
     """Получение списка комнат с возможностью фильтрации"""
-    query = db.query(Room).filter(Room.is_active == True)
+    validators = await conditional_get(request, db, [ROOMS], CATALOGUE_CACHE_CONTROL)
+    if validators.matches(request):
+        return validators.not_modified()
+    
+    query = select(*project(ROOM_LIST_COLUMNS, fields)).select_from(Room).where(Room.is_active == True)
     
     # Применение фильтров
     if name:
-        query = query.filter(Room.name.ilike(f"%{name}%"))
+        query = query.where(Room.name.ilike(f"%{name}%"))
     
     if min_capacity:
-        query = query.filter(Room.capacity >= min_capacity)
+        query = query.where(Room.capacity >= min_capacity)
     
     if max_price:
-        query = query.filter(Room.price_per_hour <= max_price)
+        query = query.where(Room.price_per_hour <= max_price)
     
     if has_projector is not None:
-        query = query.filter(Room.has_projector == has_projector)
+        query = query.where(Room.has_projector == has_projector)
     
     if has_whiteboard is not None:
-        query = query.filter(Room.has_whiteboard == has_whiteboard)
+        query = query.where(Room.has_whiteboard == has_whiteboard)
     
     if has_video_conf is not None:
-        query = query.filter(Room.has_video_conf == has_video_conf)
+        query = query.where(Room.has_video_conf == has_video_conf)
     
     # Пагинация
-    rooms = query.offset(skip).limit(limit).all()
+    result = await db.execute(query.offset(skip).limit(limit))
     
-    return rooms
+    # Строки уже имеют форму RoomSchema (или ее проекции) - сериализуем их напрямую
+    return validators.apply(rows_response(result))
 
 @router.get("/{room_id}", response_model=RoomSchema)
 async def read_room(
     room_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    current_user: TokenData = Depends(get_token_data)
 ):
     """Получение информации о конкретной комнате"""
-    room = db.query(Room).filter(Room.id == room_id, Room.is_active == True).first()
+    validators = await conditional_get(request, db, [room_scope(room_id)], CATALOGUE_CACHE_CONTROL)
+    if validators.matches(request):
+        return validators.not_modified()
+    
+    result = await db.execute(ACTIVE_ROOM_BY_ID, {"room_id": room_id})
+    room = result.scalars().first()
     
     if room is None:
         raise HTTPException(status_code=404, detail="Room not found")
     
+    validators.apply(response)
     return room
 
-@router.post("/", response_model=RoomSchema)
+@router.post("/", response_model=RoomSchema, dependencies=[Depends(sqlite_writer)])
 async def create_room(
     room: RoomCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin)
+    db: AsyncSession = Depends(get_db),
+    current_user: TokenData = Depends(get_current_admin)
 ):
     """Создание новой комнаты (только для администраторов)"""
     db_room = Room(**room.dict())
     
     db.add(db_room)
-    db.commit()
-    db.refresh(db_room)
+    await db.commit()
+    await db.refresh(db_room)
     
     return db_room
 
-@router.put("/{room_id}", response_model=RoomSchema)
+@router.put("/{room_id}", response_model=RoomSchema, dependencies=[Depends(sqlite_writer)])
 async def update_room(
     room_id: int,
     room_update: RoomUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin)
+    db: AsyncSession = Depends(get_db),
+    current_user: TokenData = Depends(get_current_admin)
 ):
     """Обновление информации о комнате (только для администраторов)"""
-    db_room = db.query(Room).filter(Room.id == room_id).first()
+    db_room = await db.get(Room, room_id)
     
     if db_room is None:
         raise HTTPException(status_code=404, detail="Room not found")
@@ -99,52 +136,58 @@ async def update_room(
     for key, value in update_data.items():
         setattr(db_room, key, value)
     
-    db.commit()
-    db.refresh(db_room)
+    await db.commit()
+    await db.refresh(db_room)
     
     return db_room
 
-@router.delete("/{room_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete("/{room_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(sqlite_writer)])
 async def delete_room(
     room_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin)
+    db: AsyncSession = Depends(get_db),
+    current_user: TokenData = Depends(get_current_admin)
 ):
     """Удаление комнаты (только для администраторов)"""
-    db_room = db.query(Room).filter(Room.id == room_id).first()
+    db_room = await db.get(Room, room_id)
     
-    if db_room is None:
+    if db_room is None or not db_room.is_active:
         raise HTTPException(status_code=404, detail="Room not found")
     
-    db.delete(db_room)
-    db.commit()
+    # Комната не удаляется из базы, а скрывается: на нее ссылаются бронирования,
+    # а лента изменений (GET /changes) сообщает клиентам об удалении
+    db_room.is_active = False
+    await db.commit()
     
     return None
 
-@router.get("/{room_id}/availability", response_model=List[dict])
+@router.get("/{room_id}/availability", response_model=List[dict], response_class=ORJSONResponse)
 async def check_room_availability(
     room_id: int,
+    request: Request,
     start_date: datetime = Query(...),
     end_date: datetime = Query(...),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_read_db),
+    current_user: TokenData = Depends(get_token_data)
 ):
     """Проверка доступности комнаты в указанный период"""
+    validators = await conditional_get(
+        request, db, [room_scope(room_id), room_bookings_scope(room_id)], AVAILABILITY_CACHE_CONTROL
+    )
+    if validators.matches(request):
+        return validators.not_modified()
+    
     # Проверка существования комнаты
-    room = db.query(Room).filter(Room.id == room_id, Room.is_active == True).first()
+    result = await db.execute(ACTIVE_ROOM_BY_ID, {"room_id": room_id})
+    room = result.scalars().first()
     
     if room is None:
         raise HTTPException(status_code=404, detail="Room not found")
     
     # Получение бронирований комнаты в указанный период
-    bookings = db.query(Booking).filter(
-        Booking.room_id == room_id,
-        Booking.status.in_(["pending", "confirmed"]),
-        Booking.start_time < end_date,
-        Booking.end_time > start_date
-    ).order_by(Booking.start_time).all()
-    
-    # Формирование списка доступных слотов
+    result = await db.execute(ROOM_BOOKINGS_IN_PERIOD, period_params(room_id, start_date, end_date))
+    bookings = result.all()
+    
+    # Формирование списка доступных слотов (datetime сериализует ORJSONResponse)
     availability = []
     current_time = start_date
     
@@ -152,15 +195,15 @@ async def check_room_availability(
         # Если есть свободное время до бронирования
         if current_time < booking.start_time:
             availability.append({
-                "start_time": current_time.isoformat(),
-                "end_time": booking.start_time.isoformat(),
+                "start_time": current_time,
+                "end_time": booking.start_time,
                 "available": True
             })
         
         # Добавление занятого слота
         availability.append({
-            "start_time": booking.start_time.isoformat(),
-            "end_time": booking.end_time.isoformat(),
+            "start_time": booking.start_time,
+            "end_time": booking.end_time,
             "available": False,
             "booking_id": booking.id
         })
@@ -171,17 +214,17 @@ async def check_room_availability(
     # Если есть свободное время после последнего бронирования
     if current_time < end_date:
         availability.append({
-            "start_time": current_time.isoformat(),
-            "end_time": end_date.isoformat(),
+            "start_time": current_time,
+            "end_time": end_date,
             "available": True
         })
     
     # Если нет бронирований, весь период доступен
     if not bookings:
         availability.append({
-            "start_time": start_date.isoformat(),
-            "end_time": end_date.isoformat(),
+            "start_time": start_date,
+            "end_time": end_date,
             "available": True
         })
     
-    return availability
\ No newline at end of file
+    return validators.apply(ORJSONResponse(availability))
\ No newline at end of file
@@ -1,14 +1,102 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine  
-from sqlalchemy.orm import sessionmaker, DeclarativeBase  
-from app.config import settings  
+from contextlib import AsyncExitStack
+from typing import AsyncIterator, List
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.orm import DeclarativeBase
+from app.config import settings
+from app.db.pool import InstrumentedAsyncQueuePool
+from app.db.query_log import install_query_hooks
+from app.db.sqlite import configure_sqlite
+from app.utils.metrics import Gauge
 
-engine = create_async_engine(settings.DATABASE_URL, echo=True)  
+def replica_urls() -> List[str]:
+    """Адреса реплик для чтения из DATABASE_REPLICA_URLS"""
+    return [url.strip() for url in settings.DATABASE_REPLICA_URLS.split(",") if url.strip()]
 
-async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)  
+def engine_options(database_url: str) -> dict:
+    """Параметры движка и пула соединений из настроек"""
+    options = {
+        "echo": settings.DB_ECHO,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "query_cache_size": settings.DB_QUERY_CACHE_SIZE,
+    }
+    url = make_url(database_url)
+    if url.get_driver_name() == "asyncpg":
+        options["connect_args"] = {"prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE}
+    # SQLite в памяти работает с одним соединением (StaticPool) - пул не настраивается
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return options
+    options.update(
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+    return options
 
-class Base(DeclarativeBase):  
-    pass  
+def configure_engine(engine: AsyncEngine) -> AsyncEngine:
+    """Подключение обработчиков событий к движку приложения или реплики"""
+    install_query_hooks(engine.sync_engine)
+    if engine.dialect.name == "sqlite":
+        configure_sqlite(engine.sync_engine)
+    return engine
 
-async def get_session() -> AsyncSession:  
-    async with async_session() as session:  
-        yield session  
\ No newline at end of file
+engine = configure_engine(create_async_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL)))
+
+# expire_on_commit=False: после commit атрибуты не перечитываются лениво,
+# что в асинхронном коде привело бы к ошибке
+async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+def _pool_stat(name: str):
+    # Пул пересоздается при engine.dispose(), поэтому обращаемся к нему при каждом сборе
+    return lambda: getattr(engine.pool, name)() if hasattr(engine.pool, name) else 0
+
+DB_POOL_SIZE = Gauge("db_pool_size", "Configured pool size", func=_pool_stat("size"))
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections currently checked out", func=_pool_stat("checkedout"))
+DB_POOL_CHECKED_IN = Gauge("db_pool_checked_in", "Idle connections in the pool", func=_pool_stat("checkedin"))
+# QueuePool.overflow() отрицателен, пока пул не заполнен до pool_size
+_pool_overflow = _pool_stat("overflow")
+DB_POOL_OVERFLOW = Gauge("db_pool_overflow", "Overflow connections currently open", func=lambda: max(0, _pool_overflow()))
+
+async def warm_up_pool(target: AsyncEngine, connections: int) -> int:
+    """Установка соединений пула до приема запросов; возвращает число открытых соединений"""
+    size = getattr(target.pool, "size", None)
+    if size is not None:
+        connections = min(connections, size())
+    # Соединения удерживаются до конца прогрева, иначе пул выдал бы одно и то же
+    async with AsyncExitStack() as stack:
+        for _ in range(max(connections, 0)):
+            connection = await stack.enter_async_context(target.connect())
+            await connection.exec_driver_sql("SELECT 1")
+    return max(connections, 0)
+
+class Base(DeclarativeBase):
+    pass
+
+def relationship_loading() -> str:
+    """Стратегия загрузки отношений: в режиме поиска N+1 ленивая загрузка вызывает ошибку"""
+    return "raise" if settings.N_PLUS_ONE_DETECTION else "select"
+
+async def get_db() -> AsyncIterator[AsyncSession]:
+    """Сессия базы данных на время одного запроса"""
+    async with async_session() as session:
+        try:
+            yield session
+        except Exception:
+            await session.rollback()
+            raise
+
+def session_dependency(session_factory: async_sessionmaker):
+    """Замена get_db для приложения с другой фабрикой сессий (create_app, тесты)"""
+    async def get_app_db() -> AsyncIterator[AsyncSession]:
+        async with session_factory() as session:
+            try:
+                yield session
+            except Exception:
+                await session.rollback()
+                raise
+    return get_app_db
+
+# Прежнее имя зависимости
+get_session = get_db
@@ -0,0 +1,135 @@
+"""Обслуживание помесячных партиций таблицы bookings (PostgreSQL).
+
+    python -m app.db.partitions ensure [--months-ahead 3]
+    python -m app.db.partitions list
+    python -m app.db.partitions archive --before 2025-01 [--schema archive] [--tablespace cold] [--dry-run]
+
+archive отсоединяет партиции месяцев раньше --before от bookings и
+переносит их в отдельную схему (и, при необходимости, табличное
+пространство на дешевом хранилище). Данные остаются доступны запросами
+к archive.bookings_yYYYYmMM, но не участвуют в запросах приложения.
+"""
+import argparse
+import asyncio
+import logging
+import re
+from datetime import date
+from typing import List, Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, create_async_engine
+from sqlalchemy.pool import NullPool
+from app.config import settings
+
+logger = logging.getLogger("app.db.partitions")
+
+_PARTITION_NAME = re.compile(r"^bookings_y(\d{4})m(\d{2})$")
+
+def _partition_month(name: str) -> Optional[date]:
+    match = _PARTITION_NAME.match(name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+async def ensure_partitions(connection: AsyncConnection, months_ahead: int) -> List[str]:
+    """Создание партиций с текущего месяца на months_ahead вперед"""
+    result = await connection.execute(text("SELECT ensure_booking_partitions(:months_ahead)"),
+                                      {"months_ahead": months_ahead})
+    return [row[0] for row in result]
+
+async def list_partitions(connection: AsyncConnection) -> List[dict]:
+    """Партиции bookings с оценкой числа строк"""
+    result = await connection.execute(text("""
+        SELECT c.relname AS name, c.reltuples::bigint AS rows
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'bookings'::regclass
+        ORDER BY c.relname
+    """))
+    return [{"name": row.name, "month": _partition_month(row.name), "rows": max(row.rows, 0)} for row in result]
+
+def _quote(connection: AsyncConnection, name: str) -> str:
+    """Имя объекта для подстановки в SQL: --schema и --tablespace приходят из командной строки"""
+    return connection.dialect.identifier_preparer.quote_identifier(name)
+
+async def archive_partitions(connection: AsyncConnection, before: date, schema: str,
+                             tablespace: Optional[str] = None, dry_run: bool = False) -> List[str]:
+    """Отсоединение партиций месяцев раньше before и перенос в архивную схему"""
+    archived = []
+    for partition in await list_partitions(connection):
+        month = partition["month"]
+        if month is None or month >= before:
+            continue
+        name = _quote(connection, partition["name"])
+
+        # Действующие бронирования в архив не уходят: их нужно сначала завершить
+        active = await connection.scalar(text(
+            f"SELECT count(*) FROM {name} WHERE status IN ('PENDING', 'CONFIRMED')"
+        ))
+        if active:
+            logger.warning("partition has active bookings, skipped",
+                           extra={"partition": partition["name"], "active": active})
+            continue
+
+        archived.append(partition["name"])
+        if dry_run:
+            continue
+
+        await connection.execute(text(f"CREATE SCHEMA IF NOT EXISTS {_quote(connection, schema)}"))
+        await connection.execute(text(f"ALTER TABLE bookings DETACH PARTITION {name}"))
+        await connection.execute(text(f"ALTER TABLE {name} SET SCHEMA {_quote(connection, schema)}"))
+        if tablespace:
+            await connection.execute(text(
+                f"ALTER TABLE {_quote(connection, schema)}.{name} SET TABLESPACE {_quote(connection, tablespace)}"
+            ))
+        await connection.commit()
+    return archived
+
+async def ensure_partitions_on_startup(engine: AsyncEngine):
+    """Создание недостающих партиций при запуске приложения; ошибки не мешают запуску"""
+    if engine.dialect.name != "postgresql" or settings.BOOKING_PARTITIONS_AHEAD_MONTHS <= 0:
+        return
+    try:
+        async with engine.begin() as connection:
+            created = await ensure_partitions(connection, settings.BOOKING_PARTITIONS_AHEAD_MONTHS)
+    except Exception:
+        logger.exception("could not ensure booking partitions")
+        return
+    if created:
+        logger.info("booking partitions created", extra={"partitions": created})
+
+async def _run(args):
+    engine = create_async_engine(settings.DATABASE_URL, poolclass=NullPool)
+    try:
+        async with engine.connect() as connection:
+            if args.command == "ensure":
+                created = await ensure_partitions(connection, args.months_ahead)
+                await connection.commit()
+                print("\n".join(created) if created else "all partitions exist")
+            elif args.command == "list":
+                for partition in await list_partitions(connection):
+                    print(f"{partition['name']:<24} ~{partition['rows']} rows")
+            else:
+                year, month = map(int, args.before.split("-"))
+                archived = await archive_partitions(connection, date(year, month, 1), args.schema,
+                                                    args.tablespace, args.dry_run)
+                prefix = "would archive" if args.dry_run else "archived"
+                print("\n".join(f"{prefix} {name}" for name in archived) if archived else "nothing to archive")
+    finally:
+        await engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description="Обслуживание партиций таблицы bookings")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ensure = commands.add_parser("ensure", help="создать партиции на месяцы вперед")
+    ensure.add_argument("--months-ahead", type=int, default=settings.BOOKING_PARTITIONS_AHEAD_MONTHS)
+
+    commands.add_parser("list", help="список партиций")
+
+    archive = commands.add_parser("archive", help="отсоединить старые партиции")
+    archive.add_argument("--before", required=True, help="первый месяц, который остается в bookings (YYYY-MM)")
+    archive.add_argument("--schema", default="archive", help="схема для отсоединенных партиций")
+    archive.add_argument("--tablespace", help="табличное пространство холодного хранилища")
+    archive.add_argument("--dry-run", action="store_true", help="только показать, что будет перенесено")
+
+    asyncio.run(_run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import time
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.utils.metrics import Counter, Histogram
+
+POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_seconds",
+    "Time spent acquiring a connection from the pool",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+POOL_OVERFLOW_EVENTS = Counter(
+    "db_pool_overflow_total",
+    "Connections opened beyond pool_size (max_overflow in use)"
+)
+POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total",
+    "Checkouts that failed after waiting pool_timeout"
+)
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Пул соединений с метриками ожидания, переполнения и таймаутов"""
+
+    def connect(self):
+        started_at = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started_at)
+
+    def _create_connection(self):
+        # Счетчик _overflow уже учитывает создаваемое соединение
+        if self._overflow > 0:
+            POOL_OVERFLOW_EVENTS.inc()
+        return super()._create_connection()
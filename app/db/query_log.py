@@ -0,0 +1,148 @@
+import logging
+import time
+from contextvars import ContextVar
+from typing import Callable, List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.config import settings
+from app.utils.tracing import KIND_CLIENT, current_span, current_trace_id
+
+logger = logging.getLogger("app.sql")
+request_logger = logging.getLogger("app.request")
+
+# Длина текста запроса в спане трассировки
+_TRACE_STATEMENT_LIMIT = 2000
+
+class QueryStats:
+    """Число SQL-запросов и суммарное время в базе данных за один HTTP-запрос"""
+
+    __slots__ = ("count", "total_ms", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        # Счетчики по тексту запроса ведутся только в режиме поиска N+1
+        self.statements = {} if settings.N_PLUS_ONE_DETECTION else None
+
+    def repeated_statements(self, threshold: int) -> List[tuple]:
+        """Запросы одной формы, выполненные не меньше threshold раз"""
+        if not self.statements:
+            return []
+        return sorted(
+            ((statement, count) for statement, count in self.statements.items() if count >= threshold),
+            key=lambda item: item[1], reverse=True
+        )
+
+# Контекст запроса наследуется гринлетами SQLAlchemy, поэтому
+# хуки движка видят статистику текущего HTTP-запроса
+_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+# Обработчики статистики завершенных запросов (например, проверка бюджета запросов в тестах)
+_request_observers: List[Callable] = []
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _query_stats.get()
+
+def add_request_observer(callback: Callable):
+    """Подписка на статистику каждого HTTP-запроса: callback(scope, status_code, stats)"""
+    _request_observers.append(callback)
+
+def remove_request_observer(callback: Callable):
+    _request_observers.remove(callback)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    parent = current_span()
+    if parent is not None:
+        # Параметры в спан не попадают, как и в лог медленных запросов
+        context._trace_span = parent.child("db.query", KIND_CLIENT, {
+            "db.system": conn.dialect.name,
+            "db.statement": statement[:_TRACE_STATEMENT_LIMIT],
+        })
+    context._query_started_at = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - context._query_started_at) * 1000
+    trace_span = getattr(context, "_trace_span", None)
+    if trace_span is not None:
+        trace_span.set_attribute("db.rowcount", cursor.rowcount)
+        trace_span.end()
+    stats = _query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.total_ms += elapsed_ms
+        if stats.statements is not None:
+            # Параметры передаются отдельно, поэтому текст запроса и есть его форма
+            stats.statements[statement] = stats.statements.get(statement, 0) + 1
+    if elapsed_ms >= settings.SLOW_QUERY_THRESHOLD_MS:
+        # Параметры не пишем: в них бывают пароли и персональные данные
+        logger.warning("slow query", extra={
+            "duration_ms": round(elapsed_ms, 2),
+            "statement": statement,
+            "executemany": executemany,
+            "rowcount": cursor.rowcount,
+        })
+
+def _handle_error(exception_context):
+    context = exception_context.execution_context
+    trace_span = getattr(context, "_trace_span", None) if context is not None else None
+    if trace_span is not None:
+        trace_span.error = type(exception_context.original_exception).__name__
+        trace_span.end()
+
+def install_query_hooks(engine: Engine):
+    """Подключение замера времени запросов к синхронному движку"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+class QueryStatsMiddleware:
+    """ASGI middleware: счетчик SQL-запросов на HTTP-запрос, заголовок Server-Timing и итоговая запись в лог"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _query_stats.set(stats)
+        started_at = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # Заголовок уходит до тела ответа: потоковые запросы после этого момента в него не попадут
+                timing = f'db;dur={stats.total_ms:.1f};desc="{stats.count} queries"'
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _query_stats.reset(token)
+            extra = {
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status_code,
+                "duration_ms": round((time.perf_counter() - started_at) * 1000, 2),
+                "db_queries": stats.count,
+                "db_ms": round(stats.total_ms, 2),
+            }
+            # Запрос из выборки трассировки: по trace_id медленный запрос находится в файле спанов
+            trace_id = current_trace_id()
+            if trace_id is not None:
+                extra["trace_id"] = trace_id
+            request_logger.info("request", extra=extra)
+            for statement, count in stats.repeated_statements(settings.N_PLUS_ONE_THRESHOLD):
+                logger.warning("possible N+1 query", extra={
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "statement": statement,
+                    "repeats": count,
+                })
+            for observer in _request_observers:
+                observer(scope, status_code, stats)
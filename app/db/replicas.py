@@ -0,0 +1,206 @@
+import itertools
+from contextlib import asynccontextmanager
+import logging
+import math
+import time
+from contextvars import ContextVar
+from typing import AsyncIterator, List, Optional
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session
+from starlette.requests import cookie_parser
+from app.config import settings
+from app.db.database import configure_engine, engine_options, replica_urls
+from app.utils.cache import TTLCache
+from app.utils.metrics import Counter, Gauge
+
+logger = logging.getLogger("app.db.replicas")
+
+# Отставание реплики PostgreSQL в секундах; если все полученные WAL уже
+# применены, реплика актуальна, даже если на основном сервере давно не было записей
+_PG_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+READ_ROUTING = {
+    target: Counter("db_read_routing_total", "Read-only sessions by routing target", {"target": target})
+    for target in ("replica", "primary")
+}
+
+# Пользователь текущего запроса - для учета его записей (read-your-writes)
+current_user_id: ContextVar[Optional[int]] = ContextVar("current_user_id", default=None)
+
+# Пользователи, недавно писавшие в основную базу: их чтения идут на основную
+recent_writers = TTLCache(settings.USER_CACHE_MAX_SIZE, settings.REPLICA_READ_YOUR_WRITES_SECONDS)
+
+# Cookie со временем последней записи клиента: в отличие от recent_writers,
+# его видит любой воркер и любой хост, на который придет следующий запрос
+WRITE_MARKER_COOKIE = "last_write"
+
+# Отметка записи текущего запроса: {"written_at": время из cookie или коммита, "wrote": была ли запись}
+_write_marker: ContextVar[Optional[dict]] = ContextVar("write_marker", default=None)
+
+class Replica:
+    """Реплика только для чтения с периодической проверкой здоровья и отставания"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.engine = configure_engine(create_async_engine(url, **engine_options(url)))
+        self.sessionmaker = async_sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        self.healthy = True
+        self.lag = 0.0
+        self._checked_at = None
+        self._is_postgres = make_url(url).get_backend_name() == "postgresql"
+        name = make_url(url).render_as_string(hide_password=True)
+        Gauge("db_replica_healthy", "Replica is used for reads (1) or skipped (0)", {"replica": name},
+              func=lambda: int(self.healthy))
+        Gauge("db_replica_lag_seconds", "Last measured replica lag", {"replica": name},
+              func=lambda: self.lag)
+
+    def needs_check(self) -> bool:
+        return self._checked_at is None or time.monotonic() - self._checked_at >= settings.REPLICA_HEALTH_CHECK_INTERVAL
+
+    async def check(self):
+        """Замер отставания; ошибка соединения выводит реплику из ротации до следующей проверки"""
+        # Отметку ставим заранее, чтобы параллельные запросы не запускали проверку повторно
+        self._checked_at = time.monotonic()
+        try:
+            async with self.engine.connect() as connection:
+                if self._is_postgres:
+                    self.lag = float(await connection.scalar(_PG_LAG_QUERY))
+                else:
+                    # Для локальных файлов SQLite отставания нет - проверяем только доступность
+                    await connection.execute(text("SELECT 1"))
+                    self.lag = 0.0
+        except Exception:
+            logger.warning("replica health check failed", extra={"replica": self.url}, exc_info=True)
+            self.mark_unhealthy()
+            return
+        was_healthy = self.healthy
+        self.healthy = self.lag <= settings.REPLICA_MAX_LAG_SECONDS
+        if was_healthy and not self.healthy:
+            logger.warning("replica lag above limit", extra={"replica": self.url, "lag_seconds": self.lag})
+
+    def mark_unhealthy(self):
+        self.healthy = False
+        self._checked_at = time.monotonic()
+
+class ReplicaSet:
+    """Набор реплик с выбором по кругу среди здоровых"""
+
+    def __init__(self, urls: List[str]):
+        self.replicas = [Replica(url) for url in urls]
+        self._order = itertools.cycle(range(len(self.replicas))) if self.replicas else None
+
+    async def choose(self) -> Optional[Replica]:
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self._order)]
+            if replica.needs_check():
+                await replica.check()
+            if replica.healthy:
+                return replica
+        return None
+
+    async def dispose(self):
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+replica_set = ReplicaSet(replica_urls())
+
+def _wrote_recently(user_id: Optional[int]) -> bool:
+    if user_id is not None and recent_writers.get(user_id) is not None:
+        return True
+    marker = _write_marker.get()
+    if marker is None or marker["written_at"] is None:
+        return False
+    # Время из cookie задает клиент, поэтому отметки из будущего дальше окна не учитываем;
+    # небольшое расхождение часов между хостами укладывается в окно
+    return abs(time.time() - marker["written_at"]) < settings.REPLICA_READ_YOUR_WRITES_SECONDS
+
+@asynccontextmanager
+async def read_session(primary: AsyncSession, user_id: Optional[int] = None) -> AsyncIterator[AsyncSession]:
+    """Сессия для чтения: реплика, если она здорова и пользователь недавно не писал, иначе primary"""
+    replica = None
+    if not _wrote_recently(user_id):
+        replica = await replica_set.choose()
+
+    if replica is None:
+        READ_ROUTING["primary"].inc()
+        yield primary
+        return
+
+    READ_ROUTING["replica"].inc()
+    async with replica.sessionmaker() as session:
+        try:
+            yield session
+        except DBAPIError as error:
+            # Запрос уже не повторить, но следующие пойдут на основную базу
+            if error.connection_invalidated or isinstance(error, (OperationalError, InterfaceError)):
+                replica.mark_unhealthy()
+            raise
+
+@event.listens_for(Session, "after_flush")
+def _remember_write(session, flush_context):
+    session.info["has_writes"] = True
+
+@event.listens_for(Session, "after_commit")
+def _mark_recent_writer(session):
+    """После записи пользователь какое-то время читает с основной базы"""
+    if session.info.pop("has_writes", False):
+        user_id = current_user_id.get()
+        if user_id is None:
+            return
+        recent_writers.set(user_id, True)
+        marker = _write_marker.get()
+        if marker is not None:
+            marker["written_at"] = time.time()
+            marker["wrote"] = True
+
+@event.listens_for(Session, "after_rollback")
+def _forget_write(session):
+    session.info.pop("has_writes", None)
+
+def _cookie_time(scope) -> Optional[float]:
+    for name, value in scope["headers"]:
+        if name != b"cookie":
+            continue
+        written_at = cookie_parser(value.decode("latin-1")).get(WRITE_MARKER_COOKIE)
+        if written_at is not None:
+            try:
+                return float(written_at)
+            except ValueError:
+                return None
+    return None
+
+class WriteMarkerMiddleware:
+    """ASGI middleware: время последней записи клиента в cookie, чтобы read-your-writes работало на любом воркере"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        marker = {"written_at": _cookie_time(scope), "wrote": False}
+        token = _write_marker.set(marker)
+
+        async def send_with_marker(message):
+            if message["type"] == "http.response.start" and marker["wrote"]:
+                max_age = math.ceil(settings.REPLICA_READ_YOUR_WRITES_SECONDS)
+                cookie = (f"{WRITE_MARKER_COOKIE}={marker['written_at']:.3f}; Max-Age={max_age}; "
+                          "Path=/; HttpOnly; SameSite=Lax")
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", cookie.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_marker)
+        finally:
+            _write_marker.reset(token)
@@ -0,0 +1,83 @@
+"""Профиль SQLite для небольших площадок на одном сервере.
+
+WAL позволяет читателям работать параллельно с единственным писателем.
+Пишущие запросы выстраиваются в очередь внутри процесса и открывают
+транзакцию сразу с блокировкой записи (BEGIN IMMEDIATE): так писатели
+не упираются в SQLITE_BUSY при повышении блокировки посреди транзакции.
+"""
+import asyncio
+import logging
+import weakref
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.config import settings
+
+logger = logging.getLogger("app.db.sqlite")
+
+# Транзакции текущего запроса открываются с блокировкой записи
+_write_transaction: ContextVar[bool] = ContextVar("sqlite_write_transaction", default=False)
+
+# Очередь писателей - по блокировке на event loop (у каждого TestClient свой loop)
+_write_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+_enabled = False
+
+def _set_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    # Режим WAL сохраняется в файле, но переключение не удается, пока файл открыт
+    # другим соединением в старом режиме - SQLite тогда молча оставляет прежний
+    journal_mode = cursor.fetchone()[0]
+    if journal_mode.lower() not in ("wal", "memory"):
+        logger.warning("SQLite WAL mode not enabled", extra={"journal_mode": journal_mode})
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    # Отрицательное значение cache_size задается в КиБ
+    cursor.execute(f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+def _disable_driver_transactions(dbapi_connection, connection_record):
+    # Транзакциями управляем сами (событие begin), драйвер не должен открывать их неявно
+    dbapi_connection.isolation_level = None
+
+def _begin(connection):
+    connection.exec_driver_sql("BEGIN IMMEDIATE" if _write_transaction.get() else "BEGIN")
+
+def configure_sqlite(engine: Engine, manage_transactions: bool = True):
+    """Подключение настроек соединений SQLite к синхронному движку.
+
+    manage_transactions=False оставляет только PRAGMA - для вспомогательных
+    движков, которые не участвуют в очереди писателей (например, в тестах).
+    """
+    event.listen(engine, "connect", _set_pragmas)
+    if manage_transactions:
+        global _enabled
+        _enabled = True
+        event.listen(engine, "connect", _disable_driver_transactions)
+        event.listen(engine, "begin", _begin)
+
+async def sqlite_writer():
+    """Зависимость для пишущих эндпоинтов: один писатель на процесс при работе на SQLite"""
+    if not _enabled:
+        yield
+        return
+
+    loop = asyncio.get_running_loop()
+    lock = _write_locks.get(loop)
+    if lock is None:
+        lock = _write_locks[loop] = asyncio.Lock()
+
+    async with lock:
+        token = _write_transaction.set(True)
+        try:
+            yield
+        finally:
+            _write_transaction.reset(token)
+
+# Та же очередь писателей для кода вне запросов (фоновые задачи): async with sqlite_write(): ...
+sqlite_write = asynccontextmanager(sqlite_writer)
@@ -0,0 +1,60 @@
+"""Заранее построенные запросы горячего пути.
+
+Запросы собираются один раз при импорте, значения передаются через
+bindparam при выполнении: db.execute(ACTIVE_ROOM_BY_ID, {"room_id": 1}).
+Так на каждый вызов не строятся объекты select() и не вычисляется
+ключ кэша компиляции - он запоминается в самом объекте запроса.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, select
+from app.config import settings
+from app.models.booking import Booking, BookingStatus
+from app.models.room import Room
+from app.models.user import User
+
+# Статусы, при которых бронирование занимает комнату
+ACTIVE_BOOKING_STATUSES = (BookingStatus.PENDING, BookingStatus.CONFIRMED)
+
+# Активная комната по идентификатору: room_id
+ACTIVE_ROOM_BY_ID = select(Room).where(Room.id == bindparam("room_id"), Room.is_active == True)
+
+# Пользователь по имени: username
+USER_BY_USERNAME = select(User).where(User.username == bindparam("username"))
+
+def period_params(room_id: int, start_time: datetime, end_time: datetime, **params) -> dict:
+    """Параметры запросов по периоду.
+
+    earliest_start - нижняя граница start_time: бронирование длиннее
+    BOOKING_MAX_DURATION_HOURS невозможно (API их не создает, а миграция 006
+    не выполняется при действующих более длинных), поэтому более ранние
+    партиции bookings не просматриваются.
+    """
+    return {
+        "room_id": room_id,
+        "start_time": start_time,
+        "end_time": end_time,
+        "earliest_start": start_time - timedelta(hours=settings.BOOKING_MAX_DURATION_HOURS),
+        **params,
+    }
+
+# Активные бронирования комнаты, пересекающие период: period_params(...)
+_overlapping = select(Booking.id).where(
+    Booking.room_id == bindparam("room_id"),
+    Booking.status.in_(ACTIVE_BOOKING_STATUSES),
+    Booking.start_time > bindparam("earliest_start"),
+    Booking.start_time < bindparam("end_time"),
+    Booking.end_time > bindparam("start_time")
+)
+OVERLAPPING_BOOKING = _overlapping.limit(1)
+
+# То же без изменяемого бронирования: period_params(..., exclude_id=...)
+OVERLAPPING_BOOKING_EXCLUDING = _overlapping.where(Booking.id != bindparam("exclude_id")).limit(1)
+
+# Занятые интервалы комнаты в периоде по времени начала: period_params(...)
+ROOM_BOOKINGS_IN_PERIOD = select(Booking.id, Booking.start_time, Booking.end_time).where(
+    Booking.room_id == bindparam("room_id"),
+    Booking.status.in_(ACTIVE_BOOKING_STATUSES),
+    Booking.start_time > bindparam("earliest_start"),
+    Booking.start_time < bindparam("end_time"),
+    Booking.end_time > bindparam("start_time")
+).order_by(Booking.start_time)
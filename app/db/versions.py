@@ -0,0 +1,128 @@
+"""Версии областей данных для условных GET-запросов.
+
+Каждый flush ORM-сессии увеличивает версии затронутых областей (scope)
+в той же транзакции. ETag ответа строится из версий, а не из его
+содержимого, поэтому совпадение проверяется одним запросом по первичному
+ключу, без выполнения основного запроса. Записи в обход сессии (сырой
+SQL, скрипты обслуживания) должны вызывать bump_versions сами.
+
+Измененные строки bookings и rooms получают change_version - очередное
+значение счетчика CHANGES (лента GET /changes). Строка счетчика остается
+заблокированной до конца транзакции, поэтому транзакции с записями
+фиксируются в порядке своих версий и клиент, прочитавший версию N, не
+пропустит позже зафиксированную строку с версией меньше N.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, Set, Tuple
+from sqlalchemy import bindparam, event, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.models.booking import Booking
+from app.models.data_version import DataVersion
+from app.models.room import Room
+
+# Области данных
+ROOMS = "rooms"
+BOOKINGS = "bookings"
+
+# Счетчик версий изменений строк bookings и rooms
+CHANGES = "changes"
+
+def room_scope(room_id: int) -> str:
+    return f"room:{room_id}"
+
+def user_bookings_scope(user_id: int) -> str:
+    return f"bookings:user:{user_id}"
+
+def room_bookings_scope(room_id: int) -> str:
+    return f"bookings:room:{room_id}"
+
+DATA_VERSIONS = select(DataVersion.scope, DataVersion.version, DataVersion.updated_at).where(
+    DataVersion.scope.in_(bindparam("scopes", expanding=True))
+)
+
+_UPSERT_DIALECTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+def bump_versions(connection: Connection, scopes: Iterable[str]):
+    """Увеличение версий областей в текущей транзакции"""
+    # Одинаковый порядок блокировки строк у параллельных транзакций исключает взаимоблокировки
+    scopes = sorted(set(scopes))
+    if not scopes:
+        return
+    now = datetime.utcnow()
+
+    insert = _UPSERT_DIALECTS.get(connection.dialect.name)
+    if insert is not None:
+        statement = insert(DataVersion).values([{"scope": scope, "version": 1, "updated_at": now} for scope in scopes])
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=[DataVersion.scope],
+            set_={"version": DataVersion.version + 1, "updated_at": statement.excluded.updated_at},
+        ))
+        return
+
+    for scope in scopes:
+        result = connection.execute(
+            update(DataVersion).where(DataVersion.scope == scope)
+            .values(version=DataVersion.version + 1, updated_at=now)
+        )
+        if result.rowcount == 0:
+            connection.execute(DataVersion.__table__.insert().values(scope=scope, version=1, updated_at=now))
+
+def next_version(connection: Connection, scope: str) -> int:
+    """Увеличение версии одной области с возвратом нового значения"""
+    now = datetime.utcnow()
+
+    insert = _UPSERT_DIALECTS.get(connection.dialect.name)
+    if insert is not None:
+        statement = insert(DataVersion).values(scope=scope, version=1, updated_at=now)
+        return connection.execute(statement.on_conflict_do_update(
+            index_elements=[DataVersion.scope],
+            set_={"version": DataVersion.version + 1, "updated_at": statement.excluded.updated_at},
+        ).returning(DataVersion.version)).scalar_one()
+
+    bump_versions(connection, [scope])
+    return connection.execute(select(DataVersion.version).where(DataVersion.scope == scope)).scalar_one()
+
+async def read_versions(db: AsyncSession, scopes: Iterable[str]) -> Dict[str, Tuple[int, datetime]]:
+    """Текущие версии областей; области без записей отсутствуют в результате"""
+    result = await db.execute(DATA_VERSIONS, {"scopes": list(scopes)})
+    return {row.scope: (row.version, row.updated_at) for row in result}
+
+def _is_changed(session: Session, obj) -> bool:
+    return obj not in session.dirty or session.is_modified(obj)
+
+def _changed_scopes(session: Session) -> Set[str]:
+    scopes = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if not _is_changed(session, obj):
+            continue
+        if isinstance(obj, Room):
+            scopes.update((ROOMS, room_scope(obj.id)))
+        elif isinstance(obj, Booking):
+            scopes.update((BOOKINGS, user_bookings_scope(obj.user_id), room_bookings_scope(obj.room_id)))
+    return scopes
+
+@event.listens_for(Session, "after_flush")
+def _bump_changed_versions(session, flush_context):
+    """Версии меняются в транзакции записи: откат записи откатывает и их"""
+    scopes = _changed_scopes(session)
+    if scopes:
+        bump_versions(session.connection(), scopes)
+
+@event.listens_for(Session, "before_flush")
+def _stamp_change_versions(session, flush_context, instances):
+    """Одна версия изменений на flush для всех записываемых бронирований и комнат"""
+    changed = [
+        obj for obj in (*session.new, *session.dirty)
+        if isinstance(obj, (Booking, Room)) and _is_changed(session, obj)
+    ]
+    if not changed:
+        return
+
+    version = next_version(session.connection(), CHANGES)
+    now = datetime.utcnow()
+    for obj in changed:
+        obj.change_version = version
+        obj.updated_at = now
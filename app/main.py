@@ -1,28 +1,153 @@
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
 from app.config import settings
+from app.controllers import analytics, auth, batch, booking, changes, events, room
+from app.db.database import async_session, engine, get_db, session_dependency, warm_up_pool
+from app.db.partitions import ensure_partitions_on_startup
+from app.db.query_log import QueryStatsMiddleware
+from app.db.replicas import WriteMarkerMiddleware, replica_set
+from app.utils.http_metrics import HTTPMetricsMiddleware
+from app.utils.tracing import TracingMiddleware, setup_tracing, shutdown_tracing
+from app.utils.metrics import render_prometheus
+from app.utils.rate_limit import RateLimitMiddleware
+from app.utils.security import token_versions
+from app.utils.reports import shutdown_report_executor
+from app.utils.tasks import task_queue
+from app.utils.events import broker
+from app.utils.log import setup_logging, shutdown_logging
+
+logger = logging.getLogger("app.main")
+
+async def warm_up(db_engine: AsyncEngine, session_factory: async_sessionmaker):
+    """Прогрев воркера до приема запросов: соединения пула, проверка реплик, карта версий токенов"""
+    try:
+        connections = await warm_up_pool(db_engine, settings.DB_POOL_WARMUP_CONNECTIONS)
+        for replica in replica_set.replicas:
+            await replica.check()
+        async with session_factory() as session:
+            await token_versions.refresh(session)
+    except Exception:
+        # База может быть еще недоступна: воркер стартует, соединения откроются с первыми запросами
+        logger.exception("warm-up failed")
+        return
+    logger.info("worker warmed up", extra={"pool_connections": connections})
+
+@asynccontextmanager
+async def lifespan(application: FastAPI):
+    """Подготовка воркера до приема запросов и остановка фоновых процессов после последнего ответа"""
+    db_engine = application.state.db_engine
+    setup_logging()
+    setup_tracing()
+    await ensure_partitions_on_startup(db_engine)
+    await warm_up(db_engine, application.state.session_factory)
+    await task_queue.start(application.state.session_factory)
+    await broker.start()
+
+    yield
+
+    await broker.stop()
+    # Фоновые задачи используют пул соединений - останавливаем их до закрытия пула
+    await task_queue.stop()
+    shutdown_report_executor()
+    await replica_set.dispose()
+    await db_engine.dispose()
+    shutdown_tracing()
+    shutdown_logging()
 
-# Создание экземпляра приложения
-app = FastAPI(
-    title=settings.APP_NAME,
-    description="API для системы управления коворкингом",
-    version="1.0.0"
-)
-
-# Настройка CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-@app.get("/")
 async def root():
     """Корневой эндпоинт"""
     return {
         "message": "Welcome to Coworking Management System API",
         "docs": "/docs",
         "version": "1.0.0"
-    }
\ No newline at end of file
+    }
+
+async def metrics():
+    """Метрики в формате Prometheus"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+def create_app(db_engine: Optional[AsyncEngine] = None,
+               session_factory: Optional[async_sessionmaker] = None) -> FastAPI:
+    """Сборка приложения: middleware, маршруты и жизненный цикл.
+
+    По умолчанию приложение работает с базой из настроек (DATABASE_URL).
+    С другим движком (тесты, встраивание) запросы, подготовка при запуске
+    и фоновые задачи используют его и фабрику сессий session_factory.
+    """
+    application = FastAPI(
+        title=settings.APP_NAME,
+        description="API для системы управления коворкингом",
+        version="1.0.0",
+        lifespan=lifespan
+    )
+    if db_engine is None:
+        db_engine, session_factory = engine, session_factory or async_session
+    elif session_factory is None:
+        session_factory = async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+    application.state.db_engine = db_engine
+    application.state.session_factory = session_factory
+    if session_factory is not async_session:
+        application.dependency_overrides[get_db] = session_dependency(session_factory)
+
+    # Сжатие ответов больше порога: brotli, если установлен brotli-asgi, иначе gzip
+    try:
+        from brotli_asgi import BrotliMiddleware
+    except ImportError:
+        application.add_middleware(
+            GZipMiddleware,
+            minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+            compresslevel=settings.GZIP_COMPRESS_LEVEL
+        )
+    else:
+        application.add_middleware(
+            BrotliMiddleware,
+            minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+            gzip_fallback=True
+        )
+
+    # Отметка записи клиента для read-your-writes на репликах: запись и чтение могут попасть на разные воркеры
+    application.add_middleware(WriteMarkerMiddleware)
+
+    # Статистика SQL-запросов: внутренний слой, чтобы не учитывать отклоненные лимитом запросы
+    application.add_middleware(QueryStatsMiddleware)
+
+    # Трассировка: корневой спан снаружи статистики запросов, чтобы лог запроса содержал trace_id
+    application.add_middleware(TracingMiddleware)
+
+    # Ограничение частоты запросов (CORS подключается позже и оборачивает ответы 429)
+    if settings.RATE_LIMIT_ENABLED:
+        application.add_middleware(RateLimitMiddleware)
+
+    # Настройка CORS
+    application.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Метрики HTTP-запросов: внешний слой, учитывает и ответы 429 и preflight-запросы CORS
+    application.add_middleware(HTTPMetricsMiddleware)
+
+    # Маршруты
+    application.include_router(auth.router, tags=["auth"])
+    application.include_router(room.router, prefix="/rooms", tags=["rooms"])
+    application.include_router(booking.router, prefix="/bookings", tags=["bookings"])
+    application.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
+    application.include_router(batch.router, tags=["batch"])
+    application.include_router(events.router, tags=["events"])
+    application.include_router(changes.router, tags=["changes"])
+
+    application.add_api_route("/", root, methods=["GET"])
+    application.add_api_route("/metrics", metrics, methods=["GET"], include_in_schema=False)
+    return application
+
+# Экземпляр приложения для ASGI-серверов: app.main:app
+app = create_app()
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+class BackgroundTask(Base):
+    """Сохраненная фоновая задача (app/utils/tasks.py).
+
+    Строка добавляется в транзакции запроса, поставившего задачу, и
+    удаляется после успешного выполнения. locked_until - аренда воркера,
+    держащего задачу в памяти: задачи с истекшей арендой (воркер
+    остановился) забирает другой воркер. Задача, исчерпавшая попытки,
+    остается с locked_until = NULL и текстом последней ошибки.
+    """
+    __tablename__ = "background_tasks"
+    __table_args__ = (
+        Index("ix_background_tasks_locked_until", "locked_until"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False)
+    payload = Column(Text, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    run_at = Column(DateTime, nullable=False)
+    locked_until = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=func.now())
@@ -1,7 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum
+from sqlalchemy import BigInteger, Column, Integer, String, Float, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
-from app.db.database import Base
+from app.db.database import Base, relationship_loading
 import enum
 
 class BookingStatus(str, enum.Enum):
@@ -14,6 +14,15 @@ class BookingStatus(str, enum.Enum):
 class Booking(Base):
     """Модель бронирования"""
     __tablename__ = "bookings"
+    # В PostgreSQL таблица секционирована по месяцам start_time (миграция 006):
+    # запросы должны ограничивать start_time с обеих сторон, чтобы затрагивать только нужные партиции
+    __table_args__ = (
+        Index("ix_bookings_room_id_start_time", "room_id", "start_time"),
+        Index("ix_bookings_user_id_start_time", "user_id", "start_time"),
+        # Лента изменений: все изменения (администратор) и изменения бронирований пользователя
+        Index("ix_bookings_change_version", "change_version"),
+        Index("ix_bookings_user_id_change_version", "user_id", "change_version"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -24,7 +33,10 @@ class Booking(Base):
     status = Column(Enum(BookingStatus), default=BookingStatus.PENDING)
     total_price = Column(Float)
     notes = Column(String, nullable=True)
+    # Версия и время последнего изменения, выставляются при flush (app/db/versions.py)
+    change_version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, default=func.now())
 
     # Отношения
-    user = relationship("User", back_populates="bookings")
-    room = relationship("Room", back_populates="bookings")
\ No newline at end of file
+    user = relationship("User", back_populates="bookings", lazy=relationship_loading())
+    room = relationship("Room", back_populates="bookings", lazy=relationship_loading())
\ No newline at end of file
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from app.db.database import Base
+
+class DataVersion(Base):
+    """Счетчик версии области данных (список комнат, бронирования пользователя и т.п.)"""
+    __tablename__ = "data_versions"
+
+    scope = Column(String(64), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False)
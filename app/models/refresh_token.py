@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from app.db.database import Base, relationship_loading
+
+class RefreshToken(Base):
+    """Модель refresh-токена.
+
+    Хранится только SHA-256 от токена. Все токены одной цепочки ротации
+    имеют общий family_id, что позволяет отозвать цепочку целиком при
+    повторном использовании уже обмененного токена.
+    """
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False)
+    family_id = Column(String(32), index=True, nullable=False)
+    token_hash = Column(String(64), unique=True, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    used_at = Column(DateTime, nullable=True)
+
+    # Отношения
+    user = relationship("User", lazy=relationship_loading())
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, Text
+from sqlalchemy import BigInteger, Column, Integer, String, Float, Boolean, DateTime, Text
 from sqlalchemy.orm import relationship
-from app.db.database import Base
+from sqlalchemy.sql import func
+from app.db.database import Base, relationship_loading
 
 class Room(Base):
     """Модель комнаты"""
@@ -16,6 +17,9 @@ class Room(Base):
     has_video_conf = Column(Boolean, default=False)
     is_active = Column(Boolean, default=True)
     image_url = Column(String, nullable=True)
+    # Версия и время последнего изменения, выставляются при flush (app/db/versions.py)
+    change_version = Column(BigInteger, nullable=False, default=0, index=True)
+    updated_at = Column(DateTime, default=func.now())
 
     # Отношения
-    bookings = relationship("Booking", back_populates="room")
\ No newline at end of file
+    bookings = relationship("Booking", back_populates="room", lazy=relationship_loading())
\ No newline at end of file
@@ -1,6 +1,12 @@
-from sqlalchemy import Column, Integer, String, Boolean
+from sqlalchemy import Column, Integer, String, Boolean, Enum
 from sqlalchemy.orm import relationship
-from app.db.database import Base
+from app.db.database import Base, relationship_loading
+import enum
+
+class UserRole(str, enum.Enum):
+    """Роли пользователей"""
+    USER = "user"
+    ADMIN = "admin"
 
 class User(Base):
     """Модель пользователя"""
@@ -12,8 +18,11 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     full_name = Column(String, nullable=True)
     phone = Column(String, nullable=True)
-    role = Column(String, default="user")
+    role = Column(Enum(UserRole), default=UserRole.USER)
     is_active = Column(Boolean, default=True)
+    # Версия токенов: увеличивается при деактивации и смене роли,
+    # токены с меньшей версией считаются отозванными
+    token_version = Column(Integer, default=0, nullable=False)
 
     # Отношения
-    bookings = relationship("Booking", back_populates="user")
\ No newline at end of file
+    bookings = relationship("Booking", back_populates="user", lazy=relationship_loading())
\ No newline at end of file
@@ -0,0 +1,38 @@
+from typing import Any, Dict, List, Optional, Union
+from pydantic import BaseModel, validator
+
+class BatchItem(BaseModel):
+    """Подзапрос пакета"""
+    id: Optional[str] = None
+    method: str = "GET"
+    path: str
+    params: Dict[str, Union[str, int, float, bool, List[Union[str, int, float, bool]]]] = {}
+    headers: Dict[str, str] = {}
+
+    @validator('method')
+    def method_must_be_get(cls, v):
+        # Порядок параллельных записей не определен - в пакете только чтение
+        if v.upper() != "GET":
+            raise ValueError('Only GET requests can be batched')
+        return "GET"
+
+    @validator('path')
+    def path_must_be_absolute(cls, v):
+        if not v.startswith("/"):
+            raise ValueError('Path must start with /')
+        return v
+
+class BatchRequest(BaseModel):
+    """Схема пакета запросов"""
+    requests: List[BatchItem]
+
+class BatchItemResult(BaseModel):
+    """Результат подзапроса"""
+    id: Optional[str] = None
+    status: int
+    headers: Dict[str, str]
+    body: Any = None
+
+class BatchResponse(BaseModel):
+    """Схема ответа на пакет: результаты в порядке подзапросов"""
+    responses: List[BatchItemResult]
@@ -47,7 +47,7 @@ class BookingInDB(BookingBase):
     total_price: float
 
     class Config:
-        orm_mode = True
+        from_attributes = True
 
 class Booking(BookingInDB):
     """Схема бронирования для ответа API"""
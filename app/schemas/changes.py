@@ -0,0 +1,13 @@
+from typing import List
+from pydantic import BaseModel
+from app.schemas.booking import Booking
+from app.schemas.room import Room
+
+class ChangeFeed(BaseModel):
+    """Схема ленты изменений: строки, измененные после версии since"""
+    version: int
+    has_more: bool
+    bookings: List[Booking]
+    rooms: List[Room]
+    cancelled_bookings: List[int]
+    deleted_rooms: List[int]
@@ -0,0 +1,48 @@
+from typing import Optional
+from datetime import datetime
+from enum import Enum
+from pydantic import BaseModel, validator
+
+class ReportType(str, Enum):
+    """Типы выгружаемых отчетов"""
+    USER_SPENDING = "user-spending"
+    ROOM_UTILIZATION = "room-utilization"
+
+class ReportFormat(str, Enum):
+    """Форматы файлов отчетов"""
+    CSV = "csv"
+    JSON = "json"
+
+class ReportStatus(str, Enum):
+    """Статусы задачи формирования отчета"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class ReportCreate(BaseModel):
+    """Схема для постановки отчета в очередь"""
+    report_type: ReportType
+    format: ReportFormat = ReportFormat.CSV
+    start_date: datetime
+    end_date: datetime
+
+    @validator('end_date')
+    def end_date_must_be_after_start_date(cls, v, values):
+        if 'start_date' in values and v <= values['start_date']:
+            raise ValueError('End date must be after start date')
+        return v
+
+class ReportJob(BaseModel):
+    """Схема задачи формирования отчета для ответа API"""
+    id: str
+    report_type: ReportType
+    format: ReportFormat
+    status: ReportStatus
+    start_date: datetime
+    end_date: datetime
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    row_count: Optional[int] = None
+    error: Optional[str] = None
+    download_url: Optional[str] = None
@@ -58,7 +58,7 @@ class RoomInDB(RoomBase):
     is_active: bool
 
     class Config:
-        orm_mode = True
+        from_attributes = True
 
 class Room(RoomInDB):
     """Схема комнаты для ответа API"""
@@ -5,7 +5,15 @@ class Token(BaseModel):
     """Схема токена доступа"""
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class RefreshTokenRequest(BaseModel):
+    """Схема запроса на обмен или отзыв refresh-токена"""
+    refresh_token: str
 
 class TokenData(BaseModel):
     """Схема данных токена"""
-    username: Optional[str] = None
\ No newline at end of file
+    username: Optional[str] = None
+    id: Optional[int] = None
+    role: Optional[str] = None
+    version: int = 0
\ No newline at end of file
@@ -36,7 +36,7 @@ class UserInDB(UserBase):
     is_active: bool
 
     class Config:
-        orm_mode = True
+        from_attributes = True
 
 class User(UserInDB):
     """Схема пользователя для ответа API"""
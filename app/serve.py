@@ -0,0 +1,86 @@
+"""Запуск API в production: python -m app.serve
+
+Число воркеров по умолчанию равно числу доступных процессу ядер, каждый
+воркер - отдельный процесс со своим event loop и пулом соединений. Если
+установлены uvloop и httptools, используются они. При SIGTERM сервер
+перестает принимать соединения, закрывает потоки событий (клиенты
+переподключаются к другому экземпляру) и до SERVER_GRACEFUL_SHUTDOWN_SECONDS
+ждет завершения начатых запросов - бронирование не обрывается посреди
+транзакции. Воркер начинает принимать запросы после прогрева пула (lifespan).
+
+Поток изменений GET /events при нескольких воркерах требует общего канала
+(EVENTS_BACKEND=redis): с каналом в памяти клиент получает только
+изменения, записанные через его воркер.
+"""
+import argparse
+import importlib.util
+import logging
+import os
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+from app.config import settings
+
+def default_workers() -> int:
+    """Число ядер, доступных процессу (с учетом ограничения affinity в контейнере)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+class Server(uvicorn.Server):
+    """Сервер, закрывающий потоки событий до ожидания начатых запросов"""
+
+    async def shutdown(self, sockets=None):
+        # Бесконечные ответы GET /events иначе держали бы остановку до таймаута
+        from app.utils.events import broker
+        broker.close()
+        await super().shutdown(sockets=sockets)
+
+def build_config(args: argparse.Namespace) -> uvicorn.Config:
+    return uvicorn.Config(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop="uvloop" if _installed("uvloop") else "asyncio",
+        http="httptools" if _installed("httptools") else "h11",
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.SERVER_KEEPALIVE_SECONDS,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_SHUTDOWN_SECONDS,
+        limit_concurrency=settings.SERVER_LIMIT_CONCURRENCY or None,
+        # Прокси и балансировщик передают адрес клиента в X-Forwarded-For
+        proxy_headers=True,
+        # Запросы пишет в лог middleware статистики запросов
+        access_log=False,
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Запуск API коворкинга")
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS or default_workers(),
+                        help="число процессов (по умолчанию - число доступных ядер)")
+    args = parser.parse_args()
+    if settings.PASSWORD_HASH_CALIBRATE_ON_STARTUP:
+        # Один замер до запуска воркеров: иначе каждый подобрал бы свою стоимость хеширования
+        from app.utils.password_calibration import apply_calibration, calibrate
+        apply_calibration(calibrate())
+    config = build_config(args)
+    if config.workers > 1 and settings.EVENTS_BACKEND == "memory":
+        logging.getLogger("app.serve").warning(
+            "EVENTS_BACKEND=memory with %d workers: /events subscribers only see changes made "
+            "through their own worker, set EVENTS_BACKEND=redis", config.workers
+        )
+
+    server = Server(config)
+    if config.workers > 1:
+        # Сокет открывается в главном процессе и наследуется воркерами
+        Multiprocess(config, target=server.run, sockets=[config.bind_socket()]).run()
+    else:
+        server.run()
+
+if __name__ == "__main__":
+    main()
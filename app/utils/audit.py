@@ -0,0 +1,16 @@
+import logging
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.utils.tasks import background_task, task_queue
+
+# Журнал аудита - отдельный логгер, чтобы направлять его в отдельное хранилище
+audit_logger = logging.getLogger("app.audit")
+
+@background_task("audit.record")
+async def write_audit_record(action: str, actor_id: Optional[int], **details):
+    """Запись действия пользователя в журнал аудита"""
+    audit_logger.info(action, extra={"action": action, "actor_id": actor_id, **details})
+
+def audit(db: Optional[AsyncSession], action: str, actor_id: Optional[int], **details):
+    """Постановка записи аудита; с сессией - только если ее транзакция будет зафиксирована"""
+    task_queue.enqueue("audit.record", db, action=action, actor_id=actor_id, **details)
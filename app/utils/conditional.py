@@ -0,0 +1,76 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional
+from fastapi import Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.versions import read_versions
+
+class Validators:
+    """ETag и Last-Modified ответа, вычисленные по версиям областей данных"""
+
+    def __init__(self, etag: str, last_modified: Optional[datetime], cache_control: str):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.cache_control = cache_control
+
+    def matches(self, request: Request) -> bool:
+        """Есть ли у клиента актуальная копия ответа"""
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            # If-None-Match сравнивается слабо: W/"x" совпадает с "x"
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or self.etag in tags
+
+        # If-Modified-Since учитывается только без If-None-Match
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since and self.last_modified is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            # Время в базе хранится в UTC без часового пояса
+            if since.tzinfo is not None:
+                since = since.astimezone(timezone.utc).replace(tzinfo=None)
+            return self.last_modified.replace(microsecond=0) <= since
+        return False
+
+    def apply(self, response: Response) -> Response:
+        """Добавление заголовков кэширования к ответу"""
+        response.headers["etag"] = self.etag
+        response.headers["cache-control"] = self.cache_control
+        if self.last_modified is not None:
+            response.headers["last-modified"] = format_datetime(
+                self.last_modified.replace(tzinfo=timezone.utc), usegmt=True
+            )
+        return response
+
+    def not_modified(self) -> Response:
+        """Ответ 304 без тела"""
+        return self.apply(Response(status_code=304))
+
+async def conditional_get(
+    request: Request,
+    db: AsyncSession,
+    scopes: Iterable[str],
+    cache_control: str,
+    variant: str = ""
+) -> Validators:
+    """Валидаторы ответа для областей данных scopes.
+
+    ETag зависит от пути, параметров запроса, версий областей и variant -
+    части ответа, зависящей от пользователя (например, его id и роли).
+    """
+    scopes = sorted(scopes)
+    versions = await read_versions(db, scopes)
+
+    key = hashlib.blake2b(digest_size=16)
+    key.update(request.url.path.encode())
+    for name, value in sorted(request.query_params.multi_items()):
+        key.update(f"&{name}={value}".encode())
+    key.update(f"|{variant}|".encode())
+    for scope in scopes:
+        key.update(f"{scope}:{versions.get(scope, (0,))[0]};".encode())
+
+    updated = [updated_at for _, updated_at in versions.values()]
+    return Validators(f'"{key.hexdigest()}"', max(updated) if updated else None, cache_control)
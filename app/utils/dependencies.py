@@ -1,12 +1,24 @@
 from fastapi import Depends, HTTPException, status
-from app.utils.security import get_current_active_user
-from app.models.user import User, UserRole
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import get_db
+from app.db.replicas import read_session
+from app.utils.security import get_token_data
+from app.models.user import UserRole
+from app.schemas.token import TokenData
 
-def get_current_admin(current_user: User = Depends(get_current_active_user)):
+async def get_current_admin(current_user: TokenData = Depends(get_token_data)):
     """Проверка, что текущий пользователь является администратором"""
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
         )
-    return current_user
\ No newline at end of file
+    return current_user
+
+async def get_read_db(
+    current_user: TokenData = Depends(get_token_data),
+    db: AsyncSession = Depends(get_db)
+):
+    """Сессия только для чтения: реплика или основная база (read-your-writes, отставание реплик)"""
+    async with read_session(db, current_user.id) as session:
+        yield session
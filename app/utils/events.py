@@ -0,0 +1,311 @@
+"""Уведомления клиентов об изменениях бронирований и комнат.
+
+Изменения собираются при flush ORM-сессии и публикуются только после
+commit, поэтому клиенты не увидят отмененную запись. У каждой подписки
+своя ограниченная очередь: если клиент не успевает читать, очередь
+очищается и вместо пропущенных событий он получает одно событие resync -
+сигнал загрузить данные заново.
+
+Изменения передаются подписчикам через канал (EVENTS_BACKEND): memory -
+в пределах процесса (один воркер), redis - поток Redis, общий для всех
+воркеров и хостов. Идентификаторы событий назначает канал, поэтому при
+общем канале переподключение с Last-Event-ID досылает пропущенное с
+любого воркера.
+"""
+import asyncio
+import importlib
+import itertools
+import logging
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import AsyncIterator, Deque, Iterable, List, Optional, Set, Tuple
+import orjson
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.booking import Booking, BookingStatus
+from app.models.room import Room
+from app.utils.metrics import Counter, Gauge
+
+logger = logging.getLogger("app.events")
+
+# Поля бронирования, которые видят все подписчики комнаты (занятость без личных данных)
+_PUBLIC_BOOKING_FIELDS = ("id", "room_id", "start_time", "end_time", "status")
+
+EVENTS_PUBLISHED = Counter("events_published_total", "Change events published to subscribers")
+EVENTS_RESYNCS = Counter("events_resync_total", "Subscribers that overflowed their queue and were sent resync")
+
+class Subscription:
+    """Подписка одного соединения: фильтр по пользователю и комнатам и очередь событий"""
+
+    def __init__(self, user_id: int, is_admin: bool, room_ids: Optional[Set[int]] = None):
+        self.user_id = user_id
+        self.is_admin = is_admin
+        self.room_ids = room_ids
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+
+    def payload(self, change: dict) -> Optional[dict]:
+        """Данные события для этого подписчика; None - событие ему не предназначено"""
+        if not change["type"].startswith("booking."):
+            return change["data"]
+
+        data = change["data"]
+        if self.is_admin or data.get("user_id") == self.user_id:
+            return data
+        if self.room_ids is None or data.get("room_id") in self.room_ids:
+            return {key: data[key] for key in _PUBLIC_BOOKING_FIELDS if key in data}
+        return None
+
+    def offer(self, event_id: Optional[str], change: dict):
+        data = self.payload(change)
+        if data is None:
+            return
+        try:
+            self.queue.put_nowait({"id": event_id, "type": change["type"], "data": data})
+        except asyncio.QueueFull:
+            # Медленный клиент: пропущенные события заменяем одним resync
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"id": event_id, "type": "resync", "data": {}})
+            EVENTS_RESYNCS.inc()
+
+class EventChannel(ABC):
+    """Канал изменений: каждый подключенный брокер получает изменения всех брокеров канала"""
+
+    # Общий канал нужен и воркерам без подписчиков: их изменения ждут другие воркеры
+    shared = True
+
+    @abstractmethod
+    async def publish(self, changes: List[dict]):
+        """Отправка изменений всем брокерам канала"""
+
+    @abstractmethod
+    def listen(self) -> AsyncIterator[Tuple[str, dict]]:
+        """Изменения с идентификаторами событий в порядке публикации"""
+
+    async def close(self):
+        pass
+
+class MemoryChannel(EventChannel):
+    """Канал в памяти процесса: изменения видят только брокеры этого процесса"""
+
+    shared = False
+
+    def __init__(self):
+        # Номера событий начинаются заново при перезапуске процесса: префикс отличает
+        # номера прежнего запуска, по которым события уже не дослать
+        self.epoch = uuid.uuid4().hex[:8]
+        self._ids = itertools.count(1)
+        self._listeners: Set[asyncio.Queue] = set()
+
+    async def publish(self, changes: List[dict]):
+        for change in changes:
+            event_id = f"{self.epoch}-{next(self._ids)}"
+            for listener in list(self._listeners):
+                listener.put_nowait((event_id, change))
+
+    def listen(self) -> AsyncIterator[Tuple[str, dict]]:
+        # Слушатель регистрируется сразу, а не при первой итерации
+        listener: asyncio.Queue = asyncio.Queue()
+        self._listeners.add(listener)
+        return self._drain(listener)
+
+    async def _drain(self, listener: asyncio.Queue):
+        try:
+            while True:
+                yield await listener.get()
+        finally:
+            self._listeners.discard(listener)
+
+class RedisChannel(EventChannel):
+    """Поток Redis: общий для всех воркеров, идентификаторы событий - идентификаторы записей потока"""
+
+    def __init__(self, url: Optional[str] = None, stream: Optional[str] = None):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("EVENTS_BACKEND=redis requires the 'redis' package")
+        self._client = redis.from_url(url or settings.EVENTS_REDIS_URL)
+        self.stream = stream or settings.EVENTS_REDIS_STREAM
+
+    async def publish(self, changes: List[dict]):
+        async with self._client.pipeline(transaction=False) as pipe:
+            for change in changes:
+                # Поток хранит не больше буфера переподключения
+                pipe.xadd(self.stream, {"change": orjson.dumps(change)},
+                          maxlen=settings.EVENTS_REPLAY_SIZE, approximate=True)
+            await pipe.execute()
+
+    async def listen(self) -> AsyncIterator[Tuple[str, dict]]:
+        # Читаем с последней записи на момент подключения, а не с "$" при каждом чтении:
+        # запись между двумя чтениями иначе была бы пропущена
+        last = await self._client.xrevrange(self.stream, count=1)
+        last_id = last[0][0] if last else b"0-0"
+        while True:
+            response = await self._client.xread({self.stream: last_id}, block=5000)
+            for _, entries in response or ():
+                for entry_id, fields in entries:
+                    last_id = entry_id
+                    yield entry_id.decode(), orjson.loads(fields[b"change"])
+
+    async def close(self):
+        await self._client.aclose()
+
+def get_event_channel() -> EventChannel:
+    """Создание канала по EVENTS_BACKEND: memory, redis или module:Class"""
+    backend = settings.EVENTS_BACKEND
+    if backend == "memory":
+        return MemoryChannel()
+    if backend == "redis":
+        return RedisChannel()
+    module_name, _, class_name = backend.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+class EventBroker:
+    """Рассылка событий канала подписчикам процесса с буфером последних событий для переподключения"""
+
+    def __init__(self, replay_size: int):
+        self.subscriptions: Set[Subscription] = set()
+        self.channel: Optional[EventChannel] = None
+        self._recent: Deque[Tuple[str, dict]] = deque(maxlen=replay_size)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._listener: Optional[asyncio.Task] = None
+        self._sending: Set[asyncio.Task] = set()
+        Gauge("events_subscribers", "Open change event subscriptions", func=lambda: len(self.subscriptions))
+
+    async def start(self, channel: Optional[EventChannel] = None):
+        """Подключение к каналу (запуск воркера)"""
+        if self._listener is not None:
+            return
+        self.channel = channel or get_event_channel()
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._listener = asyncio.create_task(self._listen(self.channel.listen()), name="events-listener")
+
+    async def stop(self):
+        """Отключение от канала: потоки событий завершаются, клиенты переподключатся"""
+        if self._listener is None:
+            return
+        self.close()
+        self._listener.cancel()
+        await asyncio.gather(self._listener, *self._sending, return_exceptions=True)
+        self._listener = None
+        await self.channel.close()
+
+    def needs_changes(self) -> bool:
+        """Собирать ли изменения сессий: есть подписчики здесь или в других воркерах"""
+        return self._listener is not None and (bool(self.subscriptions) or self.channel.shared)
+
+    def subscribe(self, subscription: Subscription, last_event_id: Optional[str] = None):
+        """Регистрация подписки; при переподключении (Last-Event-ID) досылаются пропущенные события"""
+        self.subscriptions.add(subscription)
+        if not last_event_id:
+            return
+
+        ids = [event_id for event_id, _ in self._recent]
+        if last_event_id not in ids:
+            # Пропущенных событий уже нет в буфере (или канал перезапущен)
+            subscription.offer(ids[-1] if ids else None, {"type": "resync", "data": {}})
+            return
+        for event_id, change in itertools.islice(self._recent, ids.index(last_event_id) + 1, None):
+            subscription.offer(event_id, change)
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscriptions.discard(subscription)
+
+    def close(self):
+        """Завершение всех потоков событий (остановка сервера): клиенты переподключатся к другому воркеру"""
+        for subscription in list(self.subscriptions):
+            while not subscription.queue.empty():
+                subscription.queue.get_nowait()
+            subscription.queue.put_nowait(None)
+
+    def publish(self, changes: Iterable[dict]):
+        """Отправка зафиксированных изменений в канал; вызывается из любого потока"""
+        if self._listener is None:
+            return
+        changes = list(changes)
+        if threading.get_ident() != self._loop_thread:
+            # Очереди asyncio не потокобезопасны - передаем в поток event loop
+            try:
+                self._loop.call_soon_threadsafe(self._send, changes)
+            except RuntimeError:
+                pass
+            return
+        self._send(changes)
+
+    def _send(self, changes: List[dict]):
+        task = self._loop.create_task(self.channel.publish(changes))
+        self._sending.add(task)
+        task.add_done_callback(self._sent)
+
+    def _sent(self, task: asyncio.Task):
+        self._sending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("change events not published", exc_info=task.exception())
+
+    async def _listen(self, events: AsyncIterator[Tuple[str, dict]]):
+        while True:
+            try:
+                async for event_id, change in events:
+                    self._deliver(event_id, change)
+            except Exception:
+                logger.exception("change event channel failed")
+            # Канал прервался: события за время переподключения потеряны - клиентам нужен resync
+            await asyncio.sleep(1)
+            for subscription in list(self.subscriptions):
+                subscription.offer(None, {"type": "resync", "data": {}})
+            events = self.channel.listen()
+
+    def _deliver(self, event_id: str, change: dict):
+        self._recent.append((event_id, change))
+        EVENTS_PUBLISHED.inc()
+        for subscription in list(self.subscriptions):
+            subscription.offer(event_id, change)
+
+broker = EventBroker(settings.EVENTS_REPLAY_SIZE)
+
+def _loaded_fields(obj) -> dict:
+    # Только загруженные значения: обращение к истекшему атрибуту выполнило бы запрос
+    state = inspect(obj)
+    return {column.key: state.dict[column.key] for column in state.mapper.column_attrs if column.key in state.dict}
+
+def _booking_change(session: Session, booking: Booking) -> dict:
+    if booking in session.new:
+        change_type = "booking.created"
+    elif booking.status == BookingStatus.CANCELLED and inspect(booking).attrs.status.history.has_changes():
+        change_type = "booking.cancelled"
+    else:
+        change_type = "booking.updated"
+    return {"type": change_type, "data": _loaded_fields(booking)}
+
+def _room_change(session: Session, room: Room) -> dict:
+    if room in session.deleted:
+        return {"type": "room.deleted", "data": {"id": room.id}}
+    return {"type": "room.created" if room in session.new else "room.updated", "data": _loaded_fields(room)}
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    if not broker.needs_changes():
+        return
+    changes: List[dict] = session.info.setdefault("events", [])
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        if isinstance(obj, Booking):
+            changes.append(_booking_change(session, obj))
+        elif isinstance(obj, Room):
+            changes.append(_room_change(session, obj))
+
+@event.listens_for(Session, "after_commit")
+def _publish_changes(session):
+    changes = session.info.pop("events", None)
+    if changes:
+        broker.publish(changes)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("events", None)
@@ -0,0 +1,38 @@
+from typing import Any, Callable, Iterable, List, Mapping, Optional
+from fastapi import HTTPException, Query
+from sqlalchemy.engine import Row
+from sqlalchemy.sql.elements import ColumnElement, Label
+
+class FieldSelection:
+    """Зависимость для параметра ?fields=: список запрошенных полей ответа.
+
+    Поля возвращаются в порядке объявления, а не в порядке запроса, чтобы
+    ответ сохранял форму схемы. Без параметра возвращаются все поля.
+    """
+
+    def __init__(self, *names: str):
+        self.names = names
+
+    def __call__(
+        self,
+        fields: Optional[str] = Query(None, description="Поля ответа через запятую, по умолчанию все")
+    ) -> List[str]:
+        if not fields:
+            return list(self.names)
+
+        requested = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = requested.difference(self.names)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+        return [name for name in self.names if name in requested] or list(self.names)
+
+def project(columns: Mapping[str, ColumnElement], fields: List[str]) -> List[Label]:
+    """Выражения SELECT только для запрошенных полей, с подписями по именам полей"""
+    return [columns[name].label(name) for name in fields]
+
+def format_rows(rows: Iterable[Row], formatters: Mapping[str, Callable[[Any], Any]]) -> List[dict]:
+    """Строки результата в словари; formatters - преобразования значений отдельных полей"""
+    return [
+        {name: formatters[name](value) if name in formatters else value for name, value in row._mapping.items()}
+        for row in rows
+    ]
@@ -0,0 +1,123 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
+from app.config import settings
+from app.utils.metrics import Counter, Gauge, Histogram
+
+def pwd_context_options(scheme: str = None, bcrypt_rounds: int = None,
+                        argon2_time_cost: int = None, argon2_memory_cost: int = None,
+                        argon2_parallelism: int = None) -> dict:
+    """Параметры CryptContext; по умолчанию берутся из настроек.
+
+    Нижняя и верхняя границы стоимости совпадают с целевой, поэтому
+    needs_update помечает хеши и с меньшей, и с большей стоимостью, а
+    хеши других схем считаются устаревшими.
+    """
+    scheme = scheme or settings.PASSWORD_HASH_SCHEME
+    bcrypt_rounds = bcrypt_rounds or settings.BCRYPT_ROUNDS
+    argon2_time_cost = argon2_time_cost or settings.ARGON2_TIME_COST
+    return {
+        "schemes": [scheme] + [other for other in ("bcrypt", "argon2") if other != scheme],
+        "deprecated": "auto",
+        "bcrypt__rounds": bcrypt_rounds,
+        "bcrypt__min_rounds": bcrypt_rounds,
+        "bcrypt__max_rounds": bcrypt_rounds,
+        "argon2__time_cost": argon2_time_cost,
+        "argon2__min_rounds": argon2_time_cost,
+        "argon2__max_rounds": argon2_time_cost,
+        "argon2__memory_cost": argon2_memory_cost or settings.ARGON2_MEMORY_COST,
+        "argon2__parallelism": argon2_parallelism or settings.ARGON2_PARALLELISM,
+    }
+
+# bcrypt отпускает GIL, поэтому пул потоков дает реальный параллелизм
+_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash"
+)
+
+# _in_flight пишется только из event loop, _running - потоками пула
+_in_flight = 0
+_running = 0
+_running_lock = threading.Lock()
+
+def queue_depth() -> int:
+    """Количество задач, ожидающих свободного потока"""
+    return max(0, _in_flight - _running)
+
+HASH_QUEUE_DEPTH = Gauge(
+    "password_hash_queue_depth",
+    "Password hashing tasks waiting for a worker thread",
+    func=queue_depth
+)
+HASH_QUEUE_WAIT = Histogram(
+    "password_hash_queue_wait_seconds",
+    "Time password hashing tasks spend waiting in the queue"
+)
+HASH_LATENCY = {
+    operation: Histogram(
+        "password_hash_duration_seconds",
+        "Password hashing and verification CPU time",
+        labels={"operation": operation}
+    )
+    for operation in ("hash", "verify")
+}
+HASH_REJECTED = {
+    reason: Counter(
+        "password_hash_rejected_total",
+        "Password hashing tasks rejected due to overload",
+        labels={"reason": reason}
+    )
+    for reason in ("queue_full", "timeout")
+}
+
+class QueueTimeout(Exception):
+    """Задача простояла в очереди дольше допустимого"""
+
+def _overloaded() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication service is busy, try again later",
+        headers={"Retry-After": "1"},
+    )
+
+def _run(enqueued_at: float, func, args):
+    """Выполнение задачи в потоке пула с проверкой времени ожидания"""
+    global _running
+    waited = time.monotonic() - enqueued_at
+    # Клиент, скорее всего, уже не ждет ответа - не тратим CPU
+    if waited > settings.PASSWORD_HASH_QUEUE_TIMEOUT:
+        raise QueueTimeout()
+    with _running_lock:
+        _running += 1
+    try:
+        started_at = time.monotonic()
+        result = func(*args)
+        return result, waited, time.monotonic() - started_at
+    finally:
+        with _running_lock:
+            _running -= 1
+
+async def run_password_task(operation: str, func, *args):
+    """Выполнение хеширования или проверки пароля вне event loop"""
+    global _in_flight
+    if queue_depth() >= settings.PASSWORD_HASH_MAX_QUEUE:
+        HASH_REJECTED["queue_full"].inc()
+        raise _overloaded()
+
+    _in_flight += 1
+    loop = asyncio.get_running_loop()
+    try:
+        result, waited, duration = await loop.run_in_executor(
+            _executor, _run, time.monotonic(), func, args
+        )
+    except QueueTimeout:
+        HASH_REJECTED["timeout"].inc()
+        raise _overloaded()
+    finally:
+        _in_flight -= 1
+
+    HASH_QUEUE_WAIT.observe(waited)
+    HASH_LATENCY[operation].observe(duration)
+    return result
@@ -0,0 +1,105 @@
+import time
+from typing import Dict, Optional, Tuple
+from starlette.routing import BaseRoute, replace_params
+from app.utils.metrics import Counter, Gauge, Histogram
+
+# Классы статусов ответа: индекс - status // 100
+_STATUS_CLASSES = ("1xx", "2xx", "3xx", "4xx", "5xx")
+
+# Метка для запросов, не сопоставленных ни одному маршруту: сырой путь
+# в метке дал бы неограниченное число рядов (сканеры, опечатки)
+UNMATCHED_ROUTE = "<unmatched>"
+
+# Методы вне этого списка (их задает клиент) учитываются как OTHER
+_METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"))
+
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being processed")
+
+class RouteMetrics:
+    """Метрики одного маршрута (метод и шаблон пути), созданные один раз"""
+
+    __slots__ = ("requests", "duration")
+
+    def __init__(self, method: str, route: str):
+        labels = {"method": method, "route": route}
+        self.requests = [
+            Counter("http_requests_total", "HTTP requests by route and status class",
+                    labels={**labels, "status": status_class})
+            for status_class in _STATUS_CLASSES
+        ]
+        self.duration = Histogram("http_request_duration_seconds", "HTTP request latency by route", labels=labels)
+
+    def observe(self, status_code: int, elapsed: float):
+        self.requests[min(max(status_code // 100, 1), 5) - 1].inc()
+        self.duration.observe(elapsed)
+
+def route_template(scope, route: Optional[BaseRoute]) -> str:
+    """Шаблон пути маршрута вместе с префиксами роутеров, через которые он подключен"""
+    path_format = getattr(route, "path_format", None)
+    if path_format is None:
+        return UNMATCHED_ROUTE
+    # Маршрут знает только свою часть шаблона: префикс - остаток пути запроса
+    # перед частью, которую дает подстановка параметров в шаблон маршрута
+    try:
+        suffix, _ = replace_params(path_format, route.param_convertors, dict(scope.get("path_params", {})))
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return path_format
+    path = scope["path"]
+    if path.endswith(suffix):
+        return path[:len(path) - len(suffix)] + path_format
+    return path_format
+
+# Метрики по (метод, шаблон): ряды общие для всех приложений процесса, хотя
+# каждый create_app() создает свои объекты маршрутов
+_routes: Dict[Tuple[str, str], RouteMetrics] = {}
+
+def route_metrics(scope) -> RouteMetrics:
+    method = scope["method"]
+    if method not in _METHODS:
+        method = "OTHER"
+    route = scope.get("route")
+    if route is None:
+        template = UNMATCHED_ROUTE
+    else:
+        # Шаблон маршрута вычисляется при первом запросе и сохраняется в самом маршруте:
+        # дальше запрос обходится поиском в словаре без сборки строк
+        template = getattr(route, "_metrics_template", None)
+        if template is None:
+            template = route._metrics_template = route_template(scope, route)
+    key = (method, template)
+    metrics = _routes.get(key)
+    if metrics is None:
+        metrics = _routes[key] = RouteMetrics(method, template)
+    return metrics
+
+class HTTPMetricsMiddleware:
+    """ASGI middleware: число запросов, задержка и запросы в обработке по шаблонам маршрутов.
+
+    Шаблон (например, /bookings/{booking_id}) определяется по scope["route"],
+    который маршрутизатор заполняет при сопоставлении. Время потоковых
+    ответов (GET /events) считается до конца передачи.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        status_code = 500
+        HTTP_IN_FLIGHT.inc()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route_metrics(scope).observe(status_code, time.perf_counter() - started_at)
@@ -0,0 +1,82 @@
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime, timezone
+from typing import Optional
+from app.config import settings
+from app.utils.metrics import Counter
+
+LOG_RECORDS_DROPPED = Counter("log_records_dropped_total", "Log records dropped because the log queue was full")
+
+# Стандартные атрибуты LogRecord; все остальное пришло через extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+class JsonFormatter(logging.Formatter):
+    """Форматирование записи в одну строку JSON с полями из extra"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                data[key] = value
+        # После очереди исключение приходит уже отформатированным в exc_text
+        exc_text = self.formatException(record.exc_info) if record.exc_info else record.exc_text
+        if exc_text:
+            data["exc_info"] = exc_text
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, который при переполнении очереди отбрасывает запись, а не блокирует поток"""
+
+    def prepare(self, record):
+        # Стандартный prepare дописывает traceback в текст сообщения; оставляем его в exc_text,
+        # чтобы JSON-формат выводил его отдельным полем. Сам traceback в очередь не передается
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def setup_logging():
+    """Запись логов приложения через очередь: форматирование и вывод в отдельном потоке"""
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue = queue.Queue(settings.LOG_QUEUE_SIZE)
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else logging.Formatter(
+        "%(asctime)s %(levelname)s %(name)s %(message)s"))
+
+    logger = logging.getLogger("app")
+    logger.setLevel(settings.LOG_LEVEL)
+    logger.handlers[:] = [DroppingQueueHandler(log_queue)]
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+def shutdown_logging():
+    """Остановка потока записи с выводом оставшихся в очереди записей"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,118 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence
+
+# Границы бакетов гистограмм по умолчанию (секунды)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Все зарегистрированные метрики в порядке создания
+REGISTRY: List["Metric"] = []
+
+def _format_labels(labels: Optional[Dict[str, str]]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric(ABC):
+    """Базовая метрика.
+
+    Набор меток фиксируется при создании: строка меток собирается один раз,
+    а не на каждое обновление. Метрики обновляются из потока event loop.
+    """
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels or {}
+        self._label_str = _format_labels(self.labels)
+        REGISTRY.append(self)
+
+    @abstractmethod
+    def samples(self):
+        """Строки выборки: (имя, метки, значение)"""
+
+class Counter(Metric):
+    """Монотонно растущий счетчик"""
+    type = "counter"
+
+    def __init__(self, name, documentation, labels=None):
+        super().__init__(name, documentation, labels)
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def samples(self):
+        yield self.name, self._label_str, self.value
+
+class Gauge(Metric):
+    """Текущее значение; может вычисляться функцией в момент сбора"""
+    type = "gauge"
+
+    def __init__(self, name, documentation, labels=None, func: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labels)
+        self.value = 0
+        self._func = func
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def samples(self):
+        yield self.name, self._label_str, self._func() if self._func else self.value
+
+class Histogram(Metric):
+    """Гистограмма с заранее выделенными бакетами"""
+    type = "histogram"
+
+    def __init__(self, name, documentation, labels=None, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        # Строки меток для бакетов тоже собираем заранее
+        self._bucket_labels = [
+            _format_labels({**self.labels, "le": _format_value(bound)})
+            for bound in self.buckets + (float("inf"),)
+        ]
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        cumulative = 0
+        for bucket_labels, count in zip(self._bucket_labels, self.counts):
+            cumulative += count
+            yield self.name + "_bucket", bucket_labels, cumulative
+        yield self.name + "_sum", self._label_str, self.sum
+        yield self.name + "_count", self._label_str, self.count
+
+def render_prometheus() -> str:
+    """Формирование текста в формате экспозиции Prometheus"""
+    # Метрики с одним именем и разными метками выводятся одним блоком
+    families: Dict[str, List[Metric]] = {}
+    for metric in REGISTRY:
+        families.setdefault(metric.name, []).append(metric)
+
+    lines = []
+    for name, metrics in families.items():
+        lines.append(f"# HELP {name} {metrics[0].documentation}")
+        lines.append(f"# TYPE {name} {metrics[0].type}")
+        for metric in metrics:
+            for sample_name, label_str, value in metric.samples():
+                lines.append(f"{sample_name}{label_str} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
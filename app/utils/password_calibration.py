@@ -0,0 +1,114 @@
+import argparse
+import os
+import time
+from statistics import median
+from passlib.hash import argon2, bcrypt
+from app.config import settings
+
+# Ниже этих значений не опускаемся, даже если бюджет не выдерживается
+MIN_BCRYPT_ROUNDS = 10
+MIN_ARGON2_TIME_COST = 2
+ARGON2_MEMORY_COSTS = (19456, 32768, 65536, 131072)
+
+_SAMPLE_PASSWORD = "calibration-password"
+
+def _measure_ms(handler, samples: int = 3) -> float:
+    """Медианное время хеширования в миллисекундах"""
+    timings = []
+    for _ in range(samples):
+        started_at = time.perf_counter()
+        handler.hash(_SAMPLE_PASSWORD)
+        timings.append((time.perf_counter() - started_at) * 1000)
+    return median(timings)
+
+def calibrate_bcrypt(budget_ms: float) -> dict:
+    """Максимальное число раундов bcrypt, укладывающееся в бюджет"""
+    rounds = MIN_BCRYPT_ROUNDS
+    elapsed = _measure_ms(bcrypt.using(rounds=rounds))
+    # Каждый раунд удваивает время, поэтому следующий замер можно предсказать
+    while rounds < 31 and elapsed * 2 <= budget_ms:
+        rounds += 1
+        elapsed = _measure_ms(bcrypt.using(rounds=rounds))
+    if elapsed > budget_ms and rounds > MIN_BCRYPT_ROUNDS:
+        rounds -= 1
+        elapsed /= 2
+    return {"scheme": "bcrypt", "bcrypt_rounds": rounds, "elapsed_ms": round(elapsed, 1)}
+
+def calibrate_argon2(budget_ms: float, parallelism: int) -> dict:
+    """Самые тяжелые параметры argon2 (память x итерации), укладывающиеся в бюджет"""
+    best = None
+    for memory_cost in ARGON2_MEMORY_COSTS:
+        time_cost = MIN_ARGON2_TIME_COST
+        while True:
+            handler = argon2.using(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+            elapsed = _measure_ms(handler)
+            if elapsed > budget_ms:
+                break
+            if best is None or memory_cost * time_cost > best["argon2_memory_cost"] * best["argon2_time_cost"]:
+                best = {
+                    "scheme": "argon2",
+                    "argon2_time_cost": time_cost,
+                    "argon2_memory_cost": memory_cost,
+                    "argon2_parallelism": parallelism,
+                    "elapsed_ms": round(elapsed, 1),
+                }
+            time_cost += 1
+        if time_cost == MIN_ARGON2_TIME_COST:
+            # Больший объем памяти уже не укладывается в бюджет
+            break
+    return best
+
+def calibrate(budget_ms: float = None, schemes=("argon2", "bcrypt")) -> dict:
+    """Подбор схемы и параметров хеширования под бюджет задержки на этом хосте.
+
+    Предпочтение отдается argon2 (устойчив к перебору на GPU), если
+    установлен его backend и он укладывается в бюджет.
+    """
+    budget_ms = budget_ms or settings.PASSWORD_HASH_BUDGET_MS
+    for scheme in schemes:
+        if scheme == "argon2" and argon2.has_backend():
+            result = calibrate_argon2(budget_ms, settings.ARGON2_PARALLELISM)
+            if result is not None:
+                return result
+        elif scheme == "bcrypt":
+            return calibrate_bcrypt(budget_ms)
+    return calibrate_bcrypt(budget_ms)
+
+def calibration_settings(result: dict) -> dict:
+    """Результат калибровки в виде переменных окружения настроек (PASSWORD_HASH_SCHEME и т.д.)"""
+    values = {"PASSWORD_HASH_SCHEME": result["scheme"]}
+    for key, value in result.items():
+        if key not in ("scheme", "elapsed_ms"):
+            values[key.upper()] = str(value)
+    return values
+
+def apply_calibration(result: dict) -> dict:
+    """Применение результата к настройкам процесса и к окружению дочерних процессов.
+
+    Воркеры python -m app.serve запускаются как новые процессы и читают
+    настройки из окружения заново, поэтому получают подобранные здесь
+    параметры и не калибруют повторно.
+    """
+    values = calibration_settings(result)
+    os.environ.update(values)
+    os.environ["PASSWORD_HASH_CALIBRATE_ON_STARTUP"] = "false"
+    for key, value in values.items():
+        setattr(settings, key, type(getattr(settings, key))(value))
+    settings.PASSWORD_HASH_CALIBRATE_ON_STARTUP = False
+    return values
+
+def main():
+    parser = argparse.ArgumentParser(description="Калибровка параметров хеширования паролей")
+    parser.add_argument("--budget-ms", type=float, default=settings.PASSWORD_HASH_BUDGET_MS,
+                        help="допустимое время одного хеширования, мс")
+    parser.add_argument("--scheme", choices=["argon2", "bcrypt"], action="append",
+                        help="схемы в порядке предпочтения (по умолчанию argon2, bcrypt)")
+    args = parser.parse_args()
+
+    result = calibrate(args.budget_ms, tuple(args.scheme or ("argon2", "bcrypt")))
+    print(f"# {result['scheme']}: {result['elapsed_ms']} ms на хеш (бюджет {args.budget_ms:g} ms)")
+    for key, value in calibration_settings(result).items():
+        print(f"{key}={value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import importlib
+import logging
+import math
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Iterable, List, Optional
+from starlette.responses import JSONResponse
+from app.config import settings
+from app.utils.security import decode_access_token
+
+logger = logging.getLogger(__name__)
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+class RateLimit:
+    """Лимит вида "10/minute": емкость корзины и скорость пополнения"""
+
+    def __init__(self, value: str):
+        count, _, period = value.partition("/")
+        self.capacity = int(count)
+        self.rate = self.capacity / _PERIODS[period.strip() or "second"]
+
+class RateLimitRule:
+    """Правило ограничения для маршрута.
+
+    scope: "ip" - корзина на адрес клиента, "user" - на пользователя из
+    токена (для анонимных запросов - на адрес).
+    """
+
+    def __init__(self, name: str, methods: Iterable[str], path: str, limit: str, scope: str = "ip"):
+        self.name = name
+        self.methods = frozenset(methods)
+        self.path = re.compile(path)
+        self.limit = RateLimit(limit)
+        self.scope = scope
+
+    def matches(self, method: str, path: str) -> bool:
+        return method in self.methods and self.path.match(path) is not None
+
+def default_rules() -> List[RateLimitRule]:
+    """Правила из настроек; пустая строка отключает правило"""
+    rules = [
+        ("login", ["POST"], r"^/token$", settings.RATE_LIMIT_LOGIN, "ip"),
+        ("register", ["POST"], r"^/register$", settings.RATE_LIMIT_REGISTER, "ip"),
+        ("booking-write", ["POST", "PUT", "DELETE"], r"^/bookings(/|$)", settings.RATE_LIMIT_BOOKING_WRITE, "user"),
+    ]
+    return [RateLimitRule(*rule) for rule in rules if rule[3]]
+
+class RateLimitBackend(ABC):
+    """Хранилище корзин токенов"""
+
+    @abstractmethod
+    async def acquire(self, key: str, limit: RateLimit) -> float:
+        """Взятие токена; возвращает 0 или время до появления токена в секундах"""
+
+class MemoryBackend(RateLimitBackend):
+    """Корзины в памяти процесса (лимиты действуют на каждый воркер отдельно)"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    async def acquire(self, key: str, limit: RateLimit) -> float:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [float(limit.capacity), now]
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(limit.capacity, bucket[0] + (now - bucket[1]) * limit.rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / limit.rate
+
+class RedisBackend(RateLimitBackend):
+    """Корзины в Redis - общие лимиты для всех воркеров и хостов"""
+
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(data[1]) or capacity
+    local ts = tonumber(data[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    local retry = 0
+    if tokens >= 1 then tokens = tokens - 1 else retry = (1 - tokens) / rate end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return tostring(retry)
+    """
+
+    def __init__(self, url: Optional[str] = None):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package")
+        self._client = redis.from_url(url or settings.RATE_LIMIT_REDIS_URL)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    async def acquire(self, key: str, limit: RateLimit) -> float:
+        try:
+            retry = await self._script(keys=[f"ratelimit:{key}"], args=[limit.capacity, limit.rate, time.time()])
+        except Exception:
+            # Недоступность Redis не должна останавливать прием запросов
+            logger.exception("Rate limit backend error")
+            return 0.0
+        return float(retry)
+
+def get_rate_limit_backend() -> RateLimitBackend:
+    """Создание хранилища по RATE_LIMIT_BACKEND: memory, redis или module:Class"""
+    backend = settings.RATE_LIMIT_BACKEND
+    if backend == "memory":
+        return MemoryBackend()
+    if backend == "redis":
+        return RedisBackend()
+    module_name, _, class_name = backend.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+class RateLimitMiddleware:
+    """ASGI middleware ограничения частоты запросов по корзинам токенов"""
+
+    def __init__(self, app, rules: Optional[List[RateLimitRule]] = None,
+                 backend: Optional[RateLimitBackend] = None):
+        self.app = app
+        self.rules = default_rules() if rules is None else rules
+        self.backend = backend or get_rate_limit_backend()
+
+    def _client_key(self, scope, rule: RateLimitRule) -> str:
+        if rule.scope == "user":
+            for name, value in scope["headers"]:
+                if name == b"authorization":
+                    scheme, _, token = value.decode("latin-1").partition(" ")
+                    payload = decode_access_token(token) if scheme.lower() == "bearer" else None
+                    if payload is not None and payload.get("uid") is not None:
+                        return f"user:{payload['uid']}"
+                    break
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        path = scope["path"]
+        for rule in self.rules:
+            if not rule.matches(method, path):
+                continue
+            retry_after = await self.backend.acquire(f"{rule.name}:{self._client_key(scope, rule)}", rule.limit)
+            if retry_after > 0:
+                response = JSONResponse(
+                    {"detail": "Too many requests"},
+                    status_code=429,
+                    headers={"Retry-After": str(math.ceil(retry_after))}
+                )
+                await response(scope, receive, send)
+                return
+
+        await self.app(scope, receive, send)
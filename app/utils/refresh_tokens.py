@@ -0,0 +1,90 @@
+import hashlib
+import secrets
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import HTTPException, status
+from sqlalchemy import select, delete, update
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.db.sqlite import sqlite_write
+from app.models.refresh_token import RefreshToken
+from app.utils.tasks import background_task, task_queue
+
+def _hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+def _invalid_refresh_token() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+async def _get_refresh_token(db: AsyncSession, token: str) -> Optional[RefreshToken]:
+    result = await db.execute(select(RefreshToken).where(RefreshToken.token_hash == _hash_token(token)))
+    return result.scalars().first()
+
+async def issue_refresh_token(db: AsyncSession, user_id: int, family_id: Optional[str] = None) -> str:
+    """Выпуск refresh-токена (новая цепочка, если family_id не задан)"""
+    now = datetime.utcnow()
+
+    # Истекшие токены пользователя удаляет фоновая задача, чтобы таблица не росла
+    task_queue.enqueue("refresh_tokens.purge_expired", db, user_id=user_id)
+
+    token = secrets.token_urlsafe(32)
+    db.add(RefreshToken(
+        user_id=user_id,
+        family_id=family_id or uuid.uuid4().hex,
+        token_hash=_hash_token(token),
+        expires_at=now + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    ))
+    return token
+
+async def rotate_refresh_token(db: AsyncSession, token: str) -> Row:
+    """Обмен refresh-токена: помечает его использованным и возвращает user_id и family_id.
+
+    Токен помечается условным UPDATE: из одновременных обменов одного токена
+    его получает только один, даже без очереди писателей (PostgreSQL).
+    Повторное предъявление уже обмененного токена означает его утечку -
+    в этом случае отзывается вся цепочка.
+    """
+    token_hash = _hash_token(token)
+    now = datetime.utcnow()
+    result = await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.token_hash == token_hash, RefreshToken.used_at.is_(None), RefreshToken.expires_at > now)
+        .values(used_at=now)
+        .returning(RefreshToken.user_id, RefreshToken.family_id)
+        .execution_options(synchronize_session=False)
+    )
+    claimed = result.first()
+    if claimed is not None:
+        return claimed
+
+    db_token = await _get_refresh_token(db, token)
+    if db_token is not None and db_token.used_at is not None:
+        await revoke_refresh_token_family(db, db_token.family_id)
+        await db.commit()
+    raise _invalid_refresh_token()
+
+async def revoke_refresh_token_family(db: AsyncSession, family_id: str):
+    """Отзыв всей цепочки refresh-токенов"""
+    await db.execute(delete(RefreshToken).where(RefreshToken.family_id == family_id))
+
+async def revoke_refresh_token(db: AsyncSession, token: str):
+    """Отзыв цепочки, к которой принадлежит токен (выход из системы)"""
+    db_token = await _get_refresh_token(db, token)
+    if db_token is not None:
+        await revoke_refresh_token_family(db, db_token.family_id)
+
+@background_task("refresh_tokens.purge_expired")
+async def purge_expired_refresh_tokens(user_id: int):
+    """Удаление истекших refresh-токенов пользователя"""
+    async with sqlite_write(), task_queue.session_factory() as db:
+        await db.execute(delete(RefreshToken).where(
+            RefreshToken.user_id == user_id,
+            RefreshToken.expires_at < datetime.utcnow()
+        ))
+        await db.commit()
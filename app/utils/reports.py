@@ -0,0 +1,247 @@
+import asyncio
+import csv
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from decimal import Decimal
+from functools import partial
+from typing import Optional
+from sqlalchemy import select, func, and_
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from app.config import settings
+from app.db.database import replica_urls
+from app.models.user import User
+from app.models.room import Room
+from app.models.booking import Booking, BookingStatus
+from app.schemas.report import ReportType, ReportFormat, ReportStatus
+
+# Идентификатор задачи - uuid4 в hex, другие значения в путь к файлу не попадают
+JOB_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+# Колонки файлов отчетов
+REPORT_FIELDS = {
+    ReportType.USER_SPENDING.value: [
+        "user_id", "username", "email", "year", "booking_count", "total_spent"
+    ],
+    ReportType.ROOM_UTILIZATION.value: [
+        "room_id", "room_name", "booking_count", "total_revenue", "total_hours", "occupancy_rate"
+    ],
+}
+
+# Пул процессов создается лениво при первой постановке отчета
+_executor: Optional[ProcessPoolExecutor] = None
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Получение пула процессов для формирования отчетов"""
+    global _executor
+    if _executor is None:
+        # spawn: дочерний процесс не наследует event loop и соединения родителя
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.REPORT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+def shutdown_report_executor():
+    """Остановка пула процессов (вызывается при завершении приложения)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+def _meta_path(job_id: str) -> str:
+    return os.path.join(settings.REPORTS_DIR, f"{job_id}.meta.json")
+
+def report_file_path(job_id: str, report_format: str) -> str:
+    """Путь к файлу с результатом отчета"""
+    return os.path.join(settings.REPORTS_DIR, f"{job_id}.{report_format}")
+
+def _write_meta(job_id: str, **fields) -> dict:
+    """Атомарное обновление файла состояния задачи.
+
+    Временный файл у каждой записи свой: общий путь .tmp перезаписывался бы
+    параллельной записью до os.replace.
+    """
+    meta = read_report_job(job_id) or {}
+    meta.update(fields)
+    fd, tmp_path = tempfile.mkstemp(prefix=f"{job_id}.", suffix=".tmp", dir=settings.REPORTS_DIR)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, _meta_path(job_id))
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return meta
+
+def read_report_job(job_id: str) -> Optional[dict]:
+    """Чтение состояния задачи.
+
+    Состояние хранится в файле рядом с результатом, поэтому его видят
+    все воркеры uvicorn, а не только тот, что принял задачу.
+    """
+    if not JOB_ID_RE.match(job_id):
+        return None
+    try:
+        with open(_meta_path(job_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def submit_report(report_type: ReportType, report_format: ReportFormat,
+                  start_date: datetime, end_date: datetime, owner_id: int) -> dict:
+    """Постановка отчета в очередь пула процессов"""
+    os.makedirs(settings.REPORTS_DIR, exist_ok=True)
+    job_id = uuid.uuid4().hex
+    meta = _write_meta(
+        job_id,
+        id=job_id,
+        report_type=report_type.value,
+        format=report_format.value,
+        status=ReportStatus.QUEUED.value,
+        start_date=start_date.isoformat(),
+        end_date=end_date.isoformat(),
+        owner_id=owner_id,
+        created_at=datetime.utcnow().isoformat(),
+    )
+
+    args = (job_id, report_type.value, report_format.value,
+            start_date.isoformat(), end_date.isoformat())
+    try:
+        future = _get_executor().submit(generate_report, *args)
+    except BrokenProcessPool:
+        # Пул сломан упавшим процессом - пересоздаем его
+        shutdown_report_executor()
+        future = _get_executor().submit(generate_report, *args)
+    future.add_done_callback(partial(_on_job_done, job_id))
+    return meta
+
+def _on_job_done(job_id: str, future):
+    """Фиксация ошибки, если задача не дошла до дочернего процесса или он упал, не записав итог.
+
+    Итоговый статус пишет только дочерний процесс; родитель записывает ошибку,
+    лишь если итога в файле состояния нет.
+    """
+    if future.cancelled():
+        error = "Cancelled"
+    else:
+        exc = future.exception()
+        if exc is None:
+            return
+        error = str(exc) or type(exc).__name__
+    meta = read_report_job(job_id)
+    if meta is not None and meta["status"] in (ReportStatus.COMPLETED.value, ReportStatus.FAILED.value):
+        return
+    _write_meta(job_id, status=ReportStatus.FAILED.value, error=error,
+                finished_at=datetime.utcnow().isoformat())
+
+def _build_statement(report_type: str, start_date: datetime, end_date: datetime):
+    """Построение запроса для отчета"""
+    if report_type == ReportType.USER_SPENDING.value:
+        # Расходы пользователей по годам
+        year = func.extract('year', Booking.start_time).label('year')
+        return select(
+            User.id.label('user_id'),
+            User.username,
+            User.email,
+            year,
+            func.count(Booking.id).label('booking_count'),
+            func.sum(Booking.total_price).label('total_spent')
+        ).join(Booking, User.id == Booking.user_id).where(
+            Booking.status.in_([BookingStatus.COMPLETED, BookingStatus.CONFIRMED]),
+            Booking.start_time >= start_date,
+            Booking.start_time <= end_date
+        ).group_by(User.id, User.username, User.email, year).order_by(year, User.id)
+
+    # Полная загрузка комнат, включая комнаты без бронирований
+    hours = func.sum(func.extract('epoch', Booking.end_time - Booking.start_time) / 3600)
+    return select(
+        Room.id.label('room_id'),
+        Room.name.label('room_name'),
+        func.count(Booking.id).label('booking_count'),
+        func.coalesce(func.sum(Booking.total_price), 0).label('total_revenue'),
+        func.coalesce(hours, 0).label('total_hours')
+    ).outerjoin(Booking, and_(
+        Room.id == Booking.room_id,
+        Booking.status.in_([BookingStatus.COMPLETED, BookingStatus.CONFIRMED]),
+        Booking.start_time >= start_date,
+        Booking.start_time <= end_date
+    )).group_by(Room.id, Room.name).order_by(Room.id)
+
+def _format_row(report_type: str, row, period_hours: float) -> dict:
+    """Приведение строки результата к сериализуемому виду"""
+    data = {key: (float(value) if isinstance(value, Decimal) else value)
+            for key, value in row._mapping.items()}
+    if report_type == ReportType.USER_SPENDING.value:
+        data["year"] = int(data["year"])
+        data["total_spent"] = float(data["total_spent"] or 0)
+    else:
+        data["total_revenue"] = float(data["total_revenue"])
+        data["total_hours"] = float(data["total_hours"])
+        occupancy_rate = (data["total_hours"] / period_hours) * 100 if period_hours > 0 else 0
+        data["occupancy_rate"] = round(occupancy_rate, 2)
+    return data
+
+async def _write_report(report_type: str, report_format: str,
+                        start_date: datetime, end_date: datetime, path: str) -> int:
+    """Потоковая выгрузка результата запроса в файл"""
+    # Отдельный движок без пула: процесс живет дольше одного отчета.
+    # Тяжелые выборки отчетов не должны нагружать основную базу - берем первую реплику
+    replicas = replica_urls()
+    engine = create_async_engine(replicas[0] if replicas else settings.DATABASE_URL, poolclass=NullPool)
+    period_hours = (end_date - start_date).total_seconds() / 3600
+    row_count = 0
+    try:
+        async with engine.connect() as conn:
+            result = await conn.stream(_build_statement(report_type, start_date, end_date))
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                if report_format == ReportFormat.CSV.value:
+                    writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS[report_type])
+                    writer.writeheader()
+                else:
+                    f.write("[")
+                async for row in result:
+                    data = _format_row(report_type, row, period_hours)
+                    if report_format == ReportFormat.CSV.value:
+                        writer.writerow(data)
+                    else:
+                        if row_count:
+                            f.write(",\n")
+                        json.dump(data, f, ensure_ascii=False)
+                    row_count += 1
+                if report_format == ReportFormat.JSON.value:
+                    f.write("]")
+    finally:
+        await engine.dispose()
+    return row_count
+
+def generate_report(job_id: str, report_type: str, report_format: str,
+                    start_date: str, end_date: str) -> int:
+    """Формирование отчета (выполняется в дочернем процессе)"""
+    _write_meta(job_id, status=ReportStatus.RUNNING.value)
+    path = report_file_path(job_id, report_format)
+    tmp_path = path + ".tmp"
+    try:
+        row_count = asyncio.run(_write_report(
+            report_type, report_format,
+            datetime.fromisoformat(start_date), datetime.fromisoformat(end_date),
+            tmp_path
+        ))
+        os.replace(tmp_path, path)
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        _write_meta(job_id, status=ReportStatus.FAILED.value, error=str(e),
+                    finished_at=datetime.utcnow().isoformat())
+        return 0
+
+    _write_meta(job_id, status=ReportStatus.COMPLETED.value, row_count=row_count,
+                finished_at=datetime.utcnow().isoformat())
+    return row_count
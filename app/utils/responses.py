@@ -0,0 +1,20 @@
+from typing import Any, Iterable
+import orjson
+from sqlalchemy.engine import Row
+from starlette.responses import JSONResponse
+from app.utils.tracing import span
+
+class ORJSONResponse(JSONResponse):
+    """JSON-ответ через orjson: datetime, Enum и числа сериализуются без jsonable_encoder"""
+
+    def render(self, content: Any) -> bytes:
+        with span("serialize"):
+            return orjson.dumps(content)
+
+def rows_response(rows: Iterable[Row], status_code: int = 200) -> ORJSONResponse:
+    """Ответ из строк результата запроса без повторной валидации схемой.
+
+    Только для доверенных данных из базы: подписи колонок в select()
+    должны совпадать с полями схемы ответа и идти в том же порядке.
+    """
+    return ORJSONResponse([row._asdict() for row in rows], status_code=status_code)
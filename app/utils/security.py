@@ -1,20 +1,73 @@
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.config import settings
 from app.db.database import get_db
+from app.db.replicas import current_user_id
+from app.db.statements import USER_BY_USERNAME
 from app.models.user import User
+from app.schemas.token import TokenData
+from app.utils.cache import TTLCache
+from app.utils.hashing import run_password_task, pwd_context_options
+from app.utils.tracing import span
 
 # Контекст для хеширования паролей
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(**pwd_context_options())
 
 # Схема OAuth2 для получения токена из заголовка Authorization
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Кэш декодированных токенов: повторная проверка подписи не нужна
+token_payload_cache = TTLCache(settings.TOKEN_CACHE_MAX_SIZE, settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+# Кэш пользователей по username: снимки полей, а не ORM-объекты,
+# чтобы не держать экземпляры, привязанные к закрытым сессиям
+user_cache = TTLCache(settings.USER_CACHE_MAX_SIZE, settings.USER_CACHE_TTL_SECONDS)
+
+_user_columns = [column.key for column in User.__table__.columns]
+
+class TokenVersionMap:
+    """Карта версий токенов пользователей.
+
+    Хранит только пользователей с ненулевой версией, поэтому остается
+    компактной. Обновляется одним запросом не чаще раза в
+    TOKEN_VERSION_REFRESH_SECONDS, изменения в своем процессе
+    применяются сразу.
+    """
+
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self._versions = {}
+        self._loaded_at = None
+
+    def is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_interval
+
+    async def refresh(self, db: AsyncSession):
+        """Загрузка версий из базы данных"""
+        result = await db.execute(select(User.id, User.token_version).where(User.token_version > 0))
+        rows = result.all()
+        self._versions = {row.id: row.token_version for row in rows}
+        self._loaded_at = time.monotonic()
+
+    def set(self, user_id: int, version: int):
+        self._versions[user_id] = version
+
+    def is_revoked(self, user_id: int, version: int) -> bool:
+        return version < self._versions.get(user_id, 0)
+
+    def clear(self):
+        self._versions = {}
+        self._loaded_at = None
+
+token_versions = TokenVersionMap(settings.TOKEN_VERSION_REFRESH_SECONDS)
+
 def verify_password(plain_password, hashed_password):
     """Проверка пароля"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -23,6 +76,22 @@ def get_password_hash(password):
     """Создание хеша пароля"""
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password, hashed_password):
+    """Проверка пароля в пуле потоков, не блокируя event loop"""
+    return await run_password_task("verify", verify_password, plain_password, hashed_password)
+
+async def verify_and_update_password_async(plain_password, hashed_password):
+    """Проверка пароля с выдачей нового хеша, если параметры хеширования устарели"""
+    return await run_password_task("verify", pwd_context.verify_and_update, plain_password, hashed_password)
+
+def configure_password_hashing(**params):
+    """Замена параметров хеширования (например, после калибровки)"""
+    pwd_context.update(**pwd_context_options(**params))
+
+async def get_password_hash_async(password):
+    """Создание хеша пароля в пуле потоков, не блокируя event loop"""
+    return await run_password_task("hash", get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Создание JWT токена"""
     to_encode = data.copy()
@@ -37,7 +106,72 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def create_user_access_token(user: User, expires_delta: Optional[timedelta] = None):
+    """Создание JWT токена с данными для авторизации без обращения к базе"""
+    return create_access_token(
+        data={
+            "sub": user.username,
+            "uid": user.id,
+            "role": user.role,
+            "ver": user.token_version or 0,
+        },
+        expires_delta=expires_delta
+    )
+
+def decode_access_token(token: str) -> Optional[dict]:
+    """Декодирование JWT токена с кэшированием результата"""
+    payload = token_payload_cache.get(token)
+    if payload is not None:
+        # Срок действия проверяем сами: jose его при попадании в кэш не видит
+        if payload["exp"] <= time.time():
+            token_payload_cache.delete(token)
+            return None
+        return payload
+
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+
+    if "exp" in payload:
+        token_payload_cache.set(token, payload, ttl=payload["exp"] - time.time())
+    return payload
+
+def cache_user(user: User):
+    """Сохранение снимка пользователя в кэше"""
+    user_cache.set(user.username, {key: getattr(user, key) for key in _user_columns})
+
+def invalidate_user(username: str):
+    """Удаление пользователя из кэша"""
+    user_cache.delete(username)
+
+@event.listens_for(User, "before_update")
+def _bump_token_version(mapper, connection, target):
+    """Отзыв выданных токенов при деактивации или смене роли"""
+    state = inspect(target)
+    if state.attrs.is_active.history.has_changes() or state.attrs.role.history.has_changes():
+        target.token_version = (target.token_version or 0) + 1
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target):
+    """Сброс кэша при деактивации, смене роли или изменении профиля"""
+    invalidate_user(target.username)
+    token_versions.set(target.id, target.token_version or 0)
+    # Если менялся сам username, сбрасываем и старое значение
+    history = inspect(target).attrs.username.history
+    for username in history.deleted or ():
+        invalidate_user(username)
+
+async def is_token_revoked(db: AsyncSession, user_id: int, version: int) -> bool:
+    """Проверка версии токена по карте версий (отзыв при деактивации или смене роли)"""
+    # Сессия открывает соединение только при обновлении карты версий
+    if token_versions.is_stale():
+        with span("auth.refresh_token_versions"):
+            await token_versions.refresh(db)
+    return token_versions.is_revoked(user_id, version)
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
     """Получение текущего пользователя по токену"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -45,25 +179,74 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        # Декодирование токена
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get("sub")
-        
-        if username is None:
-            raise credentials_exception
-    except JWTError:
+    # Декодирование токена
+    with span("auth.decode_token"):
+        payload = decode_access_token(token)
+    if payload is None:
+        raise credentials_exception
+
+    username: str = payload.get("sub")
+    if username is None:
         raise credentials_exception
     
-    # Получение пользователя из базы данных
-    user = db.query(User).filter(User.username == username).first()
+    # Сначала ищем пользователя в кэше, чтобы не ходить в базу данных
+    cached = user_cache.get(username)
+    if cached is not None:
+        user = User(**cached)
+    else:
+        # Получение пользователя из базы данных
+        with span("auth.user_lookup"):
+            result = await db.execute(USER_BY_USERNAME, {"username": username})
+            user = result.scalars().first()
+        
+        if user is None:
+            raise credentials_exception
+        
+        cache_user(user)
     
-    if user is None:
+    # Та же проверка отзыва, что и в get_token_data, для пользователя из кэша и из базы
+    if await is_token_revoked(db, user.id, payload.get("ver", 0)):
         raise credentials_exception
     
     return user
 
-def get_current_active_user(current_user: User = Depends(get_current_user)):
+async def get_token_data(
+    request: Request,
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+) -> TokenData:
+    """Получение данных пользователя из токена без запроса к базе данных"""
+    # Подзапросы пакета (POST /batch) получают токен, уже проверенный для всего пакета
+    batch_token_data = getattr(request.state, "batch_token_data", None)
+    if batch_token_data is not None:
+        current_user_id.set(batch_token_data.id)
+        return batch_token_data
+
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+    with span("auth.decode_token"):
+        payload = decode_access_token(token)
+    if payload is None or payload.get("sub") is None or payload.get("uid") is None:
+        raise credentials_exception
+
+    token_data = TokenData(
+        username=payload["sub"],
+        id=payload["uid"],
+        role=payload.get("role"),
+        version=payload.get("ver", 0)
+    )
+
+    if await is_token_revoked(db, token_data.id, token_data.version):
+        raise credentials_exception
+
+    current_user_id.set(token_data.id)
+    return token_data
+
+async def get_current_active_user(current_user: User = Depends(get_current_user)):
     """Проверка, что пользователь активен"""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
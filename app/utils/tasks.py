@@ -0,0 +1,291 @@
+"""Фоновые задачи внутри процесса воркера.
+
+Задача - корутина, зарегистрированная под именем (background_task), и
+аргументы, сериализуемые в JSON. enqueue() только кладет задачу в
+ограниченную очередь и сразу возвращает управление; выполняют задачи
+TASK_WORKERS корутин в event loop воркера. Упавшая задача повторяется с
+экспоненциальной задержкой до TASK_MAX_ATTEMPTS попыток.
+
+Задача, поставленная с сессией запроса, попадает в очередь только после
+commit этой сессии (после отката - не выполняется). Состояние задач и
+сами задачи работают с базой через фабрику сессий, переданную в start()
+(приложение передает свою, см. create_app). При TASK_PERSIST=True
+она же сохраняется в background_tasks в той же транзакции: строка
+удаляется после выполнения, а задачи остановившегося воркера забирает
+другой воркер или следующий запуск, когда истекает их аренда.
+"""
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+import orjson
+from sqlalchemy import delete, event, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.config import settings
+from app.db.database import async_session
+from app.db.sqlite import sqlite_write
+from app.models.background_task import BackgroundTask
+from app.utils.metrics import Counter, Gauge
+
+logger = logging.getLogger("app.tasks")
+
+TASKS_SUCCEEDED = Counter("background_tasks_total", "Background task runs by outcome", {"status": "succeeded"})
+TASKS_RETRIED = Counter("background_tasks_total", "Background task runs by outcome", {"status": "retried"})
+TASKS_FAILED = Counter("background_tasks_total", "Background task runs by outcome", {"status": "failed"})
+# Сохраненные задачи не теряются: их заберет обход по истечении аренды
+TASKS_DROPPED = Counter("background_tasks_dropped_total", "Background tasks not queued because the queue was full or stopped")
+
+TaskHandler = Callable[..., Awaitable[None]]
+
+# Задачи по имени: по имени задача восстанавливается из таблицы после перезапуска
+TASKS: Dict[str, TaskHandler] = {}
+
+def background_task(name: str):
+    """Регистрация корутины как фоновой задачи"""
+    def register(handler: TaskHandler) -> TaskHandler:
+        if name in TASKS:
+            raise ValueError(f"Background task {name!r} is already registered")
+        TASKS[name] = handler
+        return handler
+    return register
+
+class Job:
+    """Задача в очереди: имя, аргументы в JSON, число выполненных попыток и строка таблицы"""
+
+    __slots__ = ("name", "payload", "attempts", "row_id", "row")
+
+    def __init__(self, name: str, payload: bytes, attempts: int = 0, row_id: Optional[int] = None):
+        self.name = name
+        self.payload = payload
+        self.attempts = attempts
+        self.row_id = row_id
+        self.row: Optional[BackgroundTask] = None
+
+def _lease_until(now: datetime) -> datetime:
+    return now + timedelta(seconds=settings.TASK_LEASE_SECONDS)
+
+class TaskQueue:
+    """Ограниченная очередь фоновых задач и корутины-исполнители"""
+
+    def __init__(self, size: int, workers: int):
+        self.size = size
+        self.workers = workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._recovery: Optional[asyncio.Task] = None
+        # Задачи, ожидающие повторной попытки
+        self._delayed: Dict[Job, asyncio.TimerHandle] = {}
+        # Строки таблицы, которые держит процесс: в очереди, выполняются или ждут повтора
+        self._held: Set[int] = set()
+        # Фабрика сессий для состояния задач и для самих задач (task_queue.session_factory())
+        self.session_factory: async_sessionmaker = async_session
+
+    def pending(self) -> int:
+        return (self._queue.qsize() if self._queue is not None else 0) + len(self._delayed)
+
+    def enqueue(self, name: str, db: Optional[AsyncSession] = None, **kwargs):
+        """Постановка задачи; с сессией db - после ее commit, поэтому вызывать до commit"""
+        if name not in TASKS:
+            raise ValueError(f"Unknown background task {name!r}")
+        job = Job(name, orjson.dumps(kwargs))
+        if db is None:
+            self.put(job)
+            return
+        if settings.TASK_PERSIST:
+            now = datetime.utcnow()
+            job.row = BackgroundTask(name=name, payload=job.payload.decode(), attempts=0,
+                                     run_at=now, locked_until=_lease_until(now))
+            db.add(job.row)
+        db.info.setdefault("background_tasks", []).append(job)
+        # Обработчики только на этой сессии: остальные сессии не проверяют список задач при каждом commit
+        session = db.sync_session
+        if not event.contains(session, "after_commit", self._queue_committed):
+            event.listen(session, "after_commit", self._queue_committed)
+            event.listen(session, "after_rollback", self._discard_uncommitted)
+
+    def _queue_committed(self, session):
+        jobs = session.info.pop("background_tasks", None)
+        for job in jobs or ():
+            if job.row is not None:
+                job.row_id, job.row = job.row.id, None
+            self.put(job)
+
+    def _discard_uncommitted(self, session):
+        session.info.pop("background_tasks", None)
+
+    def put(self, job: Job):
+        """Постановка подготовленной задачи без ожидания; при переполнении задача отбрасывается"""
+        if self._queue is not None:
+            try:
+                self._queue.put_nowait(job)
+            except asyncio.QueueFull:
+                pass
+            else:
+                if job.row_id is not None:
+                    self._held.add(job.row_id)
+                return
+        TASKS_DROPPED.inc()
+        logger.warning("background task dropped", extra={
+            "task": job.name, "persisted": job.row_id is not None, "queue_running": self._queue is not None
+        })
+        if job.row_id is not None:
+            # Аренда истечет, и строку заберет обход
+            self._held.discard(job.row_id)
+
+    def _schedule(self, job: Job, delay: float):
+        self._delayed[job] = asyncio.get_running_loop().call_later(delay, self._requeue, job)
+
+    def _requeue(self, job: Job):
+        del self._delayed[job]
+        self.put(job)
+
+    async def start(self, session_factory: Optional[async_sessionmaker] = None):
+        """Запуск исполнителей и, при TASK_PERSIST, обхода сохраненных задач"""
+        if self._queue is not None:
+            return
+        if session_factory is not None:
+            self.session_factory = session_factory
+        self._queue = asyncio.Queue(maxsize=self.size)
+        self._workers = [
+            asyncio.create_task(self._work(), name=f"background-task-{number}")
+            for number in range(self.workers)
+        ]
+        if settings.TASK_PERSIST:
+            self._recovery = asyncio.create_task(self._recover(), name="background-task-recovery")
+
+    async def stop(self):
+        """Остановка: ожидание очереди до TASK_DRAIN_SECONDS, освобождение аренды невыполненных задач"""
+        if self._queue is None:
+            return
+        if self._recovery is not None:
+            self._recovery.cancel()
+            self._recovery = None
+        try:
+            await asyncio.wait_for(self._queue.join(), settings.TASK_DRAIN_SECONDS)
+            drained = True
+        except asyncio.TimeoutError:
+            drained = False
+        if not drained or self._delayed:
+            # Несохраненные задачи теряются, сохраненные выполнит другой воркер или следующий запуск
+            logger.warning("background tasks left unfinished at shutdown", extra={
+                "pending": self.pending(), "persisted": len(self._held)
+            })
+        for handle in self._delayed.values():
+            handle.cancel()
+        self._delayed.clear()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+        if self._held:
+            # Сохраненные задачи сразу доступны другим воркерам и следующему запуску
+            await self._store(update(BackgroundTask).where(BackgroundTask.id.in_(list(self._held)))
+                              .values(locked_until=datetime.utcnow()))
+            self._held.clear()
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job):
+        job.attempts += 1
+        try:
+            handler = TASKS[job.name]
+            await asyncio.wait_for(handler(**orjson.loads(job.payload)), settings.TASK_TIMEOUT_SECONDS)
+        except Exception as exc:
+            await self._failed(job, exc)
+            return
+        TASKS_SUCCEEDED.inc()
+        if job.row_id is not None:
+            await self._store(delete(BackgroundTask).where(BackgroundTask.id == job.row_id))
+            self._held.discard(job.row_id)
+
+    async def _failed(self, job: Job, exc: Exception):
+        error = f"{type(exc).__name__}: {exc}"
+        if job.attempts >= settings.TASK_MAX_ATTEMPTS:
+            TASKS_FAILED.inc()
+            logger.error("background task failed", exc_info=exc, extra={"task": job.name, "attempts": job.attempts})
+            if job.row_id is not None:
+                # Строка без аренды остается для разбора и больше не выполняется
+                await self._store(update(BackgroundTask).where(BackgroundTask.id == job.row_id)
+                                  .values(attempts=job.attempts, locked_until=None, last_error=error))
+                self._held.discard(job.row_id)
+            return
+
+        TASKS_RETRIED.inc()
+        delay = min(settings.TASK_RETRY_BASE_SECONDS * 2 ** (job.attempts - 1), settings.TASK_RETRY_MAX_SECONDS)
+        # Случайная доля разводит повторы задач, упавших одновременно (например, при сбое базы)
+        delay *= random.uniform(0.5, 1.0)
+        logger.warning("background task failed, retrying", extra={
+            "task": job.name, "attempts": job.attempts, "delay": round(delay, 3), "error": error
+        })
+        if job.row_id is not None:
+            await self._store(update(BackgroundTask).where(BackgroundTask.id == job.row_id).values(
+                attempts=job.attempts, run_at=datetime.utcnow() + timedelta(seconds=delay), last_error=error
+            ))
+        self._schedule(job, delay)
+
+    async def _store(self, statement):
+        # Ошибка записи состояния не останавливает исполнителя: задача выполнится повторно
+        try:
+            async with sqlite_write(), self.session_factory() as session:
+                await session.execute(statement)
+                await session.commit()
+        except Exception:
+            logger.exception("background task state not saved")
+
+    async def _recover(self):
+        while True:
+            try:
+                await self._renew_and_claim()
+            except Exception:
+                logger.exception("background task recovery failed")
+            await asyncio.sleep(settings.TASK_LEASE_SECONDS / 3)
+
+    async def _renew_and_claim(self):
+        """Продление аренды своих задач и захват сохраненных задач с истекшей арендой"""
+        now = datetime.utcnow()
+        claimed = []
+        async with sqlite_write(), self.session_factory() as session:
+            if self._held:
+                await session.execute(update(BackgroundTask).where(BackgroundTask.id.in_(list(self._held)))
+                                      .values(locked_until=_lease_until(now)))
+            free = self.size - self.pending()
+            if free > 0:
+                rows = await session.execute(
+                    select(BackgroundTask.id, BackgroundTask.name, BackgroundTask.payload,
+                           BackgroundTask.attempts, BackgroundTask.run_at)
+                    .where(BackgroundTask.locked_until < now)
+                    .order_by(BackgroundTask.run_at).limit(free)
+                )
+                for row in rows.all():
+                    # Условное обновление: строку получает только один из воркеров, читавших ее одновременно
+                    result = await session.execute(
+                        update(BackgroundTask)
+                        .where(BackgroundTask.id == row.id, BackgroundTask.locked_until < now)
+                        .values(locked_until=_lease_until(now))
+                    )
+                    if result.rowcount == 1:
+                        claimed.append(row)
+            await session.commit()
+
+        for row in claimed:
+            job = Job(row.name, row.payload.encode(), row.attempts, row.id)
+            self._held.add(row.id)
+            delay = (row.run_at - now).total_seconds()
+            if delay > 0:
+                self._schedule(job, delay)
+            else:
+                self.put(job)
+        if claimed:
+            logger.info("background tasks recovered", extra={"count": len(claimed)})
+
+task_queue = TaskQueue(settings.TASK_QUEUE_SIZE, settings.TASK_WORKERS)
+
+TASKS_PENDING = Gauge("background_tasks_pending", "Background tasks queued or waiting for a retry", func=task_queue.pending)
@@ -0,0 +1,300 @@
+"""Трассировка запросов с записью спанов в локальный файл.
+
+Запрос попадает в выборку с вероятностью TRACING_SAMPLE_RATE (или по
+флагу sampled заголовка traceparent вызывающей стороны). Для запросов
+вне выборки span() возвращает общий пустой контекст - проверка одной
+контекстной переменной. Завершенные спаны копятся в ограниченном буфере,
+отдельный поток раз в TRACING_EXPORT_INTERVAL_SECONDS дописывает их в
+JSONL-файл: строка - запрос экспорта OTLP/JSON (resourceSpans), такой
+файл читает file-приемник OpenTelemetry Collector.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, List, Optional
+import orjson
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.utils.http_metrics import route_template
+from app.utils.metrics import Counter
+
+logger = logging.getLogger("app.tracing")
+
+SPANS_DROPPED = Counter("tracing_spans_dropped_total", "Finished spans dropped because the export buffer was full")
+SPANS_EXPORTED = Counter("tracing_spans_exported_total", "Spans written to the trace export file")
+
+# Виды спанов OTLP
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+
+_STATUS_OK = 1
+_STATUS_ERROR = 2
+
+class Span:
+    """Интервал работы внутри трассы запроса"""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace_id: str, parent_id: str, name: str, kind: int = KIND_INTERNAL,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes or {}
+        self.error: Optional[str] = None
+
+    def child(self, name: str, kind: int = KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None) -> "Span":
+        return Span(self.trace_id, self.span_id, name, kind, attributes)
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def end(self):
+        self.end_ns = time.time_ns()
+        exporter.add(self)
+
+    def to_otlp(self) -> dict:
+        data = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+            "status": {"code": _STATUS_ERROR, "message": self.error} if self.error else {"code": _STATUS_OK},
+        }
+        if self.parent_id:
+            data["parentSpanId"] = self.parent_id
+        return data
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # int64 в OTLP/JSON передается строкой
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+# Текущий спан запроса; None - запрос не попал в выборку
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+def current_trace_id() -> Optional[str]:
+    current = _current_span.get()
+    return current.trace_id if current is not None else None
+
+class _NoopSpan:
+    """Заглушка для запросов вне выборки"""
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NOOP_SPAN = _NoopSpan()
+
+@contextmanager
+def _child_span(parent: Span, name: str, kind: int, attributes: Optional[Dict[str, Any]]) -> Iterator[Span]:
+    child = parent.child(name, kind, attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as exc:
+        child.error = type(exc).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        child.end()
+
+def span(name: str, kind: int = KIND_INTERNAL, **attributes):
+    """Дочерний спан текущего; вне выборки - пустой контекст без накладных расходов"""
+    parent = _current_span.get()
+    if parent is None:
+        return _NOOP_SPAN
+    return _child_span(parent, name, kind, attributes)
+
+class SpanExporter:
+    """Буфер завершенных спанов и поток, дописывающий их в JSONL-файл"""
+
+    def __init__(self, path: str, buffer_size: int, interval: float):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.interval = interval
+        # deque.append и popleft потокобезопасны: спаны добавляют event loop и потоки пулов
+        self._buffer: Deque[Span] = deque()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, finished: Span):
+        if len(self._buffer) >= self.buffer_size:
+            SPANS_DROPPED.inc()
+            return
+        self._buffer.append(finished)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Остановка потока с записью оставшихся спанов"""
+        if self._thread is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except OSError:
+                logger.exception("trace export failed", extra={"path": self.path})
+            if self._stopping:
+                return
+
+    def flush(self):
+        spans: List[Span] = []
+        while self._buffer:
+            spans.append(self._buffer.popleft())
+        if not spans:
+            return
+
+        # pid читается при записи: воркеры создаются fork после импорта модуля
+        resource = {"attributes": [
+            {"key": "service.name", "value": {"stringValue": settings.TRACING_SERVICE_NAME}},
+            {"key": "process.pid", "value": {"intValue": str(os.getpid())}},
+        ]}
+        line = orjson.dumps({"resourceSpans": [{
+            "resource": resource,
+            "scopeSpans": [{"scope": {"name": "app.tracing"}, "spans": [item.to_otlp() for item in spans]}],
+        }]})
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Одна запись на пакет в режиме дозаписи: строки воркеров не перемешиваются
+        with open(self.path, "ab") as output:
+            output.write(line + b"\n")
+        SPANS_EXPORTED.inc(len(spans))
+
+exporter = SpanExporter(
+    settings.TRACING_EXPORT_PATH,
+    settings.TRACING_BUFFER_SIZE,
+    settings.TRACING_EXPORT_INTERVAL_SECONDS
+)
+
+def setup_tracing():
+    """Запуск потока экспорта, если трассировка включена"""
+    if settings.TRACING_SAMPLE_RATE > 0:
+        exporter.start()
+
+def shutdown_tracing():
+    exporter.stop()
+
+def _parse_traceparent(value: str) -> Optional[tuple]:
+    # W3C Trace Context: версия-trace_id-parent_id-флаги
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None
+    try:
+        sampled = int(parts[3], 16) & 1
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2], bool(sampled)
+
+class TracingMiddleware:
+    """ASGI middleware: корневой спан запроса для запросов из выборки"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        rate = settings.TRACING_SAMPLE_RATE
+        if scope["type"] != "http" or rate <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        trace_id, parent_id, sampled = None, "", random.random() < rate
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                parent = _parse_traceparent(value.decode("latin-1"))
+                if parent is not None:
+                    # Решение о выборке принимает вызывающая сторона
+                    trace_id, parent_id, sampled = parent
+                break
+        if not sampled:
+            await self.app(scope, receive, send)
+            return
+
+        root = Span(trace_id or f"{random.getrandbits(128):032x}", parent_id, scope["method"], KIND_SERVER, {
+            "http.method": scope["method"],
+            "http.target": scope["path"],
+        })
+        token = _current_span.set(root)
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                root.set_attribute("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    root.error = f"HTTP {message['status']}"
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        except BaseException as exc:
+            root.error = type(exc).__name__
+            raise
+        finally:
+            _current_span.reset(token)
+            # Шаблон маршрута известен только после сопоставления
+            route = route_template(scope, scope.get("route"))
+            root.name = f"{scope['method']} {route}"
+            root.set_attribute("http.route", route)
+            root.end()
+
+# Время commit ORM-сессии (вместе с flush и слушателями версий и событий)
+@event.listens_for(Session, "before_commit")
+def _start_commit_span(session):
+    parent = _current_span.get()
+    if parent is not None:
+        session.info["commit_span"] = parent.child("db.commit", KIND_CLIENT)
+
+@event.listens_for(Session, "after_commit")
+def _end_commit_span(session):
+    commit_span = session.info.pop("commit_span", None)
+    if commit_span is not None:
+        commit_span.end()
+
+@event.listens_for(Session, "after_rollback")
+def _end_failed_commit_span(session):
+    commit_span = session.info.pop("commit_span", None)
+    if commit_span is not None:
+        commit_span.error = "rollback"
+        commit_span.end()
@@ -0,0 +1,111 @@
+"""Микробенчмарк: стоимость сериализации строки для списков бронирований, комнат и доступности.
+
+Сравнивает прежний путь (ORM-объект -> from_orm -> dict -> валидация
+response_model -> json.dumps, как это делает FastAPI) с текущим (строка
+результата -> dict -> orjson). Данные загружаются заранее из SQLite в
+памяти, замеряется только преобразование в байты ответа.
+
+Запуск: python -m benchmarks.serialization [--rows 1000] [--repeat 20]
+"""
+import argparse
+import json
+import time
+import warnings
+from datetime import datetime, timedelta
+from typing import List
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from app.controllers.booking import BOOKING_LIST_COLUMNS
+from app.controllers.room import ROOM_LIST_COLUMNS
+from app.db.database import Base
+from app.models.booking import Booking, BookingStatus
+from app.models.room import Room
+from app.models.user import User, UserRole
+from app.schemas.booking import Booking as BookingSchema
+from app.schemas.room import Room as RoomSchema
+from app.utils.responses import ORJSONResponse
+
+START = datetime(2030, 1, 1, 8)
+
+def seed(session: Session, rows: int):
+    session.add(User(id=1, email="u@example.com", username="user", hashed_password="x", role=UserRole.USER))
+    for i in range(rows):
+        session.add(Room(id=i + 1, name=f"Room {i}", description="Описание комнаты", capacity=4,
+                         price_per_hour=100.0, has_projector=bool(i % 2), image_url=None))
+        session.add(Booking(id=i + 1, user_id=1, room_id=1, start_time=START + timedelta(hours=i),
+                            end_time=START + timedelta(hours=i, minutes=45), status=BookingStatus.CONFIRMED,
+                            total_price=75.0, notes="Заметка", created_at=START))
+    session.commit()
+
+def per_row_us(func, rows: int, repeat: int) -> float:
+    func()
+    started_at = time.process_time()
+    for _ in range(repeat):
+        func()
+    return (time.process_time() - started_at) / repeat / rows * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    # Прежний путь намеренно использует from_orm()/dict() из pydantic v1
+    warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        seed(session, args.rows)
+        booking_objects = session.scalars(select(Booking)).all()
+        booking_rows = session.execute(select(*BOOKING_LIST_COLUMNS.values(), Room.name.label("room_name"),
+                                              User.username.label("user_name"))
+                                       .join(Room, Room.id == Booking.room_id)
+                                       .join(User, User.id == Booking.user_id)).all()
+        room_objects = session.scalars(select(Room)).all()
+        room_rows = session.execute(select(*ROOM_LIST_COLUMNS.values())).all()
+
+    bookings_adapter = TypeAdapter(List[BookingSchema])
+    rooms_adapter = TypeAdapter(List[RoomSchema])
+    dict_adapter = TypeAdapter(List[dict])
+    render = ORJSONResponse(None).render
+
+    def bookings_before():
+        data = []
+        for booking in booking_objects:
+            booking_dict = BookingSchema.from_orm(booking).dict()
+            booking_dict["room_name"] = "Room 0"
+            data.append(booking_dict)
+        return json.dumps(bookings_adapter.dump_python(bookings_adapter.validate_python(data), mode="json")).encode()
+
+    def bookings_after():
+        return render([row._asdict() for row in booking_rows])
+
+    def rooms_before():
+        return json.dumps(rooms_adapter.dump_python(rooms_adapter.validate_python(room_objects), mode="json")).encode()
+
+    def rooms_after():
+        return render([row._asdict() for row in room_rows])
+
+    def availability_before():
+        data = [{"start_time": row.start_time.isoformat(), "end_time": row.end_time.isoformat(),
+                 "available": False, "booking_id": row.id} for row in booking_rows]
+        return json.dumps(dict_adapter.dump_python(dict_adapter.validate_python(data), mode="json")).encode()
+
+    def availability_after():
+        return render([{"start_time": row.start_time, "end_time": row.end_time,
+                        "available": False, "booking_id": row.id} for row in booking_rows])
+
+    print(f"Сериализация, мкс CPU на строку ({args.rows} строк):")
+    print(f"  {'endpoint':<30} {'до':>8} {'после':>8} {'ускорение':>10}")
+    for name, before, after in (
+        ("GET /bookings/", bookings_before, bookings_after),
+        ("GET /rooms/", rooms_before, rooms_after),
+        ("GET /rooms/{id}/availability", availability_before, availability_after),
+    ):
+        before_us = per_row_us(before, args.rows, args.repeat)
+        after_us = per_row_us(after, args.rows, args.repeat)
+        print(f"  {name:<30} {before_us:8.2f} {after_us:8.2f} {before_us / after_us:9.1f}x")
+
+if __name__ == "__main__":
+    main()
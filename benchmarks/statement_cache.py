@@ -0,0 +1,101 @@
+"""Микробенчмарк: затраты CPU на построение запросов горячего пути.
+
+Сравнивает запросы, собираемые через select() при каждом вызове, с
+заранее построенными запросами из app.db.statements и с lambda_stmt.
+Используется SQLite в памяти, чтобы время работы самой базы было
+минимальным. Дополнительно показывает цену
+компиляции SQL при отключенном кэше (query_cache_size=0).
+
+Запуск: python -m benchmarks.statement_cache [--iterations 20000]
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, lambda_stmt, select
+from sqlalchemy.orm import Session
+from app.db.database import Base
+from app.db.statements import ACTIVE_ROOM_BY_ID, OVERLAPPING_BOOKING, USER_BY_USERNAME
+from app.models.booking import Booking, BookingStatus
+from app.models.room import Room
+from app.models.user import User, UserRole
+
+START = datetime(2030, 1, 1, 10)
+END = START + timedelta(hours=2)
+
+def inline_queries(room_id: int):
+    """Прежний вариант: объекты запросов строятся заново"""
+    return [
+        (select(Room).where(Room.id == room_id, Room.is_active == True), None),
+        (select(User).where(User.username == "user"), None),
+        (select(Booking.id).where(
+            Booking.room_id == room_id,
+            Booking.status.in_([BookingStatus.PENDING, BookingStatus.CONFIRMED]),
+            Booking.start_time < END,
+            Booking.end_time > START
+        ).limit(1), None),
+    ]
+
+def lambda_queries(room_id: int):
+    """Вариант на lambda_stmt (для сравнения)"""
+    # Перечисления берем из замыкания: глобальные имена lambda_stmt заворачивает в PyWrapper
+    statuses = [BookingStatus.PENDING, BookingStatus.CONFIRMED]
+    return [
+        (lambda_stmt(lambda: select(Room).where(Room.id == room_id, Room.is_active == True)), None),
+        (lambda_stmt(lambda: select(User).where(User.username == "user")), None),
+        (lambda_stmt(lambda: select(Booking.id).where(
+            Booking.room_id == room_id,
+            Booking.status.in_(statuses),
+            Booking.start_time < END,
+            Booking.end_time > START
+        ).limit(1)), None),
+    ]
+
+def prebuilt_queries(room_id: int):
+    """Текущий вариант: готовые запросы и параметры"""
+    return [
+        (ACTIVE_ROOM_BY_ID, {"room_id": room_id}),
+        (USER_BY_USERNAME, {"username": "user"}),
+        (OVERLAPPING_BOOKING, {"room_id": room_id, "start_time": START, "end_time": END}),
+    ]
+
+def make_engine(query_cache_size: int = 500):
+    engine = create_engine("sqlite://", query_cache_size=query_cache_size)
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(User(email="u@example.com", username="user", hashed_password="x", role=UserRole.USER))
+        session.add(Room(name="Room", capacity=4, price_per_hour=10.0))
+        session.commit()
+    return engine
+
+def run(engine, build, iterations: int) -> float:
+    """Время CPU на один набор запросов, мкс"""
+    with Session(engine) as session:
+        for _ in range(200):
+            for stmt, params in build(1):
+                session.execute(stmt, params).all()
+        started_at = time.process_time()
+        for i in range(iterations):
+            for stmt, params in build(1 + i % 2):
+                session.execute(stmt, params).all()
+        return (time.process_time() - started_at) / iterations * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    cached = make_engine()
+    uncached = make_engine(query_cache_size=0)
+    results = [
+        ("select() без кэша компиляции", run(uncached, inline_queries, args.iterations // 10)),
+        ("select() с кэшем компиляции", run(cached, inline_queries, args.iterations)),
+        ("lambda_stmt", run(cached, lambda_queries, args.iterations)),
+        ("готовые запросы + bindparam", run(cached, prebuilt_queries, args.iterations)),
+    ]
+    baseline = results[1][1]
+    print("3 запроса горячего пути (комната, пользователь, пересечение), CPU на запрос API:")
+    for name, micros in results:
+        print(f"  {name:<32} {micros:8.1f} мкс  ({micros - baseline:+.1f})")
+
+if __name__ == "__main__":
+    main()
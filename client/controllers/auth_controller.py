@@ -17,6 +17,7 @@ class AuthController:
 
         token = response["access_token"]
         self.api_client.set_token(token)
+        self.api_client.set_refresh_token(response.get("refresh_token"))
 
         # Получаем данные пользователя
         user_data = self.api_client.get("/api/users/me")
@@ -42,6 +43,17 @@ class AuthController:
         # После регистрации можно залогинить пользователя сразу
         self.login(username, password)
 
+    def logout(self):
+        """Отзыв refresh-токена на сервере"""
+        if self.api_client.refresh_token:
+            try:
+                self.api_client.post("/token/revoke", data={
+                    "refresh_token": self.api_client.refresh_token
+                })
+            except Exception:
+                # Выход не должен зависеть от доступности сервера
+                pass
+
     def validate_token(self, success_callback, error_callback):
         """Проверка токена"""
         try:
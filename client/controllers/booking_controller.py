@@ -15,9 +15,12 @@ class BookingController(QObject):
         super().__init__()
         self.api_client = api_client
     
-    def get_bookings(self, filters=None):
-        """Получение списка бронирований с возможностью фильтрации"""
+    def get_bookings(self, filters=None, fields=None):
+        """Получение списка бронирований с возможностью фильтрации; fields - только нужные поля"""
         try:
+            if fields:
+                filters = dict(filters or {}, fields=",".join(fields))
+            
             # Преобразуем даты в строки ISO формата
             if filters and "start_date" in filters and isinstance(filters["start_date"], datetime):
                 filters["start_date"] = filters["start_date"].isoformat()
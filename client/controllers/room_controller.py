@@ -15,9 +15,11 @@ class RoomController(QObject):
         super().__init__()
         self.api_client = api_client
     
-    def get_rooms(self, filters=None):
-        """Получение списка комнат с возможностью фильтрации"""
+    def get_rooms(self, filters=None, fields=None):
+        """Получение списка комнат с возможностью фильтрации; fields - только нужные поля"""
         try:
+            if fields:
+                filters = dict(filters or {}, fields=",".join(fields))
             response = self.api_client.get("/rooms/", params=filters)
             self.rooms_loaded.emit(response)
             return response
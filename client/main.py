@@ -13,6 +13,7 @@ from controllers.auth_controller import AuthController
 from controllers.room_controller import RoomController
 from controllers.booking_controller import BookingController
 from utils.api_client import ApiClient
+from utils.event_stream import EventStream
 
 root_dir = Path(__file__).parent.parent
 sys.path.append(str(root_dir))
@@ -29,6 +30,10 @@ class CoworkingApp(QMainWindow):
         # Инициализация API клиента
         base_url = os.environ.get("API_URL", "http://127.0.0.1:8888")
         self.api_client = ApiClient(base_url)
+        self.api_client.tokens_refreshed.connect(self.save_tokens)
+        
+        # Поток изменений с сервера: вкладки обновляются без опроса
+        self.event_stream = EventStream(self.api_client, self)
         
         # Инициализация контроллеров
         self.auth_controller = AuthController(self.api_client, self)
@@ -48,6 +53,7 @@ class CoworkingApp(QMainWindow):
         self.stacked_widget.addWidget(self.login_view)
         self.stacked_widget.addWidget(self.register_view)
         self.stacked_widget.addWidget(self.main_view)
+        self.event_stream.event_received.connect(self.main_view.apply_event)
         
         # Установка начального представления
         self.show_login()
@@ -67,28 +73,44 @@ class CoworkingApp(QMainWindow):
         """Показать главный экран приложения"""
         self.main_view.refresh_data()
         self.stacked_widget.setCurrentWidget(self.main_view)
+        # refresh_data мог завершить сессию, если токен недействителен
+        if self.api_client.token and not self.event_stream.isRunning():
+            self.event_stream.start()
     
     def login_success(self, token, user_data):
         """Обработка успешного входа"""
         self.api_client.set_token(token)
-        self.settings.setValue("token", token)
+        self.save_tokens(token, self.api_client.refresh_token)
         self.settings.setValue("user_data", user_data)
         self.show_main()
     
+    def save_tokens(self, token, refresh_token):
+        """Сохранение токенов (в том числе после прозрачного обновления)"""
+        self.settings.setValue("token", token)
+        if refresh_token:
+            self.settings.setValue("refresh_token", refresh_token)
+    
     def logout(self):
         """Выход из системы"""
+        self.event_stream.stop()
+        self.event_stream.last_event_id = None
+        self.auth_controller.logout()
         self.api_client.clear_token()
         self.settings.remove("token")
+        self.settings.remove("refresh_token")
         self.settings.remove("user_data")
         self.show_login()
     
     def restore_session(self):
         """Восстановление сессии из сохраненных настроек"""
         token = self.settings.value("token")
+        refresh_token = self.settings.value("refresh_token")
         user_data = self.settings.value("user_data")
         
         if token and user_data:
             self.api_client.set_token(token)
+            # Истекший токен доступа будет обновлен по refresh-токену без пароля
+            self.api_client.set_refresh_token(refresh_token)
             # Проверяем валидность токена
             self.auth_controller.validate_token(
                 success_callback=lambda: self.show_main(),
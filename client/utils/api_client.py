@@ -10,23 +10,36 @@ class ApiClient(QObject):
     request_started = pyqtSignal(str)
     request_finished = pyqtSignal(str)
     request_error = pyqtSignal(str, str)
+    tokens_refreshed = pyqtSignal(str, str)
     
     def __init__(self, base_url):
         super().__init__()
         self.base_url = base_url
         self.token = None
+        self.refresh_token = None
         self.headers = {
             "Content-Type": "application/json"
         }
+        # Общая сессия хранит cookie сервера (отметку последней записи для чтения своих изменений)
+        self.session = requests.Session()
+        # Ответы GET по ETag: (url, параметры) -> (etag, данные)
+        self._etag_cache = {}
     
     def set_token(self, token):
         """Установка токена авторизации"""
         self.token = token
         self.headers["Authorization"] = f"Bearer {token}"
     
+    def set_refresh_token(self, refresh_token):
+        """Установка refresh-токена"""
+        self.refresh_token = refresh_token
+    
     def clear_token(self):
         """Очистка токена авторизации"""
         self.token = None
+        self.refresh_token = None
+        self._etag_cache.clear()
+        self.session.cookies.clear()
         if "Authorization" in self.headers:
             del self.headers["Authorization"]
     
@@ -48,57 +61,117 @@ class ApiClient(QObject):
         except json.JSONDecodeError:
             return response.text
     
-    def get(self, endpoint, params=None):
-        """Выполнение GET-запроса"""
+    def _send(self, method, url, etag=None, **kwargs):
+        """Отправка запроса с текущими заголовками"""
+        headers = self.headers
+        if etag:
+            headers = dict(headers, **{"If-None-Match": etag})
+        return self.session.request(method, url, headers=headers, **kwargs)
+    
+    def _cache_key(self, url, params):
+        """Ключ сохраненной копии ответа GET"""
+        return (url, tuple(sorted((params or {}).items())))
+    
+    def _request(self, method, endpoint, **kwargs):
+        """Выполнение запроса с прозрачным обновлением истекшего токена"""
         url = f"{self.base_url}{endpoint}"
         self.request_started.emit(url)
         
+        # Для GET отправляем ETag сохраненной копии: если данные не менялись,
+        # сервер ответит 304 без тела
+        cache_key = None
+        cached = None
+        if method == "GET":
+            cache_key = self._cache_key(url, kwargs.get("params"))
+            cached = self._etag_cache.get(cache_key)
+        etag = cached[0] if cached else None
+        
         try:
-            response = requests.get(url, headers=self.headers, params=params)
+            response = self._send(method, url, etag=etag, **kwargs)
+            # Токен доступа истек - обмениваем refresh-токен и повторяем запрос
+            if response.status_code == 401 and self.refresh_token and self.refresh_access_token():
+                response = self._send(method, url, etag=etag, **kwargs)
             self.request_finished.emit(url)
-            return self._handle_response(response)
+            if response.status_code == 304 and cached:
+                return cached[1]
+            data = self._handle_response(response)
+            if cache_key is not None and response.headers.get("ETag"):
+                self._etag_cache[cache_key] = (response.headers["ETag"], data)
+            return data
         except requests.exceptions.RequestException as e:
             self.request_error.emit(url, str(e))
             raise
     
+    def refresh_access_token(self):
+        """Обмен refresh-токена на новую пару токенов без ввода пароля"""
+        try:
+            response = self.session.post(
+                f"{self.base_url}/token/refresh",
+                json={"refresh_token": self.refresh_token}
+            )
+        except requests.exceptions.RequestException:
+            return False
+        
+        if response.status_code != 200:
+            # Токен отозван или истек - нужен полноценный вход
+            self.refresh_token = None
+            return False
+        
+        data = response.json()
+        self.set_token(data["access_token"])
+        self.set_refresh_token(data["refresh_token"])
+        self.tokens_refreshed.emit(self.token, self.refresh_token)
+        return True
+    
+    def get(self, endpoint, params=None):
+        """Выполнение GET-запроса"""
+        return self._request("GET", endpoint, params=params)
+    
+    def batch(self, requests_list):
+        """Выполнение нескольких GET-запросов одним вызовом POST /batch.
+        
+        requests_list - список {"id": ..., "path": ..., "params": {...}}.
+        Возвращает словарь id -> данные ответа; для неудачных подзапросов
+        вместо данных - исключение с сообщением сервера.
+        """
+        sub_requests = []
+        for item in requests_list:
+            sub_request = dict(item)
+            cached = self._etag_cache.get(self._cache_key(f"{self.base_url}{item['path']}", item.get("params")))
+            if cached:
+                sub_request["headers"] = {"If-None-Match": cached[0]}
+            sub_requests.append(sub_request)
+        
+        response = self.post("/batch", {"requests": sub_requests})
+        
+        results = {}
+        for item, result in zip(requests_list, response["responses"]):
+            url = f"{self.base_url}{item['path']}"
+            cache_key = self._cache_key(url, item.get("params"))
+            if result["status"] == 304 and cache_key in self._etag_cache:
+                results[item["id"]] = self._etag_cache[cache_key][1]
+            elif result["status"] < 400:
+                if result["headers"].get("etag"):
+                    self._etag_cache[cache_key] = (result["headers"]["etag"], result["body"])
+                results[item["id"]] = result["body"]
+            else:
+                body = result["body"]
+                error_msg = body.get("detail", str(body)) if isinstance(body, dict) else str(body)
+                self.request_error.emit(url, str(error_msg))
+                results[item["id"]] = Exception(error_msg)
+        return results
+    
     def post(self, endpoint, data=None):
         """Выполнение POST-запроса"""
-        url = f"{self.base_url}{endpoint}"
-        self.request_started.emit(url)
-        
-        try:
-            response = requests.post(url, headers=self.headers, json=data)
-            self.request_finished.emit(url)
-            return self._handle_response(response)
-        except requests.exceptions.RequestException as e:
-            self.request_error.emit(url, str(e))
-            raise
+        return self._request("POST", endpoint, json=data)
     
     def put(self, endpoint, data=None):
         """Выполнение PUT-запроса"""
-        url = f"{self.base_url}{endpoint}"
-        self.request_started.emit(url)
-        
-        try:
-            response = requests.put(url, headers=self.headers, json=data)
-            self.request_finished.emit(url)
-            return self._handle_response(response)
-        except requests.exceptions.RequestException as e:
-            self.request_error.emit(url, str(e))
-            raise
+        return self._request("PUT", endpoint, json=data)
     
     def delete(self, endpoint):
         """Выполнение DELETE-запроса"""
-        url = f"{self.base_url}{endpoint}"
-        self.request_started.emit(url)
-        
-        try:
-            response = requests.delete(url, headers=self.headers)
-            self.request_finished.emit(url)
-            return self._handle_response(response)
-        except requests.exceptions.RequestException as e:
-            self.request_error.emit(url, str(e))
-            raise
+        return self._request("DELETE", endpoint)
 
 class DateTimeEncoder(json.JSONEncoder):
     """Кастомный JSON энкодер для работы с datetime"""
@@ -0,0 +1,97 @@
+import json
+import requests
+from PyQt5.QtCore import QThread, pyqtSignal
+
+class EventStream(QThread):
+    """Фоновое чтение потока изменений GET /events (Server-Sent Events)"""
+
+    # Тип события и его данные; обработчики выполняются в основном потоке
+    event_received = pyqtSignal(str, dict)
+
+    def __init__(self, api_client, parent=None):
+        super().__init__(parent)
+        self.api_client = api_client
+        self.last_event_id = None
+        self.retry_ms = 5000
+        self._running = False
+        self._response = None
+
+    def stop(self):
+        """Остановка потока: закрываем соединение, чтобы прервать ожидание данных"""
+        self._running = False
+        response = self._response
+        if response is not None:
+            try:
+                response.close()
+            except Exception:
+                pass
+        self.wait(2000)
+
+    def run(self):
+        self._running = True
+        while self._running:
+            try:
+                self._listen()
+            except Exception:
+                pass
+            if self._running:
+                # Сервер недоступен или соединение оборвано - переподключаемся с Last-Event-ID
+                self.msleep(self.retry_ms)
+
+    def _listen(self):
+        headers = {"Accept": "text/event-stream"}
+        if self.api_client.token:
+            headers["Authorization"] = f"Bearer {self.api_client.token}"
+        if self.last_event_id:
+            headers["Last-Event-ID"] = self.last_event_id
+
+        response = requests.get(
+            f"{self.api_client.base_url}/events",
+            headers=headers,
+            stream=True,
+            timeout=(10, None)
+        )
+        self._response = response
+        try:
+            if response.status_code == 401:
+                # Токен доступа истек: его обновит очередной запрос ApiClient,
+                # переподключение возьмет новый токен
+                return
+            response.raise_for_status()
+            self._read_events(response)
+        finally:
+            self._response = None
+            response.close()
+
+    def _read_events(self, response):
+        event_type, data, event_id = "message", [], None
+        for line in response.iter_lines(decode_unicode=True):
+            if not self._running:
+                return
+            if line is None:
+                continue
+            if not line:
+                # Пустая строка завершает событие
+                if data:
+                    if event_id is not None:
+                        self.last_event_id = event_id
+                    try:
+                        payload = json.loads("\n".join(data))
+                    except ValueError:
+                        payload = {}
+                    self.event_received.emit(event_type, payload if isinstance(payload, dict) else {})
+                event_type, data, event_id = "message", [], None
+                continue
+            if line.startswith(":"):
+                # Комментарий (keep-alive)
+                continue
+            name, _, value = line.partition(":")
+            value = value[1:] if value.startswith(" ") else value
+            if name == "event":
+                event_type = value
+            elif name == "data":
+                data.append(value)
+            elif name == "id":
+                event_id = value
+            elif name == "retry" and value.isdigit():
+                self.retry_ms = int(value)
@@ -78,23 +78,44 @@ class MainView(QWidget):
                 self.tab_widget.removeTab(self.tab_widget.indexOf(self.analytics_tab))
     
     def refresh_data(self):
-        """Обновление данных на всех вкладках"""
+        """Обновление данных на всех вкладках одним пакетным запросом"""
+        is_admin = self.user_data and self.user_data.get("role") == "admin"
+        
+        # Данные пользователя и всех вкладок; аналитика - если роль уже известна
+        requests_list = [{"id": "me", "path": "/users/me"}]
+        requests_list += self.rooms_tab.data_requests()
+        requests_list += self.bookings_tab.data_requests()
+        if is_admin:
+            requests_list += self.analytics_tab.data_requests()
+        
         # Получение данных пользователя
         try:
-            user_data = self.parent.api_client.get("/users/me")
-            self.set_user_data(user_data)
+            results = self.parent.api_client.batch(requests_list)
+            if isinstance(results["me"], Exception):
+                raise results["me"]
+            self.set_user_data(results["me"])
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Не удалось получить данные пользователя: {str(e)}")
             self.parent.logout()
             return
         
         # Обновление данных на вкладках
-        self.rooms_tab.refresh_data()
-        self.bookings_tab.refresh_data()
+        self.rooms_tab.refresh_data(results)
+        self.bookings_tab.refresh_data(results)
         
         # Обновление данных на вкладке аналитики (только для администраторов)
         if self.user_data and self.user_data.get("role") == "admin":
-            self.analytics_tab.refresh_data()
+            self.analytics_tab.refresh_data(results if is_admin else None)
+    
+    def apply_event(self, event_type, data):
+        """Применение события потока изменений к вкладкам"""
+        if event_type == "resync":
+            # События пропущены (клиент не успевал читать или сервер перезапущен)
+            self.refresh_data()
+            return
+        if event_type.startswith(("booking.", "room.")):
+            self.rooms_tab.apply_event(event_type, data)
+            self.bookings_tab.apply_event(event_type, data)
     
     def logout(self):
         """Выход из системы"""
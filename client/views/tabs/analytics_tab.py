@@ -63,7 +63,7 @@ class AnalyticsTab(QWidget):
 
         # Кнопка обновления
         refresh_button = QPushButton("Обновить")
-        refresh_button.clicked.connect(self.refresh_data)
+        refresh_button.clicked.connect(lambda: self.refresh_data())
         top_panel.addWidget(refresh_button)
 
         main_layout.addLayout(top_panel)
@@ -102,42 +102,55 @@ class AnalyticsTab(QWidget):
                 "Кол-во бронирований", "Общие расходы"
             ])
 
-    def refresh_data(self):
-        """Обновление данных аналитики"""
+    def report_request(self):
+        """Путь и параметры выбранного отчета"""
+        report_type = self.report_type_combo.currentData()
+        start_date = self.start_date_edit.date().toString("yyyy-MM-dd")
+        end_date = self.end_date_edit.date().toString("yyyy-MM-dd")
+        params = {
+            "start_date": f"{start_date}T00:00:00",
+            "end_date": f"{end_date}T23:59:59"
+        }
+
+        if report_type == "revenue":
+            params["group_by"] = self.group_by_combo.currentData()
+        elif report_type == "user-activity":
+            params["limit"] = 100
+
+        return f"/analytics/{report_type}", params
+
+    def data_requests(self):
+        """Подзапросы вкладки для пакетного обновления данных"""
+        path, params = self.report_request()
+        return [{"id": "analytics", "path": path, "params": params}]
+
+    def refresh_data(self, results=None):
+        """Обновление данных аналитики; results - готовые результаты пакетного запроса"""
         if not self.parent.user_data or self.parent.user_data.get("role") != "admin":
             QMessageBox.warning(self, "Предупреждение", "Только администраторы могут просматривать аналитику")
             return
 
         report_type = self.report_type_combo.currentData()
-        start_date = self.start_date_edit.date().toString("yyyy-MM-dd")
-        end_date = self.end_date_edit.date().toString("yyyy-MM-dd")
 
         try:
+            if results is None:
+                path, params = self.report_request()
+                data = self.parent.parent.api_client.get(path, params=params)
+            elif isinstance(results["analytics"], Exception):
+                raise results["analytics"]
+            else:
+                data = results["analytics"]
+
             if report_type == "revenue":
-                group_by = self.group_by_combo.currentData()
-                params = {
-                    "start_date": f"{start_date}T00:00:00",
-                    "end_date": f"{end_date}T23:59:59",
-                    "group_by": group_by
-                }
-                self.revenue_data = self.parent.parent.api_client.get("/analytics/revenue", params=params)
+                self.revenue_data = data
                 self.update_revenue_table()
 
             elif report_type == "room-usage":
-                params = {
-                    "start_date": f"{start_date}T00:00:00",
-                    "end_date": f"{end_date}T23:59:59"
-                }
-                self.room_usage_data = self.parent.parent.api_client.get("/analytics/room-usage", params=params)
+                self.room_usage_data = data
                 self.update_room_usage_table()
 
             elif report_type == "user-activity":
-                params = {
-                    "start_date": f"{start_date}T00:00:00",
-                    "end_date": f"{end_date}T23:59:59",
-                    "limit": 100
-                }
-                self.user_activity_data = self.parent.parent.api_client.get("/analytics/user-activity", params=params)
+                self.user_activity_data = data
                 self.update_user_activity_table()
 
         except Exception as e:
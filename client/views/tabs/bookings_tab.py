@@ -5,6 +5,10 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
 from PyQt5.QtCore import Qt, QDateTime
 from datetime import datetime, timedelta
 
+# Поля, которые показывает таблица; полная запись загружается при просмотре и изменении
+BOOKING_TABLE_FIELDS = ("id", "room_id", "room_name", "start_time", "end_time", "status", "total_price")
+ROOM_CHOICE_FIELDS = ("id", "name", "capacity", "price_per_hour", "is_active")
+
 class BookingsTab(QWidget):
     """Вкладка для управления бронированиями"""
     
@@ -39,7 +43,7 @@ class BookingsTab(QWidget):
         
         # Кнопка обновления списка
         refresh_button = QPushButton("Обновить")
-        refresh_button.clicked.connect(self.refresh_data)
+        refresh_button.clicked.connect(lambda: self.refresh_data())
         top_panel.addWidget(refresh_button)
         
         # Добавление верхней панели в основной контейнер
@@ -62,14 +66,28 @@ class BookingsTab(QWidget):
         # Установка основного контейнера
         self.setLayout(main_layout)
     
-    def refresh_data(self):
-        """Обновление списка бронирований"""
+    def data_requests(self):
+        """Подзапросы вкладки для пакетного обновления данных"""
+        return [
+            {"id": "booking_rooms", "path": "/rooms/", "params": {"fields": ",".join(ROOM_CHOICE_FIELDS)}},
+            {"id": "bookings", "path": "/bookings/", "params": {"fields": ",".join(BOOKING_TABLE_FIELDS)}},
+        ]
+    
+    def refresh_data(self, results=None):
+        """Обновление списка бронирований; results - готовые результаты пакетного запроса"""
         try:
-            # Получение списка комнат
-            self.rooms = self.parent.parent.room_controller.get_rooms()
-            
-            # Получение списка бронирований
-            self.bookings = self.parent.parent.booking_controller.get_bookings()
+            if results is None:
+                # Получение списка комнат
+                self.rooms = self.parent.parent.room_controller.get_rooms(fields=ROOM_CHOICE_FIELDS)
+                
+                # Получение списка бронирований
+                self.bookings = self.parent.parent.booking_controller.get_bookings(fields=BOOKING_TABLE_FIELDS)
+            else:
+                for key in ("booking_rooms", "bookings"):
+                    if isinstance(results[key], Exception):
+                        raise results[key]
+                self.rooms = results["booking_rooms"]
+                self.bookings = results["bookings"]
             
             # Обновление таблицы
             self.update_table()
@@ -77,6 +95,30 @@ class BookingsTab(QWidget):
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Не удалось получить данные: {str(e)}")
     
+    def apply_event(self, event_type, data):
+        """Применение события потока изменений без повторной загрузки списков"""
+        if event_type.startswith("room."):
+            self.rooms = [room for room in self.rooms if room["id"] != data["id"]]
+            if event_type != "room.deleted" and data.get("is_active", True):
+                self.rooms.append({field: data.get(field) for field in ROOM_CHOICE_FIELDS})
+                self.rooms.sort(key=lambda room: room["id"])
+                # Название комнаты могло измениться
+                for booking in self.bookings:
+                    if booking.get("room_id") == data["id"]:
+                        booking["room_name"] = data.get("name", booking.get("room_name"))
+        else:
+            # В списке только свои бронирования (у администратора - все); у чужих
+            # событие без user_id - это только занятость комнаты
+            user_data = self.parent.user_data or {}
+            if user_data.get("role") != "admin" and data.get("user_id") != user_data.get("id"):
+                return
+            room_names = {room["id"]: room.get("name", "") for room in self.rooms}
+            booking = {field: data.get(field) for field in BOOKING_TABLE_FIELDS if field in data}
+            booking["room_name"] = room_names.get(booking.get("room_id"), "")
+            self.bookings = [b for b in self.bookings if b["id"] != booking["id"]] + [booking]
+            self.bookings.sort(key=lambda b: b["start_time"], reverse=True)
+        self.update_table()
+
     def update_table(self):
         """Обновление таблицы бронирований"""
         # Очистка таблицы
@@ -246,8 +288,14 @@ class BookingsTab(QWidget):
             except Exception as e:
                 QMessageBox.critical(self, "Ошибка", f"Не удалось создать бронирование: {str(e)}")
     
+    def load_booking(self, booking):
+        """Полная запись бронирования вместо строки таблицы"""
+        return self.parent.parent.booking_controller.get_booking(booking["id"]) or booking
+    
     def view_booking(self, booking):
         """Просмотр информации о бронировании"""
+        booking = self.load_booking(booking)
+        
         # Создание диалога
         dialog = QDialog(self)
         dialog.setWindowTitle(f"Бронирование #{booking['id']}")
@@ -319,6 +367,7 @@ class BookingsTab(QWidget):
         if booking["status"] not in ["pending", "confirmed"]:
             QMessageBox.warning(self, "Предупреждение", "Нельзя изменить отмененное или завершенное бронирование")
             return
+        booking = self.load_booking(booking)
         
         # Создание диалога
         dialog = QDialog(self)
@@ -37,7 +37,7 @@ class RoomsTab(QWidget):
         
         # Кнопка обновления списка
         refresh_button = QPushButton("Обновить")
-        refresh_button.clicked.connect(self.refresh_data)
+        refresh_button.clicked.connect(lambda: self.refresh_data())
         top_panel.addWidget(refresh_button)
         
         # Добавление верхней панели в основной контейнер
@@ -60,11 +60,20 @@ class RoomsTab(QWidget):
         # Установка основного контейнера
         self.setLayout(main_layout)
     
-    def refresh_data(self):
-        """Обновление списка комнат"""
+    def data_requests(self):
+        """Подзапросы вкладки для пакетного обновления данных"""
+        return [{"id": "rooms", "path": "/rooms/"}]
+    
+    def refresh_data(self, results=None):
+        """Обновление списка комнат; results - готовые результаты пакетного запроса"""
         try:
             # Получение списка комнат
-            self.rooms = self.parent.parent.room_controller.get_rooms()
+            if results is None:
+                self.rooms = self.parent.parent.room_controller.get_rooms()
+            elif isinstance(results["rooms"], Exception):
+                raise results["rooms"]
+            else:
+                self.rooms = results["rooms"]
             
             # Обновление таблицы
             self.update_table()
@@ -76,6 +85,17 @@ class RoomsTab(QWidget):
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Не удалось получить список комнат: {str(e)}")
     
+    def apply_event(self, event_type, data):
+        """Применение события потока изменений без повторной загрузки списка"""
+        if not event_type.startswith("room."):
+            return
+        # В списке только активные комнаты
+        self.rooms = [room for room in self.rooms if room["id"] != data["id"]]
+        if event_type != "room.deleted" and data.get("is_active", True):
+            self.rooms.append(data)
+            self.rooms.sort(key=lambda room: room["id"])
+        self.update_table()
+
     def update_table(self):
         """Обновление таблицы комнат"""
         # Очистка таблицы
@@ -1,6 +1,8 @@
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
 from fastapi.testclient import TestClient
 import os
 import sys
@@ -8,20 +10,114 @@ import sys
 # Добавляем путь к корневой директории проекта
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
+# Тесты всегда выполняются в режиме поиска N+1: ленивая загрузка отношений запрещена
+os.environ.setdefault("N_PLUS_ONE_DETECTION", "true")
+# Лимит логинов (10/minute на адрес) исчерпался бы фикстурами токенов за несколько тестов;
+# ограничение частоты проверяется отдельно в tests/test_rate_limit.py
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
 from app.db.database import Base
-from app.main import app
-from app.db.database import get_db
+from app.main import create_app
+from app.db.database import configure_engine
+from app.db.sqlite import configure_sqlite
+from app.db.query_log import add_request_observer, remove_request_observer
 from app.models.user import User, UserRole
 from app.models.room import Room
 from app.models.booking import Booking, BookingStatus
-from app.utils.security import get_password_hash
+from app.utils.security import get_password_hash, token_payload_cache, token_versions, user_cache
 from datetime import datetime, timedelta
 
 # Создаем тестовую базу данных в памяти
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+# Те же PRAGMA, что и у движка приложения: иначе открытое соединение не даст включить WAL
+configure_sqlite(engine, manage_transactions=False)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Приложение работает с AsyncSession в профиле SQLite (WAL, очередь писателей);
+# NullPool - у каждого TestClient свой event loop
+ASYNC_SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
+async_engine = configure_engine(create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, poolclass=NullPool))
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "query_budget(n): каждый HTTP-запрос теста выполняет не больше n SQL-запросов"
+    )
+    config.addinivalue_line(
+        "markers", "postgres: тест с PostgreSQL из TEST_POSTGRES_URL, без нее пропускается"
+    )
+
+def pytest_collection_modifyitems(config, items):
+    if os.environ.get("TEST_POSTGRES_URL"):
+        return
+    skip = pytest.mark.skip(reason="TEST_POSTGRES_URL is not set")
+    for item in items:
+        if "postgres" in item.keywords:
+            item.add_marker(skip)
+
+class QueryBudget:
+    """Проверка числа SQL-запросов на HTTP-запрос в пределах блока with"""
+
+    def __init__(self):
+        self.requests = []
+
+    def _observe(self, scope, status_code, stats):
+        self.requests.append((f"{scope['method']} {scope['path']}", stats))
+
+    def __call__(self, budget: int):
+        self.budget = budget
+        return self
+
+    def __enter__(self):
+        self.requests = []
+        add_request_observer(self._observe)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        remove_request_observer(self._observe)
+        if exc_type is None:
+            self.check(self.budget)
+
+    def check(self, budget: int):
+        exceeded = [(request, stats) for request, stats in self.requests if stats.count > budget]
+        if exceeded:
+            lines = []
+            for request, stats in exceeded:
+                lines.append(f"{request}: {stats.count} queries (budget {budget})")
+                for statement, count in stats.repeated_statements(2):
+                    lines.append(f"    x{count}: {' '.join(statement.split())}")
+            pytest.fail("Query budget exceeded:\n" + "\n".join(lines), pytrace=False)
+
+@pytest.fixture
+def query_budget():
+    """Фикстура: with query_budget(3): client.get(...)"""
+    return QueryBudget()
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item):
+    # Маркер проверяет только запросы самого теста, без запросов фикстур (логин и т.п.)
+    marker = item.get_closest_marker("query_budget")
+    if marker is None:
+        return (yield)
+    budget = QueryBudget()
+    add_request_observer(budget._observe)
+    try:
+        result = yield
+    finally:
+        remove_request_observer(budget._observe)
+    budget.check(marker.args[0])
+    return result
+
+@pytest.fixture(autouse=True)
+def reset_auth_state():
+    # Идентификаторы пользователей повторяются между тестами: версии и кэши одного теста
+    # не должны влиять на другой
+    yield
+    token_versions.clear()
+    user_cache.clear()
+    token_payload_cache.clear()
+
 @pytest.fixture(scope="function")
 def db():
     # Создаем таблицы в базе данных
@@ -37,22 +133,19 @@ def db():
         # Удаляем таблицы после завершения теста
         Base.metadata.drop_all(bind=engine)
 
+def build_app():
+    # Запросы, подготовка при запуске и фоновые задачи работают с тестовой базой
+    return create_app(async_engine, TestingAsyncSessionLocal)
+
+@pytest.fixture(scope="function")
+def make_app(db):
+    """Фикстура: новое приложение из create_app() с тестовой базой (после изменения настроек)"""
+    return build_app
+
 @pytest.fixture(scope="function")
 def client(db):
-    # Переопределяем зависимость для получения тестовой базы данных
-    def override_get_db():
-        try:
-            yield db
-        finally:
-            pass
-    
-    app.dependency_overrides[get_db] = override_get_db
-    
-    with TestClient(app) as client:
+    with TestClient(build_app()) as client:
         yield client
-    
-    # Очищаем переопределения зависимостей
-    app.dependency_overrides = {}
 
 @pytest.fixture(scope="function")
 def test_user(db):
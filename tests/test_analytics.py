@@ -0,0 +1,109 @@
+import os
+import time
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+import pytest
+from app.config import settings
+from app.models.booking import BookingStatus
+from app.schemas.report import ReportStatus
+from app.utils import reports
+
+TEST_DATABASE_PATH = os.path.abspath("test.db")
+
+@pytest.fixture
+def reports_dir(tmp_path, monkeypatch):
+    """Отчеты в отдельном каталоге; дочерние процессы пула читают тестовую базу"""
+    monkeypatch.setattr(settings, "REPORTS_DIR", str(tmp_path))
+    # Процессы пула запускаются через spawn и берут настройки из окружения
+    monkeypatch.setenv("REPORTS_DIR", str(tmp_path))
+    monkeypatch.setenv("DATABASE_URL", f"sqlite+aiosqlite:///{TEST_DATABASE_PATH}")
+    reports.shutdown_report_executor()
+    yield tmp_path
+    reports.shutdown_report_executor()
+
+def _report_request(report_type: str = "user-spending") -> dict:
+    now = datetime.utcnow()
+    return {
+        "report_type": report_type,
+        "format": "csv",
+        "start_date": (now - timedelta(days=1)).isoformat(),
+        "end_date": (now + timedelta(days=1)).isoformat(),
+    }
+
+def _wait_for_report(client, job_id: str, headers: dict, timeout: float = 60) -> dict:
+    """Опрос статуса задачи до итогового состояния"""
+    deadline = time.monotonic() + timeout
+    while True:
+        response = client.get(f"/analytics/reports/{job_id}", headers=headers)
+        assert response.status_code == 200
+        job = response.json()
+        if job["status"] in (ReportStatus.COMPLETED, ReportStatus.FAILED):
+            return job
+        assert job["status"] in (ReportStatus.QUEUED, ReportStatus.RUNNING)
+        assert time.monotonic() < deadline, f"report still {job['status']}"
+        time.sleep(0.1)
+
+def test_report_completes(client, db, admin_token_headers, test_booking, test_user, reports_dir):
+    test_booking.status = BookingStatus.CONFIRMED
+    db.commit()
+
+    response = client.post("/analytics/reports", headers=admin_token_headers, json=_report_request())
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == ReportStatus.QUEUED
+    assert job["download_url"] is None
+
+    job = _wait_for_report(client, job["id"], admin_token_headers)
+    assert job["status"] == ReportStatus.COMPLETED, job["error"]
+    assert job["row_count"] == 1
+    assert job["download_url"] == f"/analytics/reports/{job['id']}/download"
+
+    response = client.get(job["download_url"], headers=admin_token_headers)
+    assert response.status_code == 200
+    header, row = response.text.splitlines()
+    assert header == ",".join(reports.REPORT_FIELDS["user-spending"])
+    assert row.startswith(f"{test_user.id},{test_user.username},")
+    # Временные файлы состояния и результата не остаются в каталоге
+    assert sorted(os.listdir(reports_dir)) == [f"{job['id']}.csv", f"{job['id']}.meta.json"]
+
+def test_report_failure(client, admin_token_headers, reports_dir, monkeypatch):
+    # Дочерний процесс не сможет открыть базу в несуществующем каталоге
+    monkeypatch.setenv("DATABASE_URL", f"sqlite+aiosqlite:///{reports_dir}/missing/test.db")
+
+    response = client.post("/analytics/reports", headers=admin_token_headers, json=_report_request())
+    assert response.status_code == 202
+
+    job = _wait_for_report(client, response.json()["id"], admin_token_headers)
+    assert job["status"] == ReportStatus.FAILED
+    assert job["error"]
+    assert job["finished_at"] is not None
+
+    response = client.get(f"/analytics/reports/{job['id']}/download", headers=admin_token_headers)
+    assert response.status_code == 409
+
+def test_unknown_report(client, admin_token_headers, reports_dir):
+    response = client.get("/analytics/reports/" + "0" * 32, headers=admin_token_headers)
+    assert response.status_code == 404
+
+def test_parent_records_failure_only_without_result(reports_dir):
+    failed = Future()
+    failed.set_exception(BrokenProcessPool("worker died"))
+
+    # Процесс пула упал, не записав итог: ошибку фиксирует родитель
+    reports._write_meta("a" * 32, id="a" * 32, status=ReportStatus.RUNNING.value)
+    reports._on_job_done("a" * 32, failed)
+    job = reports.read_report_job("a" * 32)
+    assert job["status"] == ReportStatus.FAILED
+    assert job["error"] == "worker died"
+
+    # Итог, записанный дочерним процессом, родитель не перезаписывает
+    reports._write_meta("b" * 32, id="b" * 32, status=ReportStatus.COMPLETED.value, row_count=3)
+    reports._on_job_done("b" * 32, failed)
+    assert reports.read_report_job("b" * 32)["status"] == ReportStatus.COMPLETED
+
+    cancelled = Future()
+    cancelled.cancel()
+    reports._write_meta("c" * 32, id="c" * 32, status=ReportStatus.QUEUED.value)
+    reports._on_job_done("c" * 32, cancelled)
+    assert reports.read_report_job("c" * 32)["error"] == "Cancelled"
@@ -0,0 +1,104 @@
+import asyncio
+from fastapi import HTTPException
+from app.models.user import User, UserRole
+from app.utils.refresh_tokens import rotate_refresh_token
+from app.utils.security import token_versions, user_cache
+from tests.conftest import TestingAsyncSessionLocal
+
+def test_login(client, test_user):
+    response = client.post("/token", data={"username": test_user.username, "password": "password"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["token_type"] == "bearer"
+    assert data["access_token"]
+    assert data["refresh_token"]
+
+def test_login_wrong_password(client, test_user):
+    response = client.post("/token", data={"username": test_user.username, "password": "wrong"})
+    assert response.status_code == 401
+
+def test_read_users_me(client, test_user, user_token_headers):
+    response = client.get("/users/me", headers=user_token_headers)
+    assert response.status_code == 200
+    assert response.json()["username"] == test_user.username
+
+def test_users_me_rejects_revoked_token_from_cache(client, test_user, user_token_headers):
+    # Первый запрос кладет пользователя в кэш
+    assert client.get("/users/me", headers=user_token_headers).status_code == 200
+    assert user_cache.get(test_user.username) is not None
+
+    # Версия токенов пользователя выросла (деактивация или смена роли в другом процессе)
+    token_versions.set(test_user.id, 1)
+
+    assert user_cache.get(test_user.username) is not None
+    assert client.get("/users/me", headers=user_token_headers).status_code == 401
+
+def test_users_me_rejects_token_after_role_change(client, db, test_user, user_token_headers):
+    user = db.get(User, test_user.id)
+    user.role = UserRole.ADMIN
+    db.commit()
+
+    # Пользователь читается из базы: кэш сброшен изменением
+    assert user_cache.get(test_user.username) is None
+    assert client.get("/users/me", headers=user_token_headers).status_code == 401
+    assert client.get("/bookings/", headers=user_token_headers).status_code == 401
+
+    # Новый токен выдается с новой версией
+    response = client.post("/token", data={"username": test_user.username, "password": "password"})
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    assert client.get("/users/me", headers=headers).status_code == 200
+
+def _login(client, user):
+    return client.post("/token", data={"username": user.username, "password": "password"}).json()
+
+def test_refresh_token_rotation(client, test_user):
+    tokens = _login(client, test_user)
+
+    response = client.post("/token/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200
+    rotated = response.json()
+    assert rotated["refresh_token"] != tokens["refresh_token"]
+    headers = {"Authorization": f"Bearer {rotated['access_token']}"}
+    assert client.get("/users/me", headers=headers).status_code == 200
+
+    # Обмененный токен повторно не принимается
+    response = client.post("/token/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
+
+def test_refresh_token_reuse_revokes_family(client, test_user):
+    tokens = _login(client, test_user)
+    rotated = client.post("/token/refresh", json={"refresh_token": tokens["refresh_token"]}).json()
+
+    # Повторное предъявление старого токена - признак утечки: отзывается вся цепочка
+    assert client.post("/token/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 401
+    assert client.post("/token/refresh", json={"refresh_token": rotated["refresh_token"]}).status_code == 401
+
+def test_refresh_token_revoke(client, test_user):
+    tokens = _login(client, test_user)
+
+    assert client.post("/token/revoke", json={"refresh_token": tokens["refresh_token"]}).status_code == 204
+    assert client.post("/token/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 401
+
+def test_refresh_token_unknown(client, test_user):
+    assert client.post("/token/refresh", json={"refresh_token": "unknown"}).status_code == 401
+
+def test_concurrent_refresh_claims_token_once(client, test_user):
+    tokens = _login(client, test_user)
+
+    async def refresh():
+        # Без очереди писателей, как на PostgreSQL
+        async with TestingAsyncSessionLocal() as session:
+            try:
+                claimed = await rotate_refresh_token(session, tokens["refresh_token"])
+            except HTTPException:
+                return None
+            # Транзакции перекрываются: выпуск нового токена, commit
+            await asyncio.sleep(0.05)
+            await session.commit()
+            return claimed
+
+    async def race():
+        return await asyncio.gather(refresh(), refresh())
+
+    results = asyncio.run(race())
+    assert len([result for result in results if result is not None]) == 1
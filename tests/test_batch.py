@@ -0,0 +1,52 @@
+from app.config import settings
+
+def test_batch_runs_requests_in_order(client, user_token_headers, test_booking, test_room):
+    response = client.post("/batch", headers=user_token_headers, json={"requests": [
+        {"id": "rooms", "path": "/rooms/", "params": {"fields": "id,name"}},
+        {"id": "room", "path": f"/rooms/{test_room.id}"},
+        {"id": "bookings", "path": "/bookings/?fields=id"},
+    ]})
+    assert response.status_code == 200
+    rooms, room, bookings = response.json()["responses"]
+
+    assert (rooms["id"], rooms["status"]) == ("rooms", 200)
+    assert rooms["body"] == [{"name": test_room.name, "id": test_room.id}]
+    assert room["body"]["name"] == test_room.name
+    assert bookings["body"] == [{"id": test_booking.id}]
+
+def test_batch_item_conditional_get(client, user_token_headers, test_room):
+    etag = client.get("/rooms/", headers=user_token_headers).headers["etag"]
+
+    response = client.post("/batch", headers=user_token_headers, json={"requests": [
+        {"path": "/rooms/", "headers": {"If-None-Match": etag}},
+    ]})
+    [result] = response.json()["responses"]
+    assert result["status"] == 304
+    assert result["headers"]["etag"] == etag
+    assert result["body"] is None
+
+def test_batch_item_errors(client, user_token_headers):
+    response = client.post("/batch", headers=user_token_headers, json={"requests": [
+        {"path": "/missing"},
+        {"path": "/rooms/999"},
+    ]})
+    assert [result["status"] for result in response.json()["responses"]] == [404, 404]
+
+def test_batch_rejects_writes_and_nesting(client, user_token_headers):
+    response = client.post("/batch", headers=user_token_headers, json={"requests": [
+        {"method": "POST", "path": "/bookings/"},
+    ]})
+    assert response.status_code == 422
+
+    response = client.post("/batch", headers=user_token_headers, json={"requests": [{"path": "/batch"}]})
+    assert response.status_code == 400
+
+def test_batch_limits(client, user_token_headers, monkeypatch):
+    monkeypatch.setattr(settings, "BATCH_MAX_REQUESTS", 1)
+    response = client.post("/batch", headers=user_token_headers, json={"requests": [
+        {"path": "/rooms/"}, {"path": "/bookings/"},
+    ]})
+    assert response.status_code == 400
+
+    response = client.post("/batch", json={"requests": [{"path": "/rooms/"}]})
+    assert response.status_code == 401
@@ -0,0 +1,125 @@
+import itertools
+import time
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+from app.db import replicas
+from app.models.booking import Booking, BookingStatus
+from app.models.room import Room
+from app.utils.cache import TTLCache
+
+class RecordingReplica:
+    """Здоровая реплика поверх тестовой базы, считающая открытые сессии"""
+
+    healthy = True
+
+    def __init__(self):
+        self.sessions = 0
+        engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+        self._sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+
+    def needs_check(self) -> bool:
+        return False
+
+    def mark_unhealthy(self):
+        self.healthy = False
+
+    def sessionmaker(self):
+        self.sessions += 1
+        return self._sessionmaker()
+
+@pytest.fixture
+def replica(monkeypatch):
+    replica = RecordingReplica()
+    replica_set = replicas.ReplicaSet([])
+    replica_set.replicas = [replica]
+    replica_set._order = itertools.cycle([0])
+    monkeypatch.setattr(replicas, "replica_set", replica_set)
+    monkeypatch.setattr(replicas, "recent_writers", TTLCache(100, 60))
+    return replica
+
+def test_reads_use_replica_and_writes_stay_on_primary(client, user_token_headers, test_booking, test_room, replica):
+    response = client.get("/bookings/", headers=user_token_headers)
+    assert response.status_code == 200
+    assert [booking["id"] for booking in response.json()] == [test_booking.id]
+    assert replica.sessions == 1
+
+    start_time = datetime.utcnow() + timedelta(days=1)
+    response = client.post("/bookings/", headers=user_token_headers, json={
+        "room_id": test_room.id,
+        "start_time": start_time.isoformat(),
+        "end_time": (start_time + timedelta(hours=1)).isoformat(),
+    })
+    assert response.status_code == 200
+    created_id = response.json()["id"]
+    assert replica.sessions == 1
+
+    # После записи пользователь читает с основной базы и видит свое бронирование
+    response = client.get("/bookings/", headers=user_token_headers)
+    assert created_id in [booking["id"] for booking in response.json()]
+    assert replica.sessions == 1
+
+def test_read_your_writes_on_another_worker(client, user_token_headers, test_room, replica, monkeypatch):
+    start_time = datetime.utcnow() + timedelta(days=1)
+    response = client.post("/bookings/", headers=user_token_headers, json={
+        "room_id": test_room.id,
+        "start_time": start_time.isoformat(),
+        "end_time": (start_time + timedelta(hours=1)).isoformat(),
+    })
+    assert response.status_code == 200
+    assert replicas.WRITE_MARKER_COOKIE in response.cookies
+    created_id = response.json()["id"]
+
+    # Чтение на другом воркере: его recent_writers о записи не знает, отметка приходит в cookie
+    monkeypatch.setattr(replicas, "recent_writers", TTLCache(100, 60))
+    response = client.get("/bookings/", headers=user_token_headers)
+    assert created_id in [booking["id"] for booking in response.json()]
+    assert replica.sessions == 0
+
+    # Устаревшая отметка не мешает читать с реплики
+    client.cookies.clear()
+    client.cookies.set(replicas.WRITE_MARKER_COOKIE, str(time.time() - 60))
+    client.get("/bookings/", headers=user_token_headers)
+    assert replica.sessions == 1
+
+def test_reads_fall_back_to_primary_without_healthy_replica(client, user_token_headers, test_booking, replica):
+    replica.mark_unhealthy()
+    response = client.get("/bookings/", headers=user_token_headers)
+    assert response.status_code == 200
+    assert [booking["id"] for booking in response.json()] == [test_booking.id]
+    assert replica.sessions == 0
+
+def _add_bookings(db, users, count: int):
+    """Бронирования в разных комнатах от разных пользователей"""
+    start_time = datetime.utcnow() + timedelta(days=2)
+    for number in range(count):
+        room = Room(name=f"Room {number}", capacity=4, price_per_hour=50.0, is_active=True)
+        db.add(room)
+        db.flush()
+        db.add(Booking(
+            user_id=users[number % len(users)].id, room_id=room.id,
+            start_time=start_time + timedelta(hours=number), end_time=start_time + timedelta(hours=number + 1),
+            status=BookingStatus.PENDING, total_price=50.0
+        ))
+    db.commit()
+
+@pytest.mark.query_budget(3)
+def test_read_bookings_query_budget(client, db, test_user, test_admin, user_token_headers, admin_token_headers):
+    _add_bookings(db, [test_user, test_admin], 6)
+
+    # Имена комнат и пользователей приходят тем же запросом, что и бронирования
+    response = client.get("/bookings/", headers=admin_token_headers)
+    assert len(response.json()) == 6
+    assert all(booking["room_name"] for booking in response.json())
+
+    response = client.get("/bookings/", headers=user_token_headers)
+    assert len(response.json()) == 3
+
+def test_bookings_sparse_fieldset(client, user_token_headers, test_booking, test_room):
+    response = client.get("/bookings/?fields=room_name,id,status", headers=user_token_headers)
+    assert response.status_code == 200
+    assert response.json() == [{"id": test_booking.id, "status": "pending", "room_name": test_room.name}]
+
+    response = client.get("/bookings/?fields=total_price,password", headers=user_token_headers)
+    assert response.status_code == 400
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+from app.config import settings
+from app.models.booking import Booking, BookingStatus
+from app.models.room import Room
+
+def test_full_sync(client, user_token_headers, test_booking, test_room, test_admin, db):
+    # Чужие бронирования пользователю не выгружаются
+    start_time = datetime.utcnow() + timedelta(days=3)
+    db.add(Booking(user_id=test_admin.id, room_id=test_room.id, start_time=start_time,
+                   end_time=start_time + timedelta(hours=1), status=BookingStatus.PENDING, total_price=100.0))
+    db.commit()
+
+    response = client.get("/changes", headers=user_token_headers)
+    assert response.status_code == 200
+    feed = response.json()
+    assert feed["version"] > 0
+    assert feed["has_more"] is False
+    assert [booking["id"] for booking in feed["bookings"]] == [test_booking.id]
+    assert feed["bookings"][0]["room_name"] == test_room.name
+    assert [room["id"] for room in feed["rooms"]] == [test_room.id]
+    assert feed["cancelled_bookings"] == feed["deleted_rooms"] == []
+
+def test_incremental_sync(client, user_token_headers, admin_token_headers, test_booking, test_room):
+    version = client.get("/changes", headers=user_token_headers).json()["version"]
+
+    # Без изменений - пустая страница с той же версией
+    feed = client.get(f"/changes?since={version}", headers=user_token_headers).json()
+    assert (feed["version"], feed["bookings"], feed["rooms"]) == (version, [], [])
+
+    assert client.delete(f"/bookings/{test_booking.id}", headers=user_token_headers).status_code == 204
+    assert client.delete(f"/rooms/{test_room.id}", headers=admin_token_headers).status_code == 204
+
+    feed = client.get(f"/changes?since={version}", headers=user_token_headers).json()
+    assert feed["version"] > version
+    assert feed["cancelled_bookings"] == [test_booking.id]
+    assert feed["deleted_rooms"] == [test_room.id]
+    assert feed["bookings"] == feed["rooms"] == []
+
+def test_paged_sync(client, user_token_headers, db, monkeypatch):
+    for number in range(3):
+        db.add(Room(name=f"Room {number}", capacity=4, price_per_hour=50.0, is_active=True))
+        # Отдельный commit - отдельная версия изменений
+        db.commit()
+    monkeypatch.setattr(settings, "CHANGES_PAGE_SIZE", 2)
+
+    rooms, since, pages = [], 0, 0
+    while True:
+        feed = client.get(f"/changes?since={since}", headers=user_token_headers).json()
+        rooms += [room["name"] for room in feed["rooms"]]
+        since, pages = feed["version"], pages + 1
+        if not feed["has_more"]:
+            break
+    assert rooms == ["Room 0", "Room 1", "Room 2"]
+    assert pages == 2
+
+def test_unknown_version(client, user_token_headers):
+    response = client.get("/changes?since=1000000", headers=user_token_headers)
+    assert response.status_code == 410
@@ -0,0 +1,40 @@
+import pytest
+
+pytest.importorskip("PyQt5")
+pytest.importorskip("requests")
+
+from client.controllers.auth_controller import AuthController
+from client.utils import api_client as api_client_module
+from client.utils.api_client import ApiClient
+
+BASE_URL = "http://testserver"
+
+@pytest.fixture
+def api(client, monkeypatch):
+    """Клиент приложения, отправляющий запросы в тестовое приложение"""
+    def send(method, url, **kwargs):
+        return client.request(method, url.removeprefix(BASE_URL), **kwargs)
+
+    # Session.post тоже проходит через Session.request
+    monkeypatch.setattr(api_client_module.requests.Session, "request", lambda session, method, url, **kwargs: send(method, url, **kwargs))
+    return ApiClient(BASE_URL)
+
+def _login(client, user):
+    return client.post("/token", data={"username": user.username, "password": "password"}).json()
+
+def test_refresh_on_expired_access_token(api, client, test_user):
+    tokens = _login(client, test_user)
+    api.set_token("expired")
+    api.set_refresh_token(tokens["refresh_token"])
+
+    assert api.get("/users/me")["username"] == test_user.username
+    assert api.refresh_token != tokens["refresh_token"]
+
+def test_logout_revokes_refresh_token(api, client, test_user):
+    tokens = _login(client, test_user)
+    api.set_token(tokens["access_token"])
+    api.set_refresh_token(tokens["refresh_token"])
+
+    AuthController(api).logout()
+    response = client.post("/token/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
@@ -0,0 +1,140 @@
+import asyncio
+import orjson
+import pytest
+from app.config import settings
+from app.controllers.events import _format_event
+from app.models.room import Room
+from app.utils.events import EventBroker, MemoryChannel, Subscription, broker
+from app.utils.metrics import REGISTRY
+
+BOOKING = {"id": 1, "room_id": 5, "user_id": 10, "start_time": "2030-01-01T10:00:00",
+           "end_time": "2030-01-01T11:00:00", "status": "pending", "notes": "private", "total_price": 100.0}
+
+@pytest.fixture
+def registry():
+    # Брокеры теста регистрируют свои метрики - они не должны попадать в вывод /metrics
+    size = len(REGISTRY)
+    yield
+    del REGISTRY[size:]
+
+def test_booking_payload_by_subscriber():
+    change = {"type": "booking.created", "data": BOOKING}
+    assert Subscription(10, False).payload(change) == BOOKING
+    assert Subscription(99, True).payload(change) == BOOKING
+    # Другим пользователям - только занятость комнаты
+    public = Subscription(99, False, {5}).payload(change)
+    assert public == {key: BOOKING[key] for key in ("id", "room_id", "start_time", "end_time", "status")}
+    assert Subscription(99, False, {6}).payload(change) is None
+
+async def settle():
+    # Изменения доходят до подписчиков через задачу отправки и задачу чтения канала
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+def changes(*room_ids):
+    return [{"type": "room.updated", "data": {"id": room_id}} for room_id in room_ids]
+
+def test_replay_after_reconnect(registry):
+    async def scenario():
+        events = EventBroker(replay_size=10)
+        await events.start(MemoryChannel())
+        events.publish(changes(1, 2, 3))
+        await settle()
+        first_id = events._recent[0][0]
+
+        subscription = Subscription(10, False)
+        events.subscribe(subscription, first_id)
+        replayed = [subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())]
+        assert [event["data"]["id"] for event in replayed] == [2, 3]
+
+        # Идентификатор из прежнего запуска не дослать - только resync
+        stale = Subscription(10, False)
+        events.subscribe(stale, "00000000-1")
+        assert stale.queue.get_nowait()["type"] == "resync"
+        await events.stop()
+
+    asyncio.run(scenario())
+
+def test_slow_subscriber_gets_resync(registry, monkeypatch):
+    monkeypatch.setattr(settings, "EVENTS_QUEUE_SIZE", 2)
+
+    async def scenario():
+        events = EventBroker(replay_size=10)
+        await events.start(MemoryChannel())
+        subscription = Subscription(10, False)
+        events.subscribe(subscription)
+        events.publish(changes(1, 2, 3))
+        await settle()
+        assert subscription.queue.qsize() == 1
+        assert subscription.queue.get_nowait() == {"id": events._recent[-1][0], "type": "resync", "data": {}}
+
+        await events.stop()
+        assert subscription.queue.get_nowait() is None
+
+    asyncio.run(scenario())
+
+def test_changes_from_another_worker(registry):
+    async def scenario():
+        # Два брокера на общем канале - два воркера
+        channel = MemoryChannel()
+        channel.shared = True
+        writer, reader = EventBroker(replay_size=10), EventBroker(replay_size=10)
+        await writer.start(channel)
+        await reader.start(channel)
+
+        # У пишущего воркера нет подписчиков, но изменения нужны другим воркерам
+        assert writer.needs_changes()
+        subscription = Subscription(10, False)
+        reader.subscribe(subscription)
+        writer.publish(changes(1, 2))
+        await settle()
+        received = [subscription.queue.get_nowait() for _ in range(2)]
+        assert [event["data"]["id"] for event in received] == [1, 2]
+
+        # Переподключение к пишущему воркеру: идентификаторы событий общие
+        reconnected = Subscription(10, False)
+        writer.subscribe(reconnected, received[0]["id"])
+        assert reconnected.queue.get_nowait()["data"]["id"] == 2
+
+        await writer.stop()
+        await reader.stop()
+
+    asyncio.run(scenario())
+
+def test_changes_published_after_commit(db):
+    async def scenario():
+        await broker.start(MemoryChannel())
+        subscription = Subscription(10, False)
+        broker.subscribe(subscription)
+        try:
+            db.add(Room(name="Rolled back", capacity=2, price_per_hour=10.0, is_active=True))
+            db.flush()
+            db.rollback()
+            await settle()
+            assert subscription.queue.empty()
+
+            db.add(Room(name="Committed", capacity=2, price_per_hour=10.0, is_active=True))
+            db.commit()
+            await settle()
+            event = subscription.queue.get_nowait()
+            assert event["type"] == "room.created"
+            assert event["data"]["name"] == "Committed"
+        finally:
+            broker.unsubscribe(subscription)
+            await broker.stop()
+
+    asyncio.run(scenario())
+
+def test_event_stream_format():
+    frame = _format_event({"id": "abc-7", "type": "room.deleted", "data": {"id": 3}})
+    header, data = frame.decode().split("data: ")
+    assert header == "id: abc-7\nevent: room.deleted\n"
+    assert orjson.loads(data) == {"id": 3}
+    assert frame.endswith(b"\n\n")
+    # resync без событий в буфере - без id, клиент сохраняет прежний
+    assert _format_event({"id": None, "type": "resync", "data": {}}) == b"event: resync\ndata: {}\n\n"
+
+def test_events_endpoint_rejects_bad_requests(client, user_token_headers):
+    assert client.get("/events").status_code == 401
+    response = client.get("/events?rooms=1,x", headers=user_token_headers)
+    assert response.status_code == 400
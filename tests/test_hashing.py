@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import pytest
+from fastapi import HTTPException
+from app.config import settings
+from app.utils import hashing
+from app.utils.hashing import run_password_task
+from app.utils.metrics import render_prometheus
+
+WORKERS = hashing._executor._max_workers
+
+async def _wait_until(condition):
+    for _ in range(500):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("password hash pool state not reached")
+
+async def _fill_pool(release: threading.Event, queued: int) -> list:
+    """Занятые потоки пула и queued задач в очереди за ними"""
+    tasks = []
+    try:
+        # По одной задаче: пока поток ее не взял, она считается ожидающей в очереди
+        for number in range(WORKERS):
+            tasks.append(asyncio.ensure_future(run_password_task("verify", release.wait)))
+            await _wait_until(lambda: hashing._running == number + 1)
+        for _ in range(queued):
+            tasks.append(asyncio.ensure_future(run_password_task("verify", release.wait)))
+        await _wait_until(lambda: hashing.queue_depth() == queued)
+    except BaseException:
+        # Иначе потоки пула останутся заблокированными для следующих тестов
+        release.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    return tasks
+
+def test_full_queue_rejected(monkeypatch):
+    monkeypatch.setattr(settings, "PASSWORD_HASH_MAX_QUEUE", 1)
+    rejected = hashing.HASH_REJECTED["queue_full"].value
+
+    async def scenario():
+        release = threading.Event()
+        tasks = await _fill_pool(release, 1)
+        try:
+            assert "password_hash_queue_depth 1" in render_prometheus()
+            with pytest.raises(HTTPException) as excinfo:
+                await run_password_task("verify", lambda: True)
+        finally:
+            release.set()
+            await asyncio.gather(*tasks)
+        return excinfo.value
+
+    error = asyncio.run(scenario())
+    assert error.status_code == 503
+    assert error.headers == {"Retry-After": "1"}
+    assert hashing.HASH_REJECTED["queue_full"].value == rejected + 1
+    assert hashing.queue_depth() == 0
+
+def test_queue_timeout_rejected(monkeypatch):
+    monkeypatch.setattr(settings, "PASSWORD_HASH_QUEUE_TIMEOUT", 0.05)
+    rejected = hashing.HASH_REJECTED["timeout"].value
+
+    async def scenario():
+        release = threading.Event()
+        tasks = await _fill_pool(release, 1)
+        # Задача в очереди дождется потока позже допустимого и не будет выполнена
+        threading.Timer(0.2, release.set).start()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert results[:WORKERS] == [True] * WORKERS
+    assert isinstance(results[WORKERS], HTTPException)
+    assert results[WORKERS].status_code == 503
+    assert hashing.HASH_REJECTED["timeout"].value == rejected + 1
+
+def test_login_when_busy(client, test_user, monkeypatch):
+    monkeypatch.setattr(settings, "PASSWORD_HASH_MAX_QUEUE", 0)
+    response = client.post("/token", data={"username": test_user.username, "password": "password"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+def test_hashing_metrics_exported(client, test_user):
+    verified = hashing.HASH_LATENCY["verify"].count
+    response = client.post("/token", data={"username": test_user.username, "password": "password"})
+    assert response.status_code == 200
+    assert hashing.HASH_LATENCY["verify"].count == verified + 1
+
+    text = client.get("/metrics").text
+    assert f'password_hash_duration_seconds_count{{operation="verify"}} {verified + 1}' in text
+    assert "# TYPE password_hash_queue_wait_seconds histogram" in text
+    assert "password_hash_queue_depth 0" in text
+    assert 'password_hash_rejected_total{reason="queue_full"}' in text
+    assert 'password_hash_rejected_total{reason="timeout"}' in text
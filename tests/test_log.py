@@ -0,0 +1,49 @@
+import json
+import logging
+import queue
+import pytest
+from app.utils.log import DroppingQueueHandler, JsonFormatter
+
+@pytest.fixture
+def log_queue():
+    records = queue.Queue()
+    logger = logging.getLogger("test.log")
+    handler = DroppingQueueHandler(records)
+    logger.addHandler(handler)
+    yield logger, records
+    logger.removeHandler(handler)
+
+def test_exception_is_separate_field(log_queue):
+    logger, records = log_queue
+    try:
+        raise ValueError("broken")
+    except ValueError:
+        logger.exception("booking %s failed", 42, extra={"room_id": 7})
+
+    data = json.loads(JsonFormatter().format(records.get_nowait()))
+    assert data["message"] == "booking 42 failed"
+    assert data["room_id"] == 7
+    assert data["exc_info"].startswith("Traceback")
+    assert "ValueError: broken" in data["exc_info"]
+
+def test_text_format_keeps_traceback(log_queue):
+    logger, records = log_queue
+    try:
+        raise ValueError("broken")
+    except ValueError:
+        logger.exception("booking failed")
+
+    text = logging.Formatter("%(levelname)s %(message)s").format(records.get_nowait())
+    assert text.startswith("ERROR booking failed\nTraceback")
+    assert text.endswith("ValueError: broken")
+
+def test_full_queue_drops_record(log_queue):
+    logger, _ = log_queue
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    logger.addHandler(handler)
+    try:
+        logger.warning("first")
+        logger.warning("second")
+    finally:
+        logger.removeHandler(handler)
+    assert handler.queue.qsize() == 1
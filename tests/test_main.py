@@ -0,0 +1,32 @@
+from fastapi.testclient import TestClient
+from app import main
+from app.db.database import engine
+from app.utils.security import token_versions
+from app.utils.tasks import task_queue
+from tests.conftest import TestingAsyncSessionLocal, async_engine
+
+def test_default_app_uses_configured_database():
+    application = main.create_app()
+    assert application.state.db_engine is engine
+    assert application.dependency_overrides == {}
+
+def test_engine_without_session_factory():
+    application = main.create_app(async_engine)
+    assert application.state.session_factory.kw["bind"] is async_engine
+
+def test_startup_and_shutdown(db, test_user, monkeypatch):
+    failures = []
+    monkeypatch.setattr(main.logger, "exception", lambda message, *args, **kwargs: failures.append(message))
+
+    with TestClient(main.create_app(async_engine, TestingAsyncSessionLocal)) as client:
+        # Прогрев прошел на тестовой базе: карта версий токенов загружена, очередь задач запущена с ней
+        assert not failures
+        assert not token_versions.is_stale()
+        assert task_queue._queue is not None
+        assert task_queue.session_factory is TestingAsyncSessionLocal
+
+        response = client.post("/token", data={"username": test_user.username, "password": "password"})
+        assert response.status_code == 200
+
+    assert task_queue._queue is None
+    assert task_queue.pending() == 0
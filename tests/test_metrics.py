@@ -0,0 +1,64 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.utils.metrics import REGISTRY, Counter, Histogram, Metric, render_prometheus
+
+@pytest.fixture
+def registry():
+    # Метрики теста не должны попадать в вывод /metrics других тестов
+    size = len(REGISTRY)
+    yield
+    del REGISTRY[size:]
+
+def test_metric_is_abstract(registry):
+    with pytest.raises(TypeError):
+        Metric("test_abstract", "Abstract metric")
+
+    class Incomplete(Metric):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete("test_incomplete", "Metric without samples")
+
+def test_render_counter_family(registry):
+    ok = Counter("test_requests_total", "Test requests", {"status": "ok"})
+    failed = Counter("test_requests_total", "Test requests", {"status": "failed"})
+    ok.inc(2)
+    failed.inc()
+
+    text = render_prometheus()
+    # Одно имя с разными метками - один блок HELP/TYPE
+    assert text.count("# TYPE test_requests_total counter") == 1
+    assert 'test_requests_total{status="ok"} 2' in text
+    assert 'test_requests_total{status="failed"} 1' in text
+
+def test_render_histogram_buckets(registry):
+    histogram = Histogram("test_duration_seconds", "Test duration", buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+
+    text = render_prometheus()
+    assert 'test_duration_seconds_bucket{le="0.1"} 1' in text
+    assert 'test_duration_seconds_bucket{le="1.0"} 2' in text
+    assert 'test_duration_seconds_bucket{le="+Inf"} 3' in text
+    assert "test_duration_seconds_count 3" in text
+
+def test_metrics_endpoint(client):
+    client.get("/")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    # Метрики маршрута создаются при первом запросе к нему
+    assert 'http_requests_total{method="GET",route="/",status="2xx"}' in response.text
+
+def test_route_series_shared_between_apps(make_app):
+    for room_id in (1, 2, 3):
+        with TestClient(make_app()) as client:
+            client.get("/")
+            client.get(f"/rooms/{room_id}")
+
+    text = render_prometheus()
+    # Повторяющийся ряд заставил бы Prometheus отклонить весь сбор
+    series = [line.rsplit(" ", 1)[0] for line in text.splitlines() if not line.startswith("#")]
+    assert [name for name in series if series.count(name) > 1] == []
+    assert 'http_requests_total{method="GET",route="/rooms/{room_id}",status="4xx"}' in series
@@ -0,0 +1,103 @@
+import asyncio
+import os
+from datetime import date, datetime, timedelta
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from app.config import settings
+from app.db.partitions import archive_partitions, ensure_partitions, list_partitions
+
+pytestmark = pytest.mark.postgres
+
+# Схема с кавычкой и пробелом: имена из командной строки подставляются только экранированными
+ARCHIVE_SCHEMA = 'archive "cold"'
+
+@pytest.fixture
+def postgres_url(monkeypatch):
+    """Пустая база PostgreSQL, к которой применяются миграции"""
+    from alembic import command
+    from alembic.config import Config
+
+    url = os.environ["TEST_POSTGRES_URL"]
+    monkeypatch.setattr(settings, "DATABASE_URL", url)
+    # Без alembic.ini: его fileConfig отключил бы логгеры приложения в остальных тестах
+    config = Config()
+    config.set_main_option("script_location", os.path.join(os.path.dirname(os.path.dirname(__file__)), "alembic"))
+    config.set_main_option("sqlalchemy.url", url)
+    command.upgrade(config, "005")
+    yield url, config
+    command.downgrade(config, "base")
+    asyncio.run(_execute(url, f"DROP SCHEMA IF EXISTS {_quoted(ARCHIVE_SCHEMA)} CASCADE"))
+
+def _quoted(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+async def _execute(url: str, statement: str, **params):
+    engine = create_async_engine(url, poolclass=NullPool)
+    try:
+        async with engine.begin() as connection:
+            result = await connection.execute(text(statement), params)
+            return result.all() if result.returns_rows else None
+    finally:
+        await engine.dispose()
+
+async def _add_booking(url: str, start_time: datetime, hours: int, status: str):
+    await _execute(url, """
+        INSERT INTO bookings (user_id, room_id, start_time, end_time, status, total_price)
+        VALUES ((SELECT min(id) FROM users), (SELECT min(id) FROM rooms), :start_time, :end_time, :status, 10)
+    """, start_time=start_time, end_time=start_time + timedelta(hours=hours), status=status)
+
+def test_partition_lifecycle(postgres_url):
+    from alembic import command
+
+    url, config = postgres_url
+    this_month = date.today().replace(day=1)
+    old_month = (this_month - timedelta(days=400)).replace(day=1)
+    asyncio.run(_add_booking(url, datetime.combine(old_month, datetime.min.time()) + timedelta(days=2), 2, "COMPLETED"))
+    asyncio.run(_add_booking(url, datetime.utcnow() + timedelta(days=1), 2, "CONFIRMED"))
+
+    command.upgrade(config, "006")
+
+    async def maintain():
+        engine = create_async_engine(url, poolclass=NullPool)
+        try:
+            async with engine.connect() as connection:
+                names = [partition["name"] for partition in await list_partitions(connection)]
+                assert f"bookings_y{old_month:%Y}m{old_month:%m}" in names
+                assert f"bookings_y{this_month:%Y}m{this_month:%m}" in names
+
+                # Партиции на три месяца вперед уже созданы миграцией
+                created = await ensure_partitions(connection, 4)
+                await connection.commit()
+                assert len(created) == 1
+                assert await ensure_partitions(connection, 4) == []
+                await connection.commit()
+
+                archived = await archive_partitions(connection, this_month, ARCHIVE_SCHEMA)
+                assert archived == [f"bookings_y{old_month:%Y}m{old_month:%m}"]
+                count = await connection.scalar(text(
+                    f"SELECT count(*) FROM {_quoted(ARCHIVE_SCHEMA)}.{archived[0]}"
+                ))
+                assert count == 1
+                assert await connection.scalar(text("SELECT count(*) FROM bookings")) == 1
+        finally:
+            await engine.dispose()
+
+    asyncio.run(maintain())
+
+    # Архивные партиции в обратный перенос не попадают
+    command.downgrade(config, "005")
+    rows = asyncio.run(_execute(url, "SELECT status FROM bookings"))
+    assert [row.status for row in rows] == ["CONFIRMED"]
+
+def test_migration_rejects_long_active_bookings(postgres_url):
+    from alembic import command
+
+    url, config = postgres_url
+    asyncio.run(_add_booking(url, datetime.utcnow(), settings.BOOKING_MAX_DURATION_HOURS + 1, "CONFIRMED"))
+
+    with pytest.raises(RuntimeError, match="longer than"):
+        command.upgrade(config, "006")
+    rows = asyncio.run(_execute(url, "SELECT to_regclass('bookings_default') AS partition"))
+    assert rows[0].partition is None
@@ -0,0 +1,59 @@
+import os
+import pytest
+from app.config import Settings, settings
+from app.utils import password_calibration
+from app.utils.password_calibration import apply_calibration, calibration_settings
+
+ARGON2_RESULT = {
+    "scheme": "argon2",
+    "argon2_time_cost": 3,
+    "argon2_memory_cost": 32768,
+    "argon2_parallelism": 2,
+    "elapsed_ms": 180.5,
+}
+
+@pytest.fixture
+def calibration_env(monkeypatch):
+    # apply_calibration меняет окружение и настройки процесса - восстанавливаем их после теста
+    for key in ("PASSWORD_HASH_SCHEME", "ARGON2_TIME_COST", "ARGON2_MEMORY_COST",
+                "ARGON2_PARALLELISM", "PASSWORD_HASH_CALIBRATE_ON_STARTUP"):
+        monkeypatch.setenv(key, os.environ.get(key, ""))
+        monkeypatch.setattr(settings, key, getattr(settings, key))
+
+def test_calibration_settings():
+    assert calibration_settings(ARGON2_RESULT) == {
+        "PASSWORD_HASH_SCHEME": "argon2",
+        "ARGON2_TIME_COST": "3",
+        "ARGON2_MEMORY_COST": "32768",
+        "ARGON2_PARALLELISM": "2",
+    }
+
+def test_apply_calibration_reaches_workers(calibration_env, monkeypatch):
+    monkeypatch.setattr(settings, "PASSWORD_HASH_CALIBRATE_ON_STARTUP", True)
+    apply_calibration(ARGON2_RESULT)
+
+    # Настройки текущего процесса (запуск с одним воркером)
+    assert settings.PASSWORD_HASH_SCHEME == "argon2"
+    assert settings.ARGON2_MEMORY_COST == 32768
+    assert settings.PASSWORD_HASH_CALIBRATE_ON_STARTUP is False
+
+    # Воркер - новый процесс, который читает настройки из окружения
+    worker_settings = Settings()
+    assert worker_settings.PASSWORD_HASH_SCHEME == "argon2"
+    assert worker_settings.ARGON2_TIME_COST == 3
+    assert worker_settings.ARGON2_MEMORY_COST == 32768
+    assert worker_settings.PASSWORD_HASH_CALIBRATE_ON_STARTUP is False
+
+def test_cli_prints_settings(monkeypatch, capsys):
+    monkeypatch.setattr(password_calibration, "calibrate", lambda budget_ms, schemes: dict(ARGON2_RESULT))
+    monkeypatch.setattr("sys.argv", ["password_calibration"])
+    password_calibration.main()
+
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].startswith("# argon2: 180.5 ms")
+    assert lines[1:] == [
+        "PASSWORD_HASH_SCHEME=argon2",
+        "ARGON2_TIME_COST=3",
+        "ARGON2_MEMORY_COST=32768",
+        "ARGON2_PARALLELISM=2",
+    ]
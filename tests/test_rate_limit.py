@@ -0,0 +1,73 @@
+import pytest
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from app.config import settings
+from app.utils.rate_limit import MemoryBackend, RateLimit, RateLimitBackend, RateLimitMiddleware, RateLimitRule
+from app.utils.security import create_access_token
+
+async def _ok(request):
+    return PlainTextResponse("ok")
+
+def _limited_client(*rules: RateLimitRule) -> TestClient:
+    routes = [Route("/token", _ok, methods=["POST"]), Route("/bookings/", _ok, methods=["GET", "POST"])]
+    return TestClient(RateLimitMiddleware(Starlette(routes=routes), rules=list(rules), backend=MemoryBackend()))
+
+def _bearer(uid: int) -> dict:
+    token = create_access_token({"sub": f"user{uid}", "uid": uid, "role": "user", "ver": 0})
+    return {"Authorization": f"Bearer {token}"}
+
+def test_backend_is_abstract():
+    with pytest.raises(TypeError):
+        RateLimitBackend()
+
+def test_rate_limit_parsing():
+    limit = RateLimit("10/minute")
+    assert limit.capacity == 10
+    assert limit.rate == pytest.approx(10 / 60)
+
+def test_limit_exceeded_returns_429_with_retry_after():
+    client = _limited_client(RateLimitRule("login", ["POST"], r"^/token$", "2/minute", "ip"))
+
+    assert client.post("/token").status_code == 200
+    assert client.post("/token").status_code == 200
+    response = client.post("/token")
+
+    assert response.status_code == 429
+    assert response.json() == {"detail": "Too many requests"}
+    # Один токен пополняется за 30 секунд
+    assert 1 <= int(response.headers["Retry-After"]) <= 30
+
+def test_rule_matches_only_its_methods_and_path():
+    client = _limited_client(RateLimitRule("booking-write", ["POST"], r"^/bookings(/|$)", "1/minute", "ip"))
+
+    assert client.post("/bookings/").status_code == 200
+    assert client.post("/bookings/").status_code == 429
+    # Чтение и другие пути не ограничиваются
+    assert client.get("/bookings/").status_code == 200
+    assert client.post("/token").status_code == 200
+
+def test_booking_writes_limited_per_user():
+    client = _limited_client(RateLimitRule("booking-write", ["POST"], r"^/bookings(/|$)", "1/minute", "user"))
+
+    assert client.post("/bookings/", headers=_bearer(1)).status_code == 200
+    assert client.post("/bookings/", headers=_bearer(1)).status_code == 429
+    # Тот же адрес, другой пользователь - своя корзина
+    assert client.post("/bookings/", headers=_bearer(2)).status_code == 200
+    # Без токена - корзина адреса
+    assert client.post("/bookings/").status_code == 200
+    assert client.post("/bookings/").status_code == 429
+
+def test_login_limit_in_application(make_app, test_user, monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(settings, "RATE_LIMIT_LOGIN", "2/minute")
+    monkeypatch.setattr(settings, "RATE_LIMIT_BACKEND", "memory")
+    client = TestClient(make_app())
+
+    login_data = {"username": test_user.username, "password": "password"}
+    assert client.post("/token", data=login_data).status_code == 200
+    assert client.post("/token", data={**login_data, "password": "wrong"}).status_code == 401
+    response = client.post("/token", data=login_data)
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
@@ -0,0 +1,58 @@
+import pytest
+from app.models.room import Room
+
+def test_catalogue_is_not_stored_by_shared_caches(client, user_token_headers, test_room):
+    response = client.get("/rooms/", headers=user_token_headers)
+    assert response.status_code == 200
+    assert response.headers["cache-control"].startswith("private, max-age=")
+
+    response = client.get(f"/rooms/{test_room.id}", headers=user_token_headers)
+    assert response.headers["cache-control"].startswith("private, max-age=")
+
+def test_rooms_not_modified(client, user_token_headers, test_room):
+    response = client.get("/rooms/", headers=user_token_headers)
+    etag = response.headers["etag"]
+
+    response = client.get("/rooms/", headers={**user_token_headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    # Другие параметры запроса - другой ответ и другой ETag
+    response = client.get("/rooms/?limit=1", headers={**user_token_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+
+def test_room_update_changes_etag(client, user_token_headers, admin_token_headers, test_room):
+    etag = client.get(f"/rooms/{test_room.id}", headers=user_token_headers).headers["etag"]
+
+    response = client.put(f"/rooms/{test_room.id}", headers=admin_token_headers, json={"capacity": 12})
+    assert response.status_code == 200
+
+    response = client.get(f"/rooms/{test_room.id}", headers={**user_token_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["capacity"] == 12
+    assert response.headers["etag"] != etag
+
+@pytest.mark.query_budget(3)
+def test_read_rooms_query_budget(client, db, user_token_headers):
+    for number in range(5):
+        db.add(Room(name=f"Room {number}", capacity=4 + number, price_per_hour=50.0, is_active=True))
+    db.commit()
+
+    response = client.get("/rooms/", headers=user_token_headers)
+    assert len(response.json()) == 5
+
+    response = client.get("/rooms/?min_capacity=6", headers=user_token_headers)
+    assert [room["capacity"] for room in response.json()] == [6, 7, 8]
+
+def test_rooms_sparse_fieldset(client, user_token_headers, test_room):
+    response = client.get("/rooms/?fields=id,name", headers=user_token_headers)
+    assert response.status_code == 200
+    # Поля - в порядке схемы, а не запроса
+    assert [list(room) for room in response.json()] == [["name", "id"]]
+    assert response.json()[0] == {"name": test_room.name, "id": test_room.id}
+
+def test_rooms_unknown_field(client, user_token_headers):
+    response = client.get("/rooms/?fields=name,secret", headers=user_token_headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unknown fields: secret"
@@ -0,0 +1,45 @@
+import argparse
+import asyncio
+import pytest
+
+uvicorn = pytest.importorskip("uvicorn")
+
+from app import serve
+from app.config import settings
+
+def test_default_workers():
+    assert serve.default_workers() >= 1
+
+def test_build_config():
+    config = serve.build_config(argparse.Namespace(host="127.0.0.1", port=8001, workers=3))
+    assert config.app == "app.main:app"
+    assert (config.host, config.port, config.workers) == ("127.0.0.1", 8001, 3)
+    assert config.timeout_graceful_shutdown == settings.SERVER_GRACEFUL_SHUTDOWN_SECONDS
+    assert config.backlog == settings.SERVER_BACKLOG
+    assert config.access_log is False
+
+def test_main_single_worker(monkeypatch):
+    runs = []
+    monkeypatch.setattr(serve.Server, "run", lambda self, sockets=None: runs.append(self.config))
+    monkeypatch.setattr("sys.argv", ["app.serve", "--workers", "1", "--port", "8002"])
+    serve.main()
+    assert [(config.workers, config.port) for config in runs] == [(1, 8002)]
+
+def test_main_calibrates_once_before_workers(monkeypatch):
+    calls = []
+    monkeypatch.setattr(settings, "PASSWORD_HASH_CALIBRATE_ON_STARTUP", True)
+    monkeypatch.setattr("app.utils.password_calibration.calibrate", lambda: calls.append("calibrate") or {})
+    monkeypatch.setattr("app.utils.password_calibration.apply_calibration", lambda result: calls.append("apply"))
+    monkeypatch.setattr(serve.Server, "run", lambda self, sockets=None: calls.append("run"))
+    monkeypatch.setattr("sys.argv", ["app.serve", "--workers", "1"])
+    serve.main()
+    assert calls == ["calibrate", "apply", "run"]
+
+def test_shutdown_closes_event_streams(monkeypatch):
+    closed = []
+    monkeypatch.setattr("app.utils.events.broker.close", lambda: closed.append(True))
+    server = serve.Server(serve.build_config(argparse.Namespace(host="127.0.0.1", port=0, workers=1)))
+    # Сервер не запускался: ни сокетов, ни lifespan
+    server.servers, server.force_exit = [], True
+    asyncio.run(server.shutdown())
+    assert closed == [True]
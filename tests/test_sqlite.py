@@ -0,0 +1,87 @@
+import asyncio
+import pytest
+from sqlalchemy import event, text
+from app.controllers import auth
+from app.db import sqlite
+from app.models.user import User
+from tests.conftest import async_engine
+
+@pytest.fixture
+def writes():
+    """Пишущие SQL-запросы приложения и BEGIN транзакции, в которой они выполнены"""
+    begins, statements = {}, []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        connection = id(conn.connection.dbapi_connection)
+        if statement.startswith("BEGIN"):
+            begins[connection] = statement
+        elif statement.split(None, 1)[0].upper() in ("INSERT", "UPDATE", "DELETE"):
+            statements.append((begins.get(connection), statement))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
+def test_wal_mode(db):
+    async def journal_mode():
+        async with async_engine.connect() as connection:
+            return await connection.scalar(text("PRAGMA journal_mode"))
+
+    assert asyncio.run(journal_mode()) == "wal"
+
+def test_writes_use_immediate_transactions(client, writes, test_user, test_room, admin_token_headers):
+    response = client.post("/register", json={
+        "email": "new@example.com", "username": "newuser", "password": "password", "full_name": "New User"
+    })
+    assert response.status_code == 200
+    tokens = client.post("/token", data={"username": test_user.username, "password": "password"}).json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    assert client.post("/token/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 200
+
+    response = client.post("/rooms/", headers=admin_token_headers, json={
+        "name": "New Room", "capacity": 4, "price_per_hour": 50.0
+    })
+    room_id = response.json()["id"]
+    assert client.put(f"/rooms/{room_id}", headers=admin_token_headers, json={"capacity": 6}).status_code == 200
+    assert client.delete(f"/rooms/{room_id}", headers=admin_token_headers).status_code == 204
+
+    response = client.post("/bookings/", headers=headers, json={
+        "room_id": test_room.id, "start_time": "2099-01-01T10:00:00", "end_time": "2099-01-01T11:00:00"
+    })
+    assert client.delete(f"/bookings/{response.json()['id']}", headers=headers).status_code == 204
+
+    assert writes
+    # Запись в отложенной транзакции повышала бы блокировку посреди транзакции (SQLITE_BUSY)
+    assert [statement for begin, statement in writes if begin != "BEGIN IMMEDIATE"] == []
+
+def test_register_hashes_outside_writer_queue(client, monkeypatch):
+    hash_password = auth.get_password_hash_async
+    held = []
+
+    async def checked_hash(password):
+        held.append(sqlite._write_transaction.get())
+        return await hash_password(password)
+
+    monkeypatch.setattr(auth, "get_password_hash_async", checked_hash)
+    response = client.post("/register", json={
+        "email": "new@example.com", "username": "newuser", "password": "password", "full_name": "New User"
+    })
+    assert response.status_code == 200
+    assert held == [False]
+
+
+def test_register_conflict_during_hashing(client, db, monkeypatch):
+    hash_password = auth.get_password_hash_async
+
+    async def racing_hash(password):
+        # Тот же username регистрирует параллельный запрос, пока хешируется пароль
+        db.add(User(email="other@example.com", username="newuser", hashed_password="x", full_name="Other"))
+        db.commit()
+        return await hash_password(password)
+
+    monkeypatch.setattr(auth, "get_password_hash_async", racing_hash)
+    response = client.post("/register", json={
+        "email": "new@example.com", "username": "newuser", "password": "password", "full_name": "New User"
+    })
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Email or username already registered"
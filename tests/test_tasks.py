@@ -0,0 +1,137 @@
+import asyncio
+import pytest
+from sqlalchemy import select
+from app.config import settings
+from app.models.background_task import BackgroundTask
+from app.utils import tasks
+from app.utils.tasks import TaskQueue, background_task
+from tests.conftest import TestingAsyncSessionLocal
+
+calls = []
+failures = {"left": 0}
+
+@background_task("test.record")
+async def record(value: int):
+    calls.append(value)
+
+@background_task("test.flaky")
+async def flaky(value: int):
+    if failures["left"] > 0:
+        failures["left"] -= 1
+        raise RuntimeError("temporary")
+    calls.append(value)
+
+@pytest.fixture(autouse=True)
+def task_settings(db, monkeypatch):
+    calls.clear()
+    failures["left"] = 0
+    monkeypatch.setattr(settings, "TASK_PERSIST", True)
+    monkeypatch.setattr(settings, "TASK_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(settings, "TASK_RETRY_BASE_SECONDS", 0.01)
+    monkeypatch.setattr(settings, "TASK_RETRY_MAX_SECONDS", 0.015)
+    # Без случайной доли задержки повторов
+    monkeypatch.setattr(tasks.random, "uniform", lambda low, high: high)
+
+async def stored_tasks():
+    async with TestingAsyncSessionLocal() as session:
+        return (await session.execute(select(BackgroundTask).order_by(BackgroundTask.id))).scalars().all()
+
+async def wait_for(condition, timeout: float = 3.0):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+async def started_queue() -> TaskQueue:
+    queue = TaskQueue(10, 1)
+    await queue.start(TestingAsyncSessionLocal)
+    return queue
+
+def test_tasks_run_after_commit_only():
+    async def scenario():
+        queue = await started_queue()
+        async with TestingAsyncSessionLocal() as session:
+            queue.enqueue("test.record", session, value=1)
+            # До commit задача только сохранена в транзакции
+            await session.flush()
+            assert calls == []
+            await session.commit()
+            # Повторный commit той же сессии не ставит задачу еще раз
+            await session.commit()
+
+            queue.enqueue("test.record", session, value=2)
+            await session.rollback()
+
+        await wait_for(lambda: queue.pending() == 0 and calls)
+        await queue.stop()
+        assert calls == [1]
+        # Выполненная задача удаляется, отмененная откатом не сохраняется
+        assert await stored_tasks() == []
+
+    asyncio.run(scenario())
+
+def test_retry_with_backoff():
+    async def scenario():
+        queue = await started_queue()
+        delays = []
+        schedule = queue._schedule
+        queue._schedule = lambda job, delay: delays.append(delay) or schedule(job, delay)
+        failures["left"] = 2
+
+        async with TestingAsyncSessionLocal() as session:
+            queue.enqueue("test.flaky", session, value=7)
+            await session.commit()
+
+        await wait_for(lambda: calls == [7])
+        await wait_for(lambda: queue.pending() == 0 and not queue._held)
+        await queue.stop()
+        # Задержка удваивается с каждой попыткой и ограничена TASK_RETRY_MAX_SECONDS
+        assert delays == [0.01, 0.015]
+        assert await stored_tasks() == []
+
+    asyncio.run(scenario())
+
+def test_exhausted_task_is_kept_with_error():
+    async def scenario():
+        queue = await started_queue()
+        failures["left"] = 5
+
+        async with TestingAsyncSessionLocal() as session:
+            queue.enqueue("test.flaky", session, value=7)
+            await session.commit()
+
+        await wait_for(lambda: queue.pending() == 0 and not queue._held)
+        await queue.stop()
+        assert calls == []
+        [row] = await stored_tasks()
+        assert row.attempts == 3
+        assert row.locked_until is None
+        assert row.last_error == "RuntimeError: temporary"
+
+    asyncio.run(scenario())
+
+def test_expired_lease_is_claimed(monkeypatch):
+    monkeypatch.setattr(settings, "TASK_LEASE_SECONDS", 0.3)
+
+    async def scenario():
+        # Воркер сохранил задачу и остановился, не выполнив ее
+        stopped = TaskQueue(10, 1)
+        stopped.session_factory = TestingAsyncSessionLocal
+        async with TestingAsyncSessionLocal() as session:
+            stopped.enqueue("test.record", session, value=3)
+            await session.commit()
+        [row] = await stored_tasks()
+        assert row.locked_until is not None
+
+        queue = await started_queue()
+        # Пока аренда не истекла, задача принадлежит остановившемуся воркеру
+        await asyncio.sleep(0.1)
+        assert calls == []
+
+        await wait_for(lambda: calls == [3])
+        await wait_for(lambda: not queue._held)
+        await queue.stop()
+        assert await stored_tasks() == []
+
+    asyncio.run(scenario())
@@ -0,0 +1,73 @@
+import json
+import logging
+import os
+import pytest
+from app.config import settings
+from app.utils import tracing
+from app.utils.tracing import KIND_CLIENT, KIND_SERVER, SpanExporter
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+@pytest.fixture
+def exporter(tmp_path, monkeypatch):
+    """Все запросы в выборке, спаны пишутся в отдельный файл"""
+    monkeypatch.setattr(settings, "TRACING_SAMPLE_RATE", 1.0)
+    exporter = SpanExporter(str(tmp_path / "spans.jsonl"), 100, 60)
+    monkeypatch.setattr(tracing, "exporter", exporter)
+    return exporter
+
+def _exported_spans(exporter: SpanExporter) -> list:
+    exporter.flush()
+    spans = []
+    with open(exporter.path, "rb") as exported:
+        for line in exported:
+            for resource_spans in json.loads(line)["resourceSpans"]:
+                resource = {item["key"]: item["value"] for item in resource_spans["resource"]["attributes"]}
+                assert resource["service.name"] == {"stringValue": settings.TRACING_SERVICE_NAME}
+                for scope_spans in resource_spans["scopeSpans"]:
+                    spans.extend(scope_spans["spans"])
+    return spans
+
+def test_traceparent_continues_caller_trace(client, test_room, user_token_headers, exporter):
+    exported = tracing.SPANS_EXPORTED.value
+    headers = dict(user_token_headers, traceparent=f"00-{TRACE_ID}-{PARENT_ID}-01")
+    response = client.get("/rooms/", headers=headers)
+    assert response.status_code == 200
+
+    spans = _exported_spans(exporter)
+    assert {span["traceId"] for span in spans} == {TRACE_ID}
+    [root] = [span for span in spans if span["kind"] == KIND_SERVER]
+    assert root["parentSpanId"] == PARENT_ID
+    assert root["name"] == "GET /rooms/"
+    attributes = {item["key"]: item["value"] for item in root["attributes"]}
+    assert attributes["http.route"] == {"stringValue": "/rooms/"}
+    assert attributes["http.status_code"] == {"intValue": "200"}
+
+    queries = [span for span in spans if span["kind"] == KIND_CLIENT]
+    assert queries and all(span["parentSpanId"] == root["spanId"] for span in queries)
+    assert tracing.SPANS_EXPORTED.value == exported + len(spans)
+
+def test_traceparent_sampling_decision(client, exporter):
+    # Вызывающая сторона не записывает трассу - спанов нет даже при полной выборке
+    client.get("/", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-00"})
+    exporter.flush()
+    assert not os.path.exists(exporter.path)
+
+    # Некорректный заголовок: новая трасса по собственной выборке
+    client.get("/", headers={"traceparent": "garbage"})
+    [root] = _exported_spans(exporter)
+    assert root["traceId"] != TRACE_ID
+    assert len(root["traceId"]) == 32
+    assert "parentSpanId" not in root
+
+def test_request_log_carries_trace_id(client, exporter, caplog):
+    caplog.set_level(logging.INFO, logger="app.request")
+    client.get("/", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+    [record] = [record for record in caplog.records if record.name == "app.request"]
+    assert record.trace_id == TRACE_ID
+
+    caplog.clear()
+    client.get("/", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-00"})
+    [record] = [record for record in caplog.records if record.name == "app.request"]
+    assert not hasattr(record, "trace_id")